@@ -1,3 +1,12 @@
-from app.agent import root_agent
+from typing import Any
 
 __all__ = ["root_agent"]
+
+
+def __getattr__(name: str) -> Any:
+    # Importing a submodule such as `app.config` should not build the agents.
+    if name == "root_agent":
+        from app.agent import root_agent
+
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -12,23 +12,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import datetime
+import asyncio
 import logging
 import re
-from collections.abc import AsyncGenerator
-from typing import Literal
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable, Iterable
+from typing import Any, Literal, TypedDict
 
-from google.adk.agents import BaseAgent, LlmAgent, LoopAgent, SequentialAgent
+from google.adk.agents import BaseAgent, LlmAgent
 from google.adk.agents.callback_context import CallbackContext
 from google.adk.agents.invocation_context import InvocationContext
 from google.adk.events import Event, EventActions
-from google.adk.planners import BuiltInPlanner
-from google.adk.tools import google_search
-from google.adk.tools.agent_tool import AgentTool
+from google.adk.models import LlmRequest, LlmResponse
 from google.genai import types as genai_types
+from opentelemetry import trace
 from pydantic import BaseModel, Field
 
-from .config import config
+from .utils.citations import CitationRewriter, rewrite_citations
+from .utils.context_cache import ContextCache
+from .utils.search_cache import SearchCache, normalize_query
+
+# Report streams in flight, by invocation id. Bounded in case a stream is
+# abandoned before its after_agent_callback runs.
+_citation_streams: dict[str, CitationRewriter] = {}
+_MAX_CITATION_STREAMS = 256
 
 
 # --- Structured Output Models ---
@@ -56,28 +63,24 @@ class Feedback(BaseModel):
 
 
 # --- Callbacks ---
-def collect_research_sources_callback(callback_context: CallbackContext) -> None:
-    """Collects and organizes web-based research sources and their supported claims from agent events.
-
-    This function processes the agent's `session.events` to extract web source details (URLs,
-    titles, domains from `grounding_chunks`) and associated text segments with confidence scores
-    (from `grounding_supports`). The aggregated source information and a mapping of URLs to short
-    IDs are cumulatively stored in `callback_context.state`.
-
-    Args:
-        callback_context (CallbackContext): The context object providing access to the agent's
-            session events and persistent state.
+def _add_grounded_sources(
+    events: Iterable[Event],
+    url_to_short_id: dict[str, str],
+    sources: dict[str, dict[str, Any]],
+    claim_keys: dict[str, bool],
+) -> None:
+    """Adds the web sources and supported claims grounding `events`, in order.
+
+    New URLs get the next free `src-N` id; claims already in `claim_keys` are
+    skipped. The three mappings are updated in place.
     """
-    session = callback_context._invocation_context.session
-    url_to_short_id = callback_context.state.get("url_to_short_id", {})
-    sources = callback_context.state.get("sources", {})
     id_counter = len(url_to_short_id) + 1
-    for event in session.events:
+    for event in events:
         if not (event.grounding_metadata and event.grounding_metadata.grounding_chunks):
             continue
         chunks_info = {}
         for idx, chunk in enumerate(event.grounding_metadata.grounding_chunks):
-            if not chunk.web:
+            if not (chunk.web and chunk.web.uri):
                 continue
             url = chunk.web.uri
             title = (
@@ -108,14 +111,105 @@ def collect_research_sources_callback(callback_context: CallbackContext) -> None
                             confidence_scores[i] if i < len(confidence_scores) else 0.5
                         )
                         text_segment = support.segment.text if support.segment else ""
+                        claim_key = f"{short_id}\n{text_segment}"
+                        if claim_key in claim_keys:
+                            continue
+                        claim_keys[claim_key] = True
                         sources[short_id]["supported_claims"].append(
                             {
                                 "text_segment": text_segment,
                                 "confidence": confidence,
                             }
                         )
+
+
+def _event_cursor(event: Event) -> dict[str, Any]:
+    return {"timestamp": event.timestamp, "id": event.id}
+
+
+def _events_after(events: list[Event], cursor: Any) -> list[Event]:
+    """Returns the events that follow the one `_event_cursor` recorded.
+
+    Positions are no use as cursors, since a session service may only load the
+    most recent events. Events sharing the cursor's timestamp, other than the
+    cursor event itself, are returned again; claim keys keep them from being
+    recorded twice.
+    """
+    if not isinstance(cursor, dict):
+        # No cursor yet, or a list position stored by an earlier version.
+        return events
+    start = len(events)
+    while start and events[start - 1].timestamp >= cursor["timestamp"]:
+        if events[start - 1].id == cursor["id"]:
+            break
+        start -= 1
+    return events[start:]
+
+
+def collect_research_sources_callback(callback_context: CallbackContext) -> None:
+    """Collects and organizes web-based research sources and their supported claims from agent events.
+
+    This function processes the agent's `session.events` to extract web source details (URLs,
+    titles, domains from `grounding_chunks`) and associated text segments with confidence scores
+    (from `grounding_supports`). The aggregated source information and a mapping of URLs to short
+    IDs are cumulatively stored in `callback_context.state`.
+
+    Only events added since the previous call are processed: the timestamp and id of the last
+    processed event are kept in `state["sources_event_cursor"]`, and claims already recorded for
+    a source are skipped via `state["source_claim_keys"]`, so each call costs O(new events).
+
+    Args:
+        callback_context (CallbackContext): The context object providing access to the agent's
+            session events and persistent state.
+    """
+    session = callback_context._invocation_context.session
+    events = _events_after(
+        session.events, callback_context.state.get("sources_event_cursor")
+    )
+    if not events:
+        return
+    url_to_short_id = callback_context.state.get("url_to_short_id", {})
+    sources = callback_context.state.get("sources", {})
+    # A dict rather than a list so membership checks need no per-call rebuild.
+    claim_keys = callback_context.state.get("source_claim_keys", {})
+    _add_grounded_sources(events, url_to_short_id, sources, claim_keys)
     callback_context.state["url_to_short_id"] = url_to_short_id
     callback_context.state["sources"] = sources
+    callback_context.state["source_claim_keys"] = claim_keys
+    callback_context.state["sources_event_cursor"] = _event_cursor(events[-1])
+
+
+def citation_streaming_callback(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> LlmResponse | None:
+    """Rewrites citation tags in partial report responses as they stream.
+
+    Each partial SSE chunk of the report is passed through a `CitationRewriter`
+    kept for the invocation, so cited text reaches the user progressively. The
+    final aggregated response is left untouched: it is stored as
+    'final_cited_report' and `citation_replacement_callback` reuses the
+    streamed output instead of rewriting the report again.
+
+    Args:
+        callback_context (CallbackContext): The report composer's callback context.
+        llm_response (LlmResponse): A response from the model, possibly partial.
+
+    Returns:
+        LlmResponse | None: The rewritten partial response, or None to keep it.
+    """
+    if not (llm_response.partial and llm_response.content):
+        return None
+    key = callback_context.invocation_id
+    if (rewriter := _citation_streams.get(key)) is None:
+        while len(_citation_streams) >= _MAX_CITATION_STREAMS:
+            del _citation_streams[next(iter(_citation_streams))]
+        rewriter = _citation_streams[key] = CitationRewriter(
+            callback_context.state.get("sources", {})
+        )
+    for part in llm_response.content.parts or []:
+        if part.text and not part.thought:
+            part.text = rewriter.feed(part.text)
+    return llm_response
 
 
 def citation_replacement_callback(
@@ -126,6 +220,8 @@ def citation_replacement_callback(
     Processes 'final_cited_report' from context state, converting tags like
     `<cite source="src-N"/>` into hyperlinks using source information from
     `callback_context.state["sources"]`. Also fixes spacing around punctuation.
+    When the report was streamed, the output of `citation_streaming_callback`
+    is used as is.
 
     Args:
         callback_context (CallbackContext): Contains the report and source information.
@@ -136,278 +232,439 @@ def citation_replacement_callback(
     final_report = callback_context.state.get("final_cited_report", "")
     sources = callback_context.state.get("sources", {})
 
-    def tag_replacer(match: re.Match) -> str:
-        short_id = match.group(1)
-        if not (source_info := sources.get(short_id)):
-            logging.warning(f"Invalid citation tag found and removed: {match.group(0)}")
-            return ""
-        display_text = source_info.get("title", source_info.get("domain", short_id))
-        return f" [{display_text}]({source_info['url']})"
-
-    processed_report = re.sub(
-        r'<cite\s+source\s*=\s*["\']?\s*(src-\d+)\s*["\']?\s*/>',
-        tag_replacer,
-        final_report,
-    )
-    processed_report = re.sub(r"\s+([.,;:])", r"\1", processed_report)
+    rewriter = _citation_streams.pop(callback_context.invocation_id, None)
+    if rewriter is not None and rewriter.consumed == len(final_report):
+        rewriter.flush()
+        processed_report = rewriter.text
+    else:
+        processed_report = rewrite_citations(final_report, sources)
     callback_context.state["final_report_with_citations"] = processed_report
     return genai_types.Content(parts=[genai_types.Part(text=processed_report)])
 
 
 # --- Custom Agent for Loop Control ---
-class EscalationChecker(BaseAgent):
-    """Checks research evaluation and escalates to stop the loop if grade is 'pass'."""
+class LoopUsage(TypedDict):
+    """What the current invocation has used of the research loop's budgets."""
 
-    def __init__(self, name: str):
-        super().__init__(name=name)
+    iteration: int
+    tokens: int
+    elapsed: float
+    searches: int
+    new_sources: int | None
 
-    async def _run_async_impl(
-        self, ctx: InvocationContext
-    ) -> AsyncGenerator[Event, None]:
-        evaluation_result = ctx.session.state.get("research_evaluation")
-        if evaluation_result and evaluation_result.get("grade") == "pass":
-            logging.info(
-                f"[{self.name}] Research evaluation passed. Escalating to stop loop."
-            )
-            yield Event(author=self.name, actions=EventActions(escalate=True))
-        else:
-            logging.info(
-                f"[{self.name}] Research evaluation failed or not found. Loop will continue."
-            )
-            # Yielding an event without content or actions just lets the flow continue.
-            yield Event(author=self.name)
 
+class LoopDecision(LoopUsage):
+    """A `ResearchBudgetController` decision, as kept in `research_loop`."""
 
-# --- AGENT DEFINITIONS ---
-plan_generator = LlmAgent(
-    model=config.worker_model,
-    name="plan_generator",
-    description="Generates or refine the existing 5 line action-oriented research plan, using minimal search only for topic clarification.",
-    instruction=f"""
-    You are a research strategist. Your job is to create a high-level RESEARCH PLAN, not a summary. If there is already a RESEARCH PLAN in the session state,
-    improve upon it based on the user feedback.
-
-    RESEARCH PLAN(SO FAR):
-    {{ research_plan? }}
-
-    **GENERAL INSTRUCTION: CLASSIFY TASK TYPES**
-    Your plan must clearly classify each goal for downstream execution. Each bullet point should start with a task type prefix:
-    - **`[RESEARCH]`**: For goals that primarily involve information gathering, investigation, analysis, or data collection (these require search tool usage by a researcher).
-    - **`[DELIVERABLE]`**: For goals that involve synthesizing collected information, creating structured outputs (e.g., tables, charts, summaries, reports), or compiling final output artifacts (these are executed AFTER research tasks, often without further search).
-
-    **INITIAL RULE: Your initial output MUST start with a bulleted list of 5 action-oriented research goals or key questions, followed by any *inherently implied* deliverables.**
-    - All initial 5 goals will be classified as `[RESEARCH]` tasks.
-    - A good goal for `[RESEARCH]` starts with a verb like "Analyze," "Identify," "Investigate."
-    - A bad output is a statement of fact like "The event was in April 2024."
-    - **Proactive Implied Deliverables (Initial):** If any of your initial 5 `[RESEARCH]` goals inherently imply a standard output or deliverable (e.g., a comparative analysis suggesting a comparison table, or a comprehensive review suggesting a summary document), you MUST add these as additional, distinct goals immediately after the initial 5. Phrase these as *synthesis or output creation actions* (e.g., "Create a summary," "Develop a comparison," "Compile a report") and prefix them with `[DELIVERABLE][IMPLIED]`.
-
-    **REFINEMENT RULE**:
-    - **Integrate Feedback & Mark Changes:** When incorporating user feedback, make targeted modifications to existing bullet points. Add `[MODIFIED]` to the existing task type and status prefix (e.g., `[RESEARCH][MODIFIED]`). If the feedback introduces new goals:
-        - If it's an information gathering task, prefix it with `[RESEARCH][NEW]`.
-        - If it's a synthesis or output creation task, prefix it with `[DELIVERABLE][NEW]`.
-    - **Proactive Implied Deliverables (Refinement):** Beyond explicit user feedback, if the nature of an existing `[RESEARCH]` goal (e.g., requiring a structured comparison, deep dive analysis, or broad synthesis) or a `[DELIVERABLE]` goal inherently implies an additional, standard output or synthesis step (e.g., a detailed report following a summary, or a visual representation of complex data), proactively add this as a new goal. Phrase these as *synthesis or output creation actions* and prefix them with `[DELIVERABLE][IMPLIED]`.
-    - **Maintain Order:** Strictly maintain the original sequential order of existing bullet points. New bullets, whether `[NEW]` or `[IMPLIED]`, should generally be appended to the list, unless the user explicitly instructs a specific insertion point.
-    - **Flexible Length:** The refined plan is no longer constrained by the initial 5-bullet limit and may comprise more goals as needed to fully address the feedback and implied deliverables.
-
-    **TOOL USE IS STRICTLY LIMITED:**
-    Your goal is to create a generic, high-quality plan *without searching*.
-    Only use `google_search` if a topic is ambiguous or time-sensitive and you absolutely cannot create a plan without a key piece of identifying information.
-    You are explicitly forbidden from researching the *content* or *themes* of the topic. That is the next agent's job. Your search is only to identify the subject, not to investigate it.
-    Current date: {datetime.datetime.now().strftime("%Y-%m-%d")}
-    """,
-    tools=[google_search],
-)
+    stop: bool
+    reason: str
 
 
-section_planner = LlmAgent(
-    model=config.worker_model,
-    name="section_planner",
-    description="Breaks down the research plan into a structured markdown outline of report sections.",
-    instruction="""
-    You are an expert report architect. Using the research topic and the plan from the 'research_plan' state key, design a logical structure for the final report.
-    Note: Ignore all the tag nanes ([MODIFIED], [NEW], [RESEARCH], [DELIVERABLE]) in the research plan.
-    Your task is to create a markdown outline with 4-6 distinct sections that cover the topic comprehensively without overlap.
-    You can use any markdown format you prefer, but here's a suggested structure:
-    # Section Name
-    A brief overview of what this section covers
-    Feel free to add subsections or bullet points if needed to better organize the content.
-    Make sure your outline is clear and easy to follow.
-    Do not include a "References" or "Sources" section in your outline. Citations will be handled in-line.
-    """,
-    output_key="report_sections",
-)
+class ResearchBudgetController(BaseAgent):
+    """Decides after each evaluation whether the refinement loop goes on.
+
+    Escalates to stop the loop when the evaluation grade is 'pass', when the
+    invocation has used up its token, wall time or search call budget, when every
+    follow-up query has already been executed, or when the previous refinement
+    round added fewer than `min_new_sources` sources. A budget of 0 is unlimited.
 
+    Usage is counted over the events of the current invocation. Each decision is
+    appended to `state["research_loop"]["decisions"]` and recorded on the current
+    trace span.
+    """
+
+    token_budget: int = 0
+    time_budget: float = 0
+    search_budget: int = 0
+    min_new_sources: int = 0
+
+    def _usage(self, ctx: InvocationContext) -> tuple[int, float, list[str]]:
+        """Returns the tokens, start time and search queries of this invocation."""
+        tokens = 0
+        start = time.time()
+        queries: list[str] = []
+        for event in reversed(ctx.session.events):
+            if event.invocation_id != ctx.invocation_id:
+                break
+            start = event.timestamp
+            if event.usage_metadata and event.usage_metadata.total_token_count:
+                tokens += event.usage_metadata.total_token_count
+            if event.grounding_metadata and event.grounding_metadata.web_search_queries:
+                queries.extend(event.grounding_metadata.web_search_queries)
+        return tokens, start, queries
+
+    def _stop_reason(
+        self,
+        evaluation: dict[str, Any],
+        usage: LoopUsage,
+        follow_ups: list[str],
+        executed: set[str],
+    ) -> str | None:
+        if evaluation.get("grade") == "pass":
+            return "pass"
+        if self.token_budget and usage["tokens"] >= self.token_budget:
+            return "token_budget"
+        if self.time_budget and usage["elapsed"] >= self.time_budget:
+            return "time_budget"
+        if self.search_budget and usage["searches"] >= self.search_budget:
+            return "search_budget"
+        if follow_ups and executed.issuperset(follow_ups):
+            return "repeated_queries"
+        if (
+            usage["new_sources"] is not None
+            and usage["new_sources"] < self.min_new_sources
+        ):
+            return "few_new_sources"
+        return None
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        state = ctx.session.state
+        loop_state = state.get("research_loop") or {}
+        if loop_state.get("invocation_id") != ctx.invocation_id:
+            loop_state = {"invocation_id": ctx.invocation_id, "decisions": []}
+        evaluation = state.get("research_evaluation") or {}
+        follow_ups = [
+            normalize_query(q["search_query"])
+            for q in evaluation.get("follow_up_queries") or []
+        ]
+        tokens, start, searched = self._usage(ctx)
+        # Follow-ups from earlier rounds count as executed even if the search
+        # tool rephrased them.
+        executed = {normalize_query(q) for q in searched}
+        executed.update(loop_state.get("follow_up_queries", []))
+        source_count = len(state.get("sources", {}))
+        previous_count = loop_state.get("source_count")
+
+        usage: LoopUsage = {
+            "iteration": len(loop_state["decisions"]) + 1,
+            "tokens": tokens,
+            "elapsed": round(time.time() - start, 3),
+            "searches": len(searched),
+            "new_sources": None
+            if previous_count is None
+            else source_count - previous_count,
+        }
+        reason = self._stop_reason(evaluation, usage, follow_ups, executed)
+        decision: LoopDecision = {
+            **usage,
+            "stop": reason is not None,
+            "reason": reason or "continue",
+        }
+        loop_state = {
+            **loop_state,
+            "source_count": source_count,
+            "follow_up_queries": sorted(executed.union(follow_ups)),
+            "decisions": [*loop_state["decisions"], decision],
+        }
+
+        span = trace.get_current_span()
+        span.set_attributes(
+            {
+                f"onemind.research_loop.{key}": value
+                for key, value in decision.items()
+                if value is not None
+            }
+        )
+        span.add_event("research_loop.decision", {"reason": decision["reason"]})
+        logging.info(f"[{self.name}] Research loop decision: {decision}")
+        yield Event(
+            author=self.name,
+            actions=EventActions(
+                escalate=decision["stop"] or None,
+                state_delta={"research_loop": loop_state},
+            ),
+        )
+
+
+# --- Custom Agent for Parallel Research ---
+_GOAL_TYPE = re.compile(r"\[(RESEARCH|DELIVERABLE)\]")
+_BULLET = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+# Seconds a researcher waits for the same goal being researched elsewhere.
+_SEARCH_DEDUP_TIMEOUT = 300
+
+
+def split_research_plan(plan: str) -> tuple[list[str], list[str]]:
+    """Splits a research plan into its `[RESEARCH]` and `[DELIVERABLE]` goals.
 
-section_researcher = LlmAgent(
-    model=config.worker_model,
-    name="section_researcher",
-    description="Performs the crucial first pass of web research.",
-    planner=BuiltInPlanner(
-        thinking_config=genai_types.ThinkingConfig(include_thoughts=True)
-    ),
-    instruction="""
-    You are a highly capable and diligent research and synthesis agent. Your comprehensive task is to execute a provided research plan with **absolute fidelity**, first by gathering necessary information, and then by synthesizing that information into specified outputs.
+    Args:
+        plan (str): The bulleted plan from the 'research_plan' state key.
 
-    You will be provided with a sequential list of research plan goals, stored in the `research_plan` state key. Each goal will be clearly prefixed with its primary task type: `[RESEARCH]` or `[DELIVERABLE]`.
+    Returns:
+        tuple[list[str], list[str]]: The research and deliverable goals, in plan
+            order, with their bullets stripped and their tags kept.
+    """
+    research: list[str] = []
+    deliverables: list[str] = []
+    for line in plan.splitlines():
+        if match := _GOAL_TYPE.search(line):
+            goal = _BULLET.sub("", line).strip()
+            (research if match.group(1) == "RESEARCH" else deliverables).append(goal)
+    return research, deliverables
 
-    Your execution process must strictly adhere to these two distinct and sequential phases:
 
-    ---
+def _final_text(event: Event) -> str:
+    if event.partial or not (event.content and event.content.parts):
+        return ""
+    return "".join(p.text for p in event.content.parts if p.text and not p.thought)
 
-    **Phase 1: Information Gathering (`[RESEARCH]` Tasks)**
 
-    *   **Execution Directive:** You **MUST** systematically process every goal prefixed with `[RESEARCH]` before proceeding to Phase 2.
-    *   For each `[RESEARCH]` goal:
-        *   **Query Generation:** Formulate a comprehensive set of 4-5 targeted search queries. These queries must be expertly designed to broadly cover the specific intent of the `[RESEARCH]` goal from multiple angles.
-        *   **Execution:** Utilize the `google_search` tool to execute **all** generated queries for the current `[RESEARCH]` goal.
-        *   **Summarization:** Synthesize the search results into a detailed, coherent summary that directly addresses the objective of the `[RESEARCH]` goal.
-        *   **Internal Storage:** Store this summary, clearly tagged or indexed by its corresponding `[RESEARCH]` goal, for later and exclusive use in Phase 2. You **MUST NOT** lose or discard any generated summaries.
+async def _merge_bounded(
+    runs: list[AsyncGenerator[Event, None]], limit: int
+) -> AsyncGenerator[tuple[int, Event], None]:
+    """Runs at most `limit` agent runs at a time and yields `(run index, event)`.
 
-    ---
+    As with `ParallelAgent`, a run does not move on until its event has been
+    processed by the consumer, so state deltas are applied in order.
+    """
+    queue: asyncio.Queue[tuple[int, Event | BaseException | None, asyncio.Future]] = (
+        asyncio.Queue()
+    )
+    semaphore = asyncio.Semaphore(limit)
+    loop = asyncio.get_running_loop()
+
+    async def drive(index: int, run: AsyncGenerator[Event, None]) -> None:
+        try:
+            async with semaphore:
+                async for event in run:
+                    processed = loop.create_future()
+                    await queue.put((index, event, processed))
+                    await processed
+        except Exception as e:
+            await queue.put((index, e, loop.create_future()))
+        else:
+            await queue.put((index, None, loop.create_future()))
+
+    tasks = [asyncio.create_task(drive(i, run)) for i, run in enumerate(runs)]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            index, item, processed = await queue.get()
+            if item is None:
+                remaining -= 1
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                yield index, item
+                processed.set_result(None)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _cached_search_callbacks(
+    cache: SearchCache, goal: str, claimed: set[str]
+) -> tuple[Callable[..., Awaitable[LlmResponse | None]], Callable[..., None]]:
+    """Model callbacks that serve a goal's grounded response from `cache`.
+
+    The researcher's single grounded model call stands in for its searches, so
+    the response is cached whole, keyed by the normalized goal. Lookups of a key
+    already being researched wait for that result instead of searching again.
+    Keys this researcher claims are added to `claimed` until it releases them.
+    """
+    key = normalize_query(goal)
+
+    async def before_model(
+        callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> LlmResponse | None:
+        cached = cache.get(key)
+        if cached is None:
+            if (pending := cache.claim(key)) is None:
+                claimed.add(key)
+            else:
+                try:
+                    cached = await asyncio.wait_for(
+                        asyncio.shield(pending), _SEARCH_DEDUP_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    cached = None
+        span = trace.get_current_span()
+        span.set_attribute("onemind.search_cache.hit", cached is not None)
+        span.set_attributes(cache.span_attributes())
+        return LlmResponse.model_validate_json(cached) if cached else None
+
+    def after_model(
+        callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> None:
+        if llm_response.partial:
+            return
+        value = None
+        if llm_response.content and not llm_response.error_code:
+            # Cache hits cost no tokens, so usage is not replayed.
+            value = llm_response.model_copy(
+                update={"usage_metadata": None}
+            ).model_dump_json(exclude_none=True)
+        if key in claimed:
+            claimed.discard(key)
+            cache.release(key, value)
+        elif value is not None:
+            # The search this one waited for timed out; it is still in flight.
+            cache.put(key, value)
+
+    return before_model, after_model
+
+
+class ResearchFanOut(BaseAgent):
+    """Researches every `[RESEARCH]` goal of the plan concurrently.
+
+    Each goal gets its own copy of `researcher`, run in an isolated branch, with at
+    most `max_concurrency` running at once. Findings are merged in plan order into
+    'section_research_findings', and the sources grounding them are numbered in
+    plan order too, so source ids do not depend on which branch finishes first.
+    `synthesizer` then produces the `[DELIVERABLE]` goals from the merged findings.
+    With a `search_cache`, goals researched recently or concurrently reuse that
+    research. With a `context_cache`, the goal follows the researcher's static
+    instruction, so all goals share one cached prompt prefix.
+    """
 
-    **Phase 2: Synthesis and Output Creation (`[DELIVERABLE]` Tasks)**
+    description: str = "Researches each goal of the plan in parallel."
+    researcher: LlmAgent
+    synthesizer: LlmAgent
+    max_concurrency: int = 4
+    search_cache: SearchCache | None = None
+    context_cache: ContextCache | None = None
+
+    def model_post_init(self, __context: Any) -> None:
+        self.sub_agents = [self.researcher, self.synthesizer]
+        super().model_post_init(__context)
+
+    def _goal_researcher(self, index: int, goal: str, claimed: set[str]) -> LlmAgent:
+        goal_text = f"    RESEARCH GOAL: {goal}\n"
+        update: dict[str, Any] = {"name": f"{self.researcher.name}_{index + 1}"}
+        if self.context_cache is None:
+            instruction = f"{self.researcher.instruction}\n{goal_text}"
+            # An InstructionProvider, so braces in the goal are not read as state
+            # keys.
+            update["instruction"] = lambda _: instruction
+        if self.search_cache is not None:
+            before_model, after_model = _cached_search_callbacks(
+                self.search_cache, goal, claimed
+            )
+            update |= {
+                "before_model_callback": before_model,
+                "after_model_callback": after_model,
+            }
+        researcher = self.researcher.model_copy(update=update)
+        if self.context_cache is not None:
+            self.context_cache.register(
+                researcher, lambda _: goal_text, name=self.researcher.name
+            )
+        return researcher
 
-    *   **Execution Prerequisite:** This phase **MUST ONLY COMMENCE** once **ALL** `[RESEARCH]` goals from Phase 1 have been fully completed and their summaries are internally stored.
-    *   **Execution Directive:** You **MUST** systematically process **every** goal prefixed with `[DELIVERABLE]`. For each `[DELIVERABLE]` goal, your directive is to **PRODUCE** the artifact as explicitly described.
-    *   For each `[DELIVERABLE]` goal:
-        *   **Instruction Interpretation:** You will interpret the goal's text (following the `[DELIVERABLE]` tag) as a **direct and non-negotiable instruction** to generate a specific output artifact.
-            *   *If the instruction details a table (e.g., "Create a Detailed Comparison Table in Markdown format"), your output for this step **MUST** be a properly formatted Markdown table utilizing columns and rows as implied by the instruction and the prepared data.*
-            *   *If the instruction states to prepare a summary, report, or any other structured output, your output for this step **MUST** be that precise artifact.*
-        *   **Data Consolidation:** Access and utilize **ONLY** the summaries generated during Phase 1 (`[RESEARCH]` tasks`) to fulfill the requirements of the current `[DELIVERABLE]` goal. You **MUST NOT** perform new searches.
-        *   **Output Generation:** Based on the specific instruction of the `[DELIVERABLE]` goal:
-            *   Carefully extract, organize, and synthesize the relevant information from your previously gathered summaries.
-            *   Must always produce the specified output artifact (e.g., a concise summary, a structured comparison table, a comprehensive report, a visual representation, etc.) with accuracy and completeness.
-        *   **Output Accumulation:** Maintain and accumulate **all** the generated `[DELIVERABLE]` artifacts. These are your final outputs.
+    def _branch(self, ctx: InvocationContext, agent: BaseAgent) -> InvocationContext:
+        suffix = f"{self.name}.{agent.name}"
+        return ctx.model_copy(
+            update={"branch": f"{ctx.branch}.{suffix}" if ctx.branch else suffix}
+        )
 
-    ---
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        research, deliverables = split_research_plan(
+            ctx.session.state.get("research_plan", "")
+        )
+        if not research:
+            research = [ctx.session.state.get("research_plan", "")]
+        claimed: set[str] = set()
+        researchers = [
+            self._goal_researcher(i, goal, claimed) for i, goal in enumerate(research)
+        ]
+        logging.info(
+            f"[{self.name}] Researching {len(research)} goals, "
+            f"{self.max_concurrency} at a time."
+        )
+        findings = [""] * len(research)
+        grounded: list[list[Event]] = [[] for _ in research]
+        runs = [agent.run_async(self._branch(ctx, agent)) for agent in researchers]
+        try:
+            async for index, event in _merge_bounded(runs, self.max_concurrency):
+                yield event
+                if event.grounding_metadata and not event.partial:
+                    grounded[index].append(event)
+                if (
+                    event.author == researchers[index].name
+                    and event.is_final_response()
+                ):
+                    findings[index] = _final_text(event) or findings[index]
+        finally:
+            if self.search_cache is not None:
+                # Wakes up waiters on this run's searches that failed before
+                # caching; other runs release their own claims.
+                for key in list(claimed):
+                    self.search_cache.release(key, None)
+
+        url_to_short_id = ctx.session.state.get("url_to_short_id", {})
+        sources = ctx.session.state.get("sources", {})
+        claim_keys = ctx.session.state.get("source_claim_keys", {})
+        _add_grounded_sources(
+            (event for events in grounded for event in events),
+            url_to_short_id,
+            sources,
+            claim_keys,
+        )
+        merged = "\n\n".join(
+            f"### {goal}\n\n{text}"
+            for goal, text in zip(research, findings, strict=True)
+        )
+        merged_event = Event(
+            author=self.name,
+            actions=EventActions(
+                state_delta={
+                    "section_research_findings": merged,
+                    "url_to_short_id": url_to_short_id,
+                    "sources": sources,
+                    "source_claim_keys": claim_keys,
+                }
+            ),
+        )
+        # Branch events are already collected above.
+        merged_event.actions.state_delta["sources_event_cursor"] = _event_cursor(
+            merged_event
+        )
+        yield merged_event
+        if not deliverables:
+            return
+
+        artifacts = ""
+        async for event in self.synthesizer.run_async(ctx):
+            yield event
+            if event.author == self.synthesizer.name and event.is_final_response():
+                artifacts = _final_text(event) or artifacts
+        yield Event(
+            author=self.name,
+            actions=EventActions(
+                state_delta={"section_research_findings": f"{merged}\n\n{artifacts}"}
+            ),
+        )
 
-    **Final Output:** Your final output will comprise the complete set of processed summaries from `[RESEARCH]` tasks AND all the generated artifacts from `[DELIVERABLE]` tasks, presented clearly and distinctly.
-    """,
-    tools=[google_search],
-    output_key="section_research_findings",
-    after_agent_callback=collect_research_sources_callback,
-)
 
-research_evaluator = LlmAgent(
-    model=config.critic_model,
-    name="research_evaluator",
-    description="Critically evaluates research and generates follow-up queries.",
-    instruction=f"""
-    You are a meticulous quality assurance analyst evaluating the research findings in 'section_research_findings'.
-
-    **CRITICAL RULES:**
-    1. Assume the given research topic is correct. Do not question or try to verify the subject itself.
-    2. Your ONLY job is to assess the quality, depth, and completeness of the research provided *for that topic*.
-    3. Focus on evaluating: Comprehensiveness of coverage, logical flow and organization, use of credible sources, depth of analysis, and clarity of explanations.
-    4. Do NOT fact-check or question the fundamental premise or timeline of the topic.
-    5. If suggesting follow-up queries, they should dive deeper into the existing topic, not question its validity.
-
-    Be very critical about the QUALITY of research. If you find significant gaps in depth or coverage, assign a grade of "fail",
-    write a detailed comment about what's missing, and generate 5-7 specific follow-up queries to fill those gaps.
-    If the research thoroughly covers the topic, grade "pass".
-
-    Current date: {datetime.datetime.now().strftime("%Y-%m-%d")}
-    Your response must be a single, raw JSON object validating against the 'Feedback' schema.
-    """,
-    output_schema=Feedback,
-    disallow_transfer_to_parent=True,
-    disallow_transfer_to_peers=True,
-    output_key="research_evaluation",
+# --- AGENT DEFINITIONS ---
+# The research agents are defined in `research_agent` and built on first access,
+# since only the OneMind orchestrator is served.
+_RESEARCH_AGENTS = frozenset(
+    {
+        "plan_generator",
+        "section_planner",
+        "goal_researcher",
+        "deliverable_writer",
+        "section_researcher",
+        "research_evaluator",
+        "enhanced_search_executor",
+        "report_composer",
+        "research_pipeline",
+        "interactive_planner_agent",
+    }
 )
 
-enhanced_search_executor = LlmAgent(
-    model=config.worker_model,
-    name="enhanced_search_executor",
-    description="Executes follow-up searches and integrates new findings.",
-    planner=BuiltInPlanner(
-        thinking_config=genai_types.ThinkingConfig(include_thoughts=True)
-    ),
-    instruction="""
-    You are a specialist researcher executing a refinement pass.
-    You have been activated because the previous research was graded as 'fail'.
-
-    1.  Review the 'research_evaluation' state key to understand the feedback and required fixes.
-    2.  Execute EVERY query listed in 'follow_up_queries' using the 'google_search' tool.
-    3.  Synthesize the new findings and COMBINE them with the existing information in 'section_research_findings'.
-    4.  Your output MUST be the new, complete, and improved set of research findings.
-    """,
-    tools=[google_search],
-    output_key="section_research_findings",
-    after_agent_callback=collect_research_sources_callback,
-)
 
-report_composer = LlmAgent(
-    model=config.critic_model,
-    name="report_composer_with_citations",
-    include_contents="none",
-    description="Transforms research data and a markdown outline into a final, cited report.",
-    instruction="""
-    Transform the provided data into a polished, professional, and meticulously cited research report.
-
-    ---
-    ### INPUT DATA
-    *   Research Plan: `{research_plan}`
-    *   Research Findings: `{section_research_findings}`
-    *   Citation Sources: `{sources}`
-    *   Report Structure: `{report_sections}`
-
-    ---
-    ### CRITICAL: Citation System
-    To cite a source, you MUST insert a special citation tag directly after the claim it supports.
-
-    **The only correct format is:** `<cite source="src-ID_NUMBER" />`
-
-    ---
-    ### Final Instructions
-    Generate a comprehensive report using ONLY the `<cite source="src-ID_NUMBER" />` tag system for all citations.
-    The final report must strictly follow the structure provided in the **Report Structure** markdown outline.
-    Do not include a "References" or "Sources" section; all citations must be in-line.
-    """,
-    output_key="final_cited_report",
-    after_agent_callback=citation_replacement_callback,
-)
+def __getattr__(name: str) -> Any:
+    if name in _RESEARCH_AGENTS:
+        from . import research_agent
 
-research_pipeline = SequentialAgent(
-    name="research_pipeline",
-    description="Executes a pre-approved research plan. It performs iterative research, evaluation, and composes a final, cited report.",
-    sub_agents=[
-        section_planner,
-        section_researcher,
-        LoopAgent(
-            name="iterative_refinement_loop",
-            max_iterations=config.max_search_iterations,
-            sub_agents=[
-                research_evaluator,
-                EscalationChecker(name="escalation_checker"),
-                enhanced_search_executor,
-            ],
-        ),
-        report_composer,
-    ],
-)
+        return getattr(research_agent, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-interactive_planner_agent = LlmAgent(
-    name="interactive_planner_agent",
-    model=config.worker_model,
-    description="The primary research assistant. It collaborates with the user to create a research plan, and then executes it upon approval.",
-    instruction=f"""
-    You are a research planning assistant. Your primary function is to convert ANY user request into a research plan.
-
-    **CRITICAL RULE: Never answer a question directly or refuse a request.** Your one and only first step is to use the `plan_generator` tool to propose a research plan for the user's topic.
-    If the user asks a question, you MUST immediately call `plan_generator` to create a plan to answer the question.
-
-    Your workflow is:
-    1.  **Plan:** Use `plan_generator` to create a draft plan and present it to the user.
-    2.  **Refine:** Incorporate user feedback until the plan is approved.
-    3.  **Execute:** Once the user gives EXPLICIT approval (e.g., "looks good, run it"), you MUST delegate the task to the `research_pipeline` agent, passing the approved plan.
-
-    Current date: {datetime.datetime.now().strftime("%Y-%m-%d")}
-    Do not perform any research yourself. Your job is to Plan, Refine, and Delegate.
-    """,
-    sub_agents=[research_pipeline],
-    tools=[AgentTool(plan_generator)],
-    output_key="research_plan",
-)
 
 # The original research agent is kept for reference but is no longer the active agent.
 # root_agent = interactive_planner_agent
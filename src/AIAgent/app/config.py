@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import os
 from dataclasses import dataclass
+from typing import Any
 
 import google.auth
 
@@ -22,12 +24,31 @@ import google.auth
 #    GOOGLE_GENAI_USE_VERTEXAI=FALSE
 #    GOOGLE_API_KEY=PASTE_YOUR_ACTUAL_API_KEY_HERE
 # 2. This will override the default Vertex AI configuration
-_, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
 os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
 os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
 
+@functools.cache
+def get_project_id() -> str:
+    """Returns the Google Cloud project, resolving default credentials on first use.
+
+    The model client resolves the project itself when `GOOGLE_CLOUD_PROJECT` is
+    unset, so nothing needs it at import time.
+    """
+    if project_id := os.environ.get("GOOGLE_CLOUD_PROJECT"):
+        return project_id
+    _, project_id = google.auth.default()
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", str(project_id))
+    return str(project_id)
+
+
+def __getattr__(name: str) -> Any:
+    # `project_id` used to be resolved at import time.
+    if name == "project_id":
+        return get_project_id()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 @dataclass
 class ResearchConfiguration:
     """Configuration for research-related models and parameters.
@@ -36,11 +57,33 @@ class ResearchConfiguration:
         critic_model (str): Model for evaluation tasks.
         worker_model (str): Model for working/generation tasks.
         max_search_iterations (int): Maximum search iterations allowed.
+        research_concurrency (int): Plan goals researched at the same time.
+        research_token_budget (int): Tokens an invocation may use before the
+            refinement loop stops; 0 is unlimited.
+        research_time_budget (float): Seconds an invocation may run before the
+            refinement loop stops; 0 is unlimited.
+        research_search_budget (int): Search queries an invocation may run
+            before the refinement loop stops; 0 is unlimited.
+        research_min_new_sources (int): The refinement loop stops when a round
+            adds fewer new sources than this.
+        search_cache_size (int): Research goals whose grounded search results
+            are cached in memory; 0 disables the cache.
+        search_cache_ttl (float): Seconds cached search results stay valid.
+        search_cache_path (str): Optional SQLite file that keeps cached search
+            results across restarts.
     """
 
     critic_model: str = "gemini-2.5-pro"
     worker_model: str = "gemini-2.5-flash"
     max_search_iterations: int = 5
+    research_concurrency: int = int(os.environ.get("RESEARCH_CONCURRENCY", "4"))
+    research_token_budget: int = int(os.environ.get("RESEARCH_TOKEN_BUDGET", "1000000"))
+    research_time_budget: float = float(os.environ.get("RESEARCH_TIME_BUDGET", "600"))
+    research_search_budget: int = int(os.environ.get("RESEARCH_SEARCH_BUDGET", "80"))
+    research_min_new_sources: int = int(os.environ.get("RESEARCH_MIN_NEW_SOURCES", "1"))
+    search_cache_size: int = int(os.environ.get("SEARCH_CACHE_SIZE", "1000"))
+    search_cache_ttl: float = float(os.environ.get("SEARCH_CACHE_TTL", "86400"))
+    search_cache_path: str = os.environ.get("SEARCH_CACHE_PATH", "")
 
 
 config = ResearchConfiguration()
@@ -54,16 +97,184 @@ class OneMindConfiguration:
         supabase_url (str): The URL of the Supabase project.
         supabase_key (str): The anon key for the Supabase project.
         onemind_model (str): Model for the OneMind agent.
+        crisis_lexicon_path (str): Crisis lexicon JSON file. Empty means the
+            lexicon bundled in `app/data`.
+        knowledge_base_path (str): Knowledge chunk JSON or JSON Lines file.
+            Empty means the chunks bundled in `app/data`.
+        knowledge_index_path (str): Memory-mapped index built with
+            `python -m app.utils.kb_index`. Takes precedence over
+            `knowledge_base_path` and is reloaded when replaced.
+        knowledge_min_score (float): Minimum cosine similarity for a chunk to
+            be returned by `retrieve_wisdom`.
+        db_pool_size (int): Max concurrent Supabase requests per worker.
+        db_timeout (float): Per-attempt Supabase request timeout in seconds.
+        db_max_retries (int): Retries for transient Supabase failures.
+        db_retry_backoff (float): Base retry delay in seconds, doubled per retry.
+        session_cache_size (int): Sessions kept in the in-process state cache;
+            0 disables the cache.
+        session_cache_ttl (float): Seconds a cached session state stays valid.
+        write_behind (bool): Queue stage updates and crystals and write them in
+            the background instead of during the tool call.
+        write_behind_max_size (int): Pending writes before producers wait.
+        write_behind_flush_size (int): Pending writes that trigger a flush.
+        write_behind_flush_interval (float): Maximum seconds a write stays queued.
+        write_behind_journal_path (str): Optional JSON Lines journal that keeps
+            queued writes across restarts.
+        response_cache (bool): Serve replies to repeated session openers from a
+            cache instead of the model.
+        response_cache_size (int): Maximum number of cached replies.
+        response_cache_bytes (int): Maximum total size of cached replies.
+        response_cache_similarity (float): Minimum similarity for an opener to
+            reuse the reply to a near-duplicate one; `inf` serves exact matches
+            only.
+        response_cache_max_prompt_chars (int): Longest opener whose reply is
+            cached.
+        tool_concurrency (int): Tool calls of one model response that run at the
+            same time.
+        stage_models (str): Model per stage as `stage=model;...`. Stages not
+            listed use `onemind_model`.
+        stage_tools (str): Tools offered per stage as `stage=tool,tool;...`.
+            Stages not listed are offered every tool.
+        fallback_model (str): Model called while the routed model misses
+            `model_latency_slo`.
+        model_latency_slo (float): p95 seconds to the first response chunk
+            above which calls go to `fallback_model`; 0 disables the fallback.
+        model_latency_window (float): Seconds of model latencies the p95 covers.
+        compaction_tokens (int): Prompt tokens above which older turns are
+            replaced with per-stage summaries; 0 disables compaction.
+        compaction_keep_turns (int): Most recent user turns always sent verbatim.
+        compaction_model (str): Model that writes the summaries.
     """
 
     supabase_url: str = os.environ.get("SUPABASE_URL", "")
     supabase_key: str = os.environ.get("SUPABASE_KEY", "")
     onemind_model: str = "gemini-2.5-pro"
+    crisis_lexicon_path: str = os.environ.get("CRISIS_LEXICON_PATH", "")
+    knowledge_base_path: str = os.environ.get("KNOWLEDGE_BASE_PATH", "")
+    knowledge_index_path: str = os.environ.get("KNOWLEDGE_INDEX_PATH", "")
+    knowledge_min_score: float = float(os.environ.get("KNOWLEDGE_MIN_SCORE", "0.1"))
+    db_pool_size: int = int(os.environ.get("SUPABASE_POOL_SIZE", "20"))
+    db_timeout: float = float(os.environ.get("SUPABASE_TIMEOUT", "5.0"))
+    db_max_retries: int = int(os.environ.get("SUPABASE_MAX_RETRIES", "2"))
+    db_retry_backoff: float = 0.2
+    session_cache_size: int = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+    session_cache_ttl: float = float(os.environ.get("SESSION_CACHE_TTL", "300"))
+    write_behind: bool = os.environ.get("WRITE_BEHIND", "false").lower() == "true"
+    write_behind_max_size: int = int(os.environ.get("WRITE_BEHIND_MAX_SIZE", "1000"))
+    write_behind_flush_size: int = int(os.environ.get("WRITE_BEHIND_FLUSH_SIZE", "100"))
+    write_behind_flush_interval: float = float(
+        os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", "1.0")
+    )
+    write_behind_journal_path: str = os.environ.get("WRITE_BEHIND_JOURNAL_PATH", "")
+    response_cache: bool = os.environ.get("RESPONSE_CACHE", "false").lower() == "true"
+    response_cache_size: int = int(os.environ.get("RESPONSE_CACHE_SIZE", "1000"))
+    response_cache_bytes: int = int(
+        os.environ.get("RESPONSE_CACHE_BYTES", str(16 * 2**20))
+    )
+    response_cache_similarity: float = float(
+        os.environ.get("RESPONSE_CACHE_SIMILARITY", "inf")
+    )
+    response_cache_max_prompt_chars: int = int(
+        os.environ.get("RESPONSE_CACHE_MAX_PROMPT_CHARS", "200")
+    )
+    tool_concurrency: int = int(os.environ.get("TOOL_CONCURRENCY", "4"))
+    stage_models: str = os.environ.get(
+        "STAGE_MODELS",
+        "stage_1_awareness=gemini-2.5-flash;stage_3_micro_action=gemini-2.5-flash",
+    )
+    stage_tools: str = os.environ.get(
+        "STAGE_TOOLS",
+        "stage_1_awareness=update_session_stage;"
+        "stage_2_integration=retrieve_wisdom,update_session_stage;"
+        "stage_3_micro_action=update_session_stage;"
+        "stage_4_solidification=create_integration_crystal",
+    )
+    fallback_model: str = os.environ.get("FALLBACK_MODEL", "gemini-2.5-flash")
+    model_latency_slo: float = float(os.environ.get("MODEL_LATENCY_SLO", "0"))
+    model_latency_window: float = float(os.environ.get("MODEL_LATENCY_WINDOW", "60"))
+    compaction_tokens: int = int(os.environ.get("COMPACTION_TOKENS", "8000"))
+    compaction_keep_turns: int = int(os.environ.get("COMPACTION_KEEP_TURNS", "4"))
+    compaction_model: str = os.environ.get("COMPACTION_MODEL", "gemini-2.5-flash")
 
 
 onemind_config = OneMindConfiguration()
 
 
+@dataclass
+class ContextCacheConfiguration:
+    """Configuration for caching the static prefix of agent prompts.
+
+    Attributes:
+        explicit (bool): Store each agent's static instruction and tool
+            declarations in a Gemini context cache. Without it, only Gemini's
+            implicit prefix caching applies.
+        ttl (float): Seconds a context cache lives after it is created or
+            extended.
+        refresh_margin (float): Seconds before expiry at which a context cache
+            in use is extended.
+    """
+
+    explicit: bool = os.environ.get("CONTEXT_CACHE", "false").lower() == "true"
+    ttl: float = float(os.environ.get("CONTEXT_CACHE_TTL", "3600"))
+    refresh_margin: float = float(os.environ.get("CONTEXT_CACHE_REFRESH", "300"))
+
+
+context_cache_config = ContextCacheConfiguration()
+
+
+@dataclass
+class ServerConfiguration:
+    """Configuration for the FastAPI server.
+
+    Attributes:
+        lazy_startup (bool): Create Google Cloud clients, the artifact bucket and
+            the trace exporter on first use or in the lifespan hook instead of at
+            import, so the server starts without credentials or network access.
+        artifact_service_uri (str): Artifact store. Empty means the
+            `gs://<project>-onemind-logs-data` bucket, or in-memory artifacts
+            with `lazy_startup`.
+        span_log_path (str): Write spans as JSON Lines to this file ("-" for
+            stdout) instead of Cloud Logging and Cloud Trace.
+        feedback_sink (str): Where feedback is written: "logging" (Cloud
+            Logging), "jsonl" (`feedback_log_path`) or "supabase" (the
+            `feedback` table, writable with the service role key only).
+        feedback_log_path (str): JSON Lines file for the "jsonl" sink; "-" for
+            stdout.
+        feedback_max_size (int): Buffered feedback records before requests are
+            rejected with 503.
+        feedback_flush_size (int): Buffered records that trigger a flush.
+        feedback_flush_interval (float): Maximum seconds a record stays buffered.
+        feedback_max_attempts (int): Consecutive failed flushes after which
+            buffered feedback is dropped.
+        session_service (str): Where ADK sessions live: "memory" (this process)
+            or "supabase" (the `adk_sessions` tables, shared by all workers).
+        session_max_events (int): Most recent events loaded per session with
+            the "supabase" service.
+        session_service_cache_size (int): Sessions cached in-process with the
+            "supabase" service; 0 disables the cache.
+    """
+
+    lazy_startup: bool = os.environ.get("LAZY_STARTUP", "false").lower() == "true"
+    artifact_service_uri: str = os.environ.get("ARTIFACT_SERVICE_URI", "")
+    span_log_path: str = os.environ.get("SPAN_LOG_PATH", "")
+    feedback_sink: str = os.environ.get("FEEDBACK_SINK", "logging")
+    feedback_log_path: str = os.environ.get("FEEDBACK_LOG_PATH", "-")
+    feedback_max_size: int = int(os.environ.get("FEEDBACK_MAX_SIZE", "10000"))
+    feedback_flush_size: int = int(os.environ.get("FEEDBACK_FLUSH_SIZE", "100"))
+    feedback_flush_interval: float = float(
+        os.environ.get("FEEDBACK_FLUSH_INTERVAL", "1.0")
+    )
+    feedback_max_attempts: int = int(os.environ.get("FEEDBACK_MAX_ATTEMPTS", "5"))
+    session_service: str = os.environ.get("SESSION_SERVICE", "memory")
+    session_max_events: int = int(os.environ.get("SESSION_MAX_EVENTS", "100"))
+    session_service_cache_size: int = int(
+        os.environ.get("SESSION_SERVICE_CACHE_SIZE", "1000")
+    )
+
+
+server_config = ServerConfiguration()
+
+
 @dataclass
 class DebugConfiguration:
     """Configuration for debugging purposes."""
@@ -12,26 +12,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import logging
-import time
-from typing import Any
+from collections.abc import Coroutine, Mapping
+from typing import Any, TypeVar
 
 from google.adk.agents import LlmAgent
-from google.adk.tools import FunctionTool
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.tools import BaseTool, FunctionTool, ToolContext
+from google.genai import types as genai_types
+from opentelemetry import trace
 from pydantic import BaseModel, Field
-from supabase import Client, create_client
 
-from .config import debug_config, onemind_config
+from .config import context_cache_config, debug_config, onemind_config
+from .utils.compaction import ConversationCompactor, LlmSummarizer, render
+from .utils.context_cache import ContextCache, state_template
+from .utils.crisis import get_crisis_detector
+from .utils.db import SupabaseError, SupabaseRestClient
+from .utils.kb_index import get_mapped_knowledge_base
+from .utils.knowledge import KnowledgeBase, get_knowledge_base
+from .utils.model_router import StageRouter, parse_stage_routes
+from .utils.response_cache import ResponseCache
+from .utils.session_cache import SessionState, SessionStateCache
+from .utils.tool_dispatch import ParallelToolDispatcher
+from .utils.write_behind import JsonlJournal, WriteBehindQueue
+
+T = TypeVar("T")
+
+DEFAULT_STAGE = "stage_1_awareness"
+# The memory insight of a user without integration crystals.
+NO_MEMORY_INSIGHT = "None"
+# Postgres function from src/sql/10_get_or_create_session.sql.
+SESSION_RPC = "get_or_create_session"
 
 # --- Supabase Client Initialization ---
-supabase: Client | None = None
+# Connections are opened lazily, on the first request from each event loop.
+supabase: SupabaseRestClient | None = None
 if onemind_config.supabase_url and onemind_config.supabase_key:
-    try:
-        supabase = create_client(
-            onemind_config.supabase_url, onemind_config.supabase_key
-        )
-    except Exception as e:
-        logging.error(f"Failed to create Supabase client: {e}")
+    supabase = SupabaseRestClient(
+        onemind_config.supabase_url,
+        onemind_config.supabase_key,
+        pool_size=onemind_config.db_pool_size,
+        timeout=onemind_config.db_timeout,
+        max_retries=onemind_config.db_max_retries,
+        retry_backoff=onemind_config.db_retry_backoff,
+    )
 else:
     logging.warning(
         "Supabase URL or key is not set. MemoBaseTool will not be available."
@@ -64,6 +91,7 @@ class CrystalInput(BaseModel):
 
 # --- Tool Definitions ---
 
+
 # 3.1. CrisisInterventionTool
 def check_crisis(user_input: str) -> bool:
     """
@@ -74,73 +102,83 @@ def check_crisis(user_input: str) -> bool:
     Returns:
         True if the input contains crisis keywords, False otherwise.
     """
-    # Add a 1-second delay to help prevent API rate limiting errors.
-    time.sleep(0.1)
-
-    # A simple, non-exhaustive list. In a real application, this would be
-    # more robust and likely involve a dedicated safety model.
-    crisis_keywords = ["自杀", "自残", "不想活了", "去死"]
-    for keyword in crisis_keywords:
-        if keyword in user_input:
-            logging.warning(f"Crisis keyword '{keyword}' detected in user input.")
-            return True
+    detector = get_crisis_detector(onemind_config.crisis_lexicon_path)
+    matches = detector.scan(user_input)
+    if matches:
+        logging.warning(
+            f"Crisis keywords {[m.pattern for m in matches]} detected in user input "
+            f"(lexicon {detector.version})."
+        )
+        return True
     return False
 
 
 # 3.2. MemoBaseTool
+def _field(payload: Any, name: str) -> Any:
+    """Reads a tool argument that may arrive as a dict or a Pydantic model."""
+    if isinstance(payload, dict):
+        return payload.get(name)
+    return getattr(payload, name, None)
+
+
 class MemoBaseTool:
-    """A tool to manage session state and long-term memory in Supabase."""
+    """A tool to manage session state and long-term memory in Supabase.
+
+    The tool methods are coroutines so the ADK runner can await the database
+    round trips instead of blocking its event loop. The `*_sync` variants run
+    them to completion for tests and scripts.
+
+    When a `cache` is given, `get_session` reads through it and the two write
+    tools update it after their database write succeeds. When a `writer` is
+    given, the write tools only enqueue their write and return immediately.
+    """
 
-    def get_session(self, session_input: SessionInput) -> dict[str, Any]:
+    def __init__(
+        self,
+        db: SupabaseRestClient | None,
+        cache: SessionStateCache | None = None,
+        writer: WriteBehindQueue | None = None,
+    ) -> None:
+        self.db = db
+        self.cache = cache
+        self.writer = writer
+        # Flipped off the first time PostgREST reports the RPC is missing, so
+        # databases without 10_get_or_create_session.sql keep working.
+        self.session_rpc_available = True
+
+    async def get_session(self, session_input: SessionInput) -> dict[str, Any]:
         """
         Gets an existing session or creates a new one.
         Returns the session's current stage and any long-term memory insights.
         """
-        if not supabase:
+        if not self.db:
             return {
-                "stage": "stage_1_awareness",
+                "stage": DEFAULT_STAGE,
                 "memory_insight": "No database connection.",
             }
         try:
-            user_id = getattr(session_input, "user_id", None) or debug_config.USER_ID
-            session_id = (
-                getattr(session_input, "session_id", None) or debug_config.SESSION_ID
-            )
-
-            # 1. Try to fetch the existing session
-            session_data = (
-                supabase.table("sessions")
-                .select("current_stage")
-                .eq("session_id", session_id)
-                .eq("user_id", user_id)
-                .execute()
-            )
-
-            stage = "stage_1_awareness"  # Default stage
-            if session_data.data:
-                stage = session_data.data[0]["current_stage"]
-            else:
-                # 2. If not found, create a new session
-                supabase.table("sessions").insert(
-                    {
-                        "session_id": session_id,
-                        "user_id": user_id,
-                        "current_stage": stage,
+            user_id = _field(session_input, "user_id") or debug_config.USER_ID
+            session_id = _field(session_input, "session_id") or debug_config.SESSION_ID
+
+            if self.cache is not None:
+                cached = self.cache.get(user_id, session_id)
+                span = trace.get_current_span()
+                span.set_attribute("onemind.session_cache.hit", cached is not None)
+                span.set_attributes(self.cache.span_attributes())
+                if cached:
+                    return {
+                        "stage": cached.stage,
+                        "memory_insight": cached.memory_insight,
                     }
-                ).execute()
-
-            # 3. Fetch the latest memory insight for the user
-            memory_data = (
-                supabase.table("integration_crystals")
-                .select("key_insight")
-                .eq("user_id", user_id)
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()
-            )
-            memory_insight = (
-                memory_data.data[0]["key_insight"] if memory_data.data else "None"
-            )
+
+            loaded = None
+            if self.session_rpc_available:
+                loaded = await self._load_session_rpc(self.db, user_id, session_id)
+            if loaded is None:
+                loaded = await self._load_session_queries(self.db, user_id, session_id)
+            stage, memory_insight = loaded
+            if self.cache is not None:
+                self.cache.put(user_id, session_id, SessionState(*loaded))
 
             logging.info(
                 f"Session for {user_id}: stage='{stage}', insight='{memory_insight}'"
@@ -149,16 +187,91 @@ class MemoBaseTool:
 
         except Exception as e:
             logging.error(f"Error in get_session: {e}")
-            return {"stage": "stage_1_awareness", "memory_insight": f"Error: {e}"}
+            return {"stage": DEFAULT_STAGE, "memory_insight": f"Error: {e}"}
+
+    async def _load_session_rpc(
+        self, db: SupabaseRestClient, user_id: str, session_id: str
+    ) -> tuple[str, str] | None:
+        """Loads or creates the session in one round trip.
 
-    def update_session_stage(self, stage_update: StageUpdateInput) -> bool:
+        Returns None when the `get_or_create_session` function is not deployed.
+        """
+        try:
+            rows = await db.rpc(
+                SESSION_RPC,
+                {
+                    "p_session_id": session_id,
+                    "p_user_id": user_id,
+                    "p_default_stage": DEFAULT_STAGE,
+                },
+                # The upsert leaves an existing session untouched, so repeating
+                # it after a lost response is harmless.
+                idempotent=True,
+            )
+        except SupabaseError as e:
+            if e.code != "PGRST202" and e.status_code != 404:
+                raise
+            logging.warning(
+                f"RPC '{SESSION_RPC}' is not available ({e}); "
+                "falling back to separate session queries."
+            )
+            self.session_rpc_available = False
+            return None
+
+        if not rows:
+            # The session id exists but belongs to another user.
+            raise ValueError(f"Session {session_id} does not belong to {user_id}.")
+        return (
+            rows[0]["stage"] or DEFAULT_STAGE,
+            rows[0]["memory_insight"] or NO_MEMORY_INSIGHT,
+        )
+
+    async def _load_session_queries(
+        self, db: SupabaseRestClient, user_id: str, session_id: str
+    ) -> tuple[str, str]:
+        """Loads or creates the session with up to three sequential queries."""
+        # 1. Try to fetch the existing session
+        session_rows = await db.select(
+            "sessions",
+            "current_stage",
+            filters={"session_id": session_id, "user_id": user_id},
+        )
+
+        stage = DEFAULT_STAGE
+        if session_rows:
+            stage = session_rows[0]["current_stage"]
+        else:
+            # 2. If not found, create a new session
+            await db.insert(
+                "sessions",
+                {
+                    "session_id": session_id,
+                    "user_id": user_id,
+                    "current_stage": stage,
+                },
+            )
+
+        # 3. Fetch the latest memory insight for the user
+        memory_rows = await db.select(
+            "integration_crystals",
+            "key_insight",
+            filters={"user_id": user_id},
+            order="created_at",
+            desc=True,
+            limit=1,
+        )
+        memory_insight = (
+            memory_rows[0]["key_insight"] if memory_rows else NO_MEMORY_INSIGHT
+        )
+        return stage, memory_insight
+
+    async def update_session_stage(self, stage_update: StageUpdateInput) -> bool:
         """Updates the current stage of a session."""
-        if not supabase:
+        if not self.db:
             return False
         try:
-            # The input is a dict. Access it safely using .get().
-            session_id = stage_update.get("session_id") or debug_config.SESSION_ID
-            next_stage = stage_update.get("next_stage")
+            session_id = _field(stage_update, "session_id") or debug_config.SESSION_ID
+            next_stage = _field(stage_update, "next_stage")
 
             if not next_stage:
                 logging.error(f"Missing 'next_stage' in stage_update: {stage_update}")
@@ -167,23 +280,29 @@ class MemoBaseTool:
             logging.info(
                 f"TOOL CALLED: update_session_stage - Session ID: {session_id}, New Stage: {next_stage}"
             )
-            supabase.table("sessions").update({"current_stage": next_stage}).eq(
-                "session_id", session_id
-            ).execute()
+            if self.writer is not None:
+                await self.writer.enqueue_stage(session_id, next_stage)
+            else:
+                await self.db.update(
+                    "sessions",
+                    {"current_stage": next_stage},
+                    filters={"session_id": session_id},
+                )
+            if self.cache is not None:
+                self.cache.set_stage(session_id, next_stage)
             return True
         except Exception as e:
             logging.error(f"Error in update_session_stage: {e}")
             return False
 
-    def create_integration_crystal(self, crystal_input: CrystalInput) -> bool:
+    async def create_integration_crystal(self, crystal_input: CrystalInput) -> bool:
         """Creates a new integration crystal to store long-term memory."""
-        if not supabase:
+        if not self.db:
             return False
         try:
-            # The input is a dict. Access it safely using .get().
-            user_id = crystal_input.get("user_id") or debug_config.USER_ID
-            name = crystal_input.get("name")
-            insight = crystal_input.get("insight")
+            user_id = _field(crystal_input, "user_id") or debug_config.USER_ID
+            name = _field(crystal_input, "name")
+            insight = _field(crystal_input, "insight")
 
             if not all([user_id, name, insight]):
                 logging.error(
@@ -194,47 +313,337 @@ class MemoBaseTool:
             logging.info(
                 f"TOOL CALLED: create_integration_crystal - User ID: {user_id}, Crystal Name: '{name}'"
             )
-            supabase.table("integration_crystals").insert(
-                {
-                    "user_id": user_id,
-                    "name": name,
-                    "key_insight": insight,
-                }
-            ).execute()
+            row = {"user_id": user_id, "name": name, "key_insight": insight}
+            if self.writer is not None:
+                await self.writer.enqueue_crystal(row)
+            else:
+                await self.db.insert("integration_crystals", row)
+            if self.cache is not None:
+                self.cache.set_memory_insight(user_id, insight)
             return True
         except Exception as e:
             logging.error(f"Error in create_integration_crystal: {e}")
             return False
 
+    def _run_sync(self, coro: Coroutine[Any, Any, T]) -> T:
+        async def _run() -> T:
+            try:
+                return await coro
+            finally:
+                # The event loop ends with this call, so drain queued writes.
+                if self.writer is not None:
+                    await self.writer.stop()
+
+        if self.db:
+            return self.db.run_sync(_run())
+        return asyncio.run(_run())
+
+    def get_session_sync(self, session_input: SessionInput) -> dict[str, Any]:
+        """Blocking variant of `get_session`."""
+        return self._run_sync(self.get_session(session_input))
+
+    def update_session_stage_sync(self, stage_update: StageUpdateInput) -> bool:
+        """Blocking variant of `update_session_stage`."""
+        return self._run_sync(self.update_session_stage(stage_update))
+
+    def create_integration_crystal_sync(self, crystal_input: CrystalInput) -> bool:
+        """Blocking variant of `create_integration_crystal`."""
+        return self._run_sync(self.create_integration_crystal(crystal_input))
+
 
 # 3.3. WisdomTool
-def retrieve_wisdom(query: str, top_k: int = 3) -> list[dict[str, str]]:
+def _knowledge_base() -> KnowledgeBase:
+    if onemind_config.knowledge_index_path:
+        return get_mapped_knowledge_base(onemind_config.knowledge_index_path)
+    return get_knowledge_base(onemind_config.knowledge_base_path)
+
+
+async def retrieve_wisdom(query: str, top_k: int = 3) -> list[dict[str, str]]:
     """
     Performs a RAG operation to retrieve wisdom from the knowledge base.
     This should be called during stage_2_integration to get inspiration.
     Args:
-        query: The query to search for in the vector database.
+        query: The query to search for in the knowledge base.
         top_k: The number of results to return.
     Returns:
-        A list of knowledge documents.
+        A list of knowledge documents, most relevant first.
     """
-    # Mock implementation. In a real scenario, this would query a vector DB.
     logging.info(f"Retrieving wisdom for query: '{query}' with top_k={top_k}")
+    # The search is CPU-bound; a thread keeps the event loop and other tool
+    # calls of the same response running.
+    results = await asyncio.to_thread(
+        _knowledge_base().search,
+        query,
+        top_k=top_k,
+        min_score=onemind_config.knowledge_min_score,
+    )
     return [
         {
-            "title": "Embracing Imperfection",
-            "content": "Perfectionism is often a shield for fear. The real goal is not to be flawless, but to be brave enough to start.",
-        },
-        {
-            "title": "The 5-Minute Rule",
-            "content": "If a task takes less than five minutes, do it immediately. For larger tasks, work on it for just five minutes. Starting is the hardest part.",
-        },
+            "id": chunk.id,
+            "title": chunk.title,
+            "content": chunk.core_concept,
+            "inquiry_exemplar": chunk.inquiry_exemplar,
+            "source": chunk.source,
+        }
+        for chunk, _ in results
     ]
 
 
+# --- Pre-Turn Hook ---
+# Session state the pre-turn hook fills in for the instruction template.
+STAGE_STATE_KEY = "current_stage"
+MEMORY_STATE_KEY = "memory_insight"
+SESSION_ID_STATE_KEY = "session_id"
+USER_ID_STATE_KEY = "user_id"
+# The fixed reply to a message that trips the crisis screen.
+CRISIS_RESPONSE = (
+    "我听到你现在可能非常痛苦，你的安全是最重要的。"
+    "请立即拨打 110 或 120，或联系当地的心理援助热线，"
+    "也请告诉身边一位你信任的人你现在的感受。你并不孤单。"
+)
+# The part of the instruction that changes from turn to turn. It follows the
+# static instruction, so that stays a cacheable prompt prefix.
+SESSION_CONTEXT = """
+# SESSION CONTEXT
+每轮对话开始前，系统已经完成了危机安全检查，并读取了会话，无需再调用工具获取：
+- 当前对话阶段 `current_stage`: {current_stage}
+- 长期记忆 `memory_insight`: {memory_insight}
+- 会话标识: session_id={session_id}, user_id={user_id}
+"""
+DIGEST_STATE_KEY = "conversation_digest"
+# Introduces the summaries of the turns compaction removed from the history.
+DIGEST_CONTEXT = """
+# EARLIER CONVERSATION
+较早的对话已按阶段压缩为以下摘要，其后的对话保持原文：
+"""
+# Tells the compaction model how to summarize the turns of one stage.
+SUMMARY_INSTRUCTION = """
+你负责为心灵伴侣“心一 (OneMind)”压缩较早的对话记录。
+你会收到对话阶段、该阶段已有的摘要，以及需要并入摘要的新对话。
+请输出更新后的摘要，用中文，不超过5句话，保留用户的卡点、内在冲突、已获得的洞见和承诺的行动，以及用户使用的关键原话。
+不要编造对话中没有的内容，只输出摘要本身。
+"""
+
+
+async def onemind_pre_turn(
+    callback_context: CallbackContext,
+) -> genai_types.Content | None:
+    """Screens the user message and loads the session before the model runs.
+
+    `check_crisis` and `MemoBaseTool.get_session` only depend on the message
+    and the session ids, so they run here, concurrently, instead of as two model
+    tool calls. The stage, memory insight and ids go into session state, from
+    where `SESSION_CONTEXT` reads them. A crisis hit ends the turn with
+    `CRISIS_RESPONSE` without calling the model.
+    """
+    session = callback_context._invocation_context.session
+    user_content = callback_context.user_content
+    user_text = "".join(
+        p.text for p in (user_content.parts or [] if user_content else []) if p.text
+    )
+    crisis, loaded = await asyncio.gather(
+        asyncio.to_thread(check_crisis, user_text),
+        memo_base_tool.get_session(
+            SessionInput(session_id=session.id, user_id=session.user_id)
+        ),
+    )
+    state = callback_context.state
+    state[STAGE_STATE_KEY] = loaded["stage"]
+    state[MEMORY_STATE_KEY] = loaded["memory_insight"]
+    state[SESSION_ID_STATE_KEY] = session.id
+    state[USER_ID_STATE_KEY] = session.user_id
+    trace.get_current_span().set_attributes(
+        {"onemind.pre_turn.crisis": crisis, "onemind.pre_turn.stage": loaded["stage"]}
+    )
+    if crisis:
+        return genai_types.Content(
+            role="model", parts=[genai_types.Part(text=CRISIS_RESPONSE)]
+        )
+    return None
+
+
+# --- Stage Routing ---
+def track_stage_update(
+    tool: BaseTool,
+    args: dict[str, Any],
+    tool_context: ToolContext,
+    tool_response: Any,
+) -> None:
+    """Mirrors a successful `update_session_stage` into session state.
+
+    Model calls later in the same turn are then routed, and their instruction
+    rendered, for the new stage.
+    """
+    if tool.name != "update_session_stage":
+        return None
+    result = (
+        tool_response.get("result")
+        if isinstance(tool_response, dict)
+        else tool_response
+    )
+    stage_update = args.get("stage_update") or {}
+    next_stage = _field(stage_update, "next_stage")
+    session_id = _field(stage_update, "session_id")
+    state = tool_context.state
+    if result is True and next_stage and session_id == state.get(SESSION_ID_STATE_KEY):
+        state[STAGE_STATE_KEY] = next_stage
+    return None
+
+
+# --- Conversation Compaction ---
+_session_context = state_template(SESSION_CONTEXT)
+
+
+async def onemind_context(context: ReadonlyContext) -> str:
+    """Renders `SESSION_CONTEXT` and the summaries of compacted turns."""
+    text = await _session_context(context)
+    lines = render(context.state.get(DIGEST_STATE_KEY), current_label="（进行中）")
+    if lines:
+        text += DIGEST_CONTEXT + "".join(f"- {line}\n" for line in lines)
+    return text
+
+
+# --- Response Cache ---
+def _is_user_text(content: genai_types.Content) -> bool:
+    parts = content.parts or []
+    return content.role == "user" and any(p.text for p in parts)
+
+
+def response_cache_key(
+    llm_request: LlmRequest, state: Mapping[str, Any]
+) -> tuple[str, str] | None:
+    """Returns the (context, prompt) a reply is cached under, or None to bypass.
+
+    Only the first model call of a session's first turn is cacheable, and only
+    when the pre-turn hook found no memory insight and the prompt is at most
+    `response_cache_max_prompt_chars` long; longer openers are personal and
+    rarely repeat. Replies that call a tool, such as `retrieve_wisdom` or a
+    stage update, are not cached. The context combines the model, the stage the
+    reply was generated for and the tools the model was offered.
+    """
+    contents = llm_request.contents
+    user_turns = [i for i, content in enumerate(contents) if _is_user_text(content)]
+    if user_turns != [len(contents) - 1]:
+        return None
+    if state.get(MEMORY_STATE_KEY) != NO_MEMORY_INSIGHT:
+        return None
+    prompt = "".join(p.text for p in contents[-1].parts or [] if p.text)
+    if len(prompt) > onemind_config.response_cache_max_prompt_chars:
+        return None
+    tools = ",".join(sorted(llm_request.tools_dict))
+    return f"{llm_request.model}|{state.get(STAGE_STATE_KEY)}|{tools}", prompt
+
+
+def response_cache_before_model(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> LlmResponse | None:
+    """Serves a cacheable reply from `response_cache`."""
+    assert response_cache is not None
+    key = response_cache_key(llm_request, callback_context.state.to_dict())
+    if key is None:
+        response_cache.bypass()
+        return None
+    cached = response_cache.get(*key)
+    span = trace.get_current_span()
+    span.set_attribute("onemind.response_cache.hit", cached is not None)
+    span.set_attributes(response_cache.span_attributes())
+    if cached is not None:
+        return LlmResponse.model_validate_json(cached)
+    while len(_response_cache_keys) >= _MAX_PENDING_RESPONSES:
+        del _response_cache_keys[next(iter(_response_cache_keys))]
+    _response_cache_keys[callback_context.invocation_id] = key
+    return None
+
+
+def response_cache_after_model(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> None:
+    """Caches a text reply to a request `response_cache_before_model` missed."""
+    assert response_cache is not None
+    if llm_response.partial:
+        return
+    key = _response_cache_keys.pop(callback_context.invocation_id, None)
+    if key is None or llm_response.error_code or not llm_response.content:
+        return
+    parts = [p for p in llm_response.content.parts or [] if not p.thought]
+    if not parts or not all(p.text and not p.function_call for p in parts):
+        return
+    # Cache hits cost no tokens, so usage is not replayed.
+    reply = LlmResponse(content=genai_types.Content(role="model", parts=parts))
+    response_cache.put(*key, reply.model_dump_json(exclude_none=True))
+
+
 # --- Agent Definition ---
 
-memo_base_tool = MemoBaseTool()
+session_cache = (
+    SessionStateCache(
+        max_size=onemind_config.session_cache_size,
+        ttl=onemind_config.session_cache_ttl,
+    )
+    if onemind_config.session_cache_size > 0
+    else None
+)
+write_behind_queue = (
+    WriteBehindQueue(
+        supabase,
+        max_size=onemind_config.write_behind_max_size,
+        flush_size=onemind_config.write_behind_flush_size,
+        flush_interval=onemind_config.write_behind_flush_interval,
+        hook=(
+            JsonlJournal(onemind_config.write_behind_journal_path)
+            if onemind_config.write_behind_journal_path
+            else None
+        ),
+    )
+    if supabase and onemind_config.write_behind
+    else None
+)
+memo_base_tool = MemoBaseTool(supabase, session_cache, write_behind_queue)
+
+_MAX_PENDING_RESPONSES = 1024
+# Cache keys of model calls in flight, by invocation id.
+_response_cache_keys: dict[str, tuple[str, str]] = {}
+response_cache = (
+    ResponseCache(
+        max_entries=onemind_config.response_cache_size,
+        max_bytes=onemind_config.response_cache_bytes,
+        similarity=onemind_config.response_cache_similarity,
+    )
+    if onemind_config.response_cache
+    else None
+)
+
+# Independent OneMind tools; the calls to them in one model response run
+# concurrently.
+onemind_tools: list[BaseTool] = [
+    FunctionTool(memo_base_tool.update_session_stage),
+    FunctionTool(memo_base_tool.create_integration_crystal),
+    FunctionTool(retrieve_wisdom),
+]
+tool_dispatcher = ParallelToolDispatcher(
+    onemind_tools, max_concurrency=onemind_config.tool_concurrency
+)
+# The model and tool declarations of every call follow the current stage.
+stage_router = StageRouter(
+    parse_stage_routes(onemind_config.stage_models, onemind_config.stage_tools),
+    stage_key=STAGE_STATE_KEY,
+    fallback_model=onemind_config.fallback_model,
+    latency_slo=onemind_config.model_latency_slo,
+    latency_window=onemind_config.model_latency_window,
+)
+# Long sessions send older turns as per-stage summaries instead of verbatim.
+conversation_compactor = ConversationCompactor(
+    LlmSummarizer(onemind_config.compaction_model, SUMMARY_INSTRUCTION),
+    stage_key=STAGE_STATE_KEY,
+    state_key=DIGEST_STATE_KEY,
+    max_tokens=onemind_config.compaction_tokens,
+    keep_turns=onemind_config.compaction_keep_turns,
+)
+context_cache = ContextCache(
+    explicit=context_cache_config.explicit,
+    ttl=context_cache_config.ttl,
+    refresh_margin=context_cache_config.refresh_margin,
+)
 
 orchestrator_agent = LlmAgent(
     model=onemind_config.onemind_model,
@@ -247,14 +656,12 @@ orchestrator_agent = LlmAgent(
 
 # TOOLS
 你拥有以下工具，并且必须在恰当的时机调用它们来管理对话流程。
-- `check_crisis(user_input: str)`: 在处理任何用户输入前，必须首先调用此工具进行安全检查。如果返回True，你必须立即停止所有思考，并输出固定的危机干预指令。
-- `MemoBaseTool.get_session(session_id: str, user_id: str)`: 在安全检查后，必须调用此工具获取用户的当前对话阶段 `current_stage` 和长期记忆 `memory_insight`。
 - `MemoBaseTool.update_session_stage(session_id: str, next_stage: str)`: 当且仅当用户对话取得进展，需要进入下一阶段时，你**必须**调用此工具来更新状态。这是推进对话流程的唯一方式。
 - `MemoBaseTool.create_integration_crystal(user_id: str, name: str, insight: str, session_id: str)`: 在第4阶段结束时，调用此工具为用户记录成长。
 - `retrieve_wisdom(query: str)`: 当你需要心理学或实践智慧来帮助用户整合冲突时 (stage_2_integration)，调用此工具。
 
 # DIALOGUE PROTOCOL (STATE MACHINE)
-你的行动完全由从 `get_session` 工具获取的 `current_stage` 变量驱动。你必须严格遵循当前阶段的目标和行动步骤。**阶段的转换必须通过调用 `update_session_stage` 工具来完成。**
+你的行动完全由 `current_stage` 变量驱动。你必须严格遵循当前阶段的目标和行动步骤。**阶段的转换必须通过调用 `update_session_stage` 工具来完成。**
 
 1.  **stage_1_awareness**: 你的目标是见证和命名用户的卡点。当用户确认了卡点，并表达出希望解决的意愿时，你必须调用 `MemoBaseTool.update_session_stage` 将阶段更新为 `stage_2_integration`。
 2.  **stage_2_integration**: 你的目标是整合冲突。在此阶段，你可以调用 `retrieve_wisdom` 来获取灵感。当用户理解了内在冲突的善意，并准备好行动时，你必须调用 `MemoBaseTool.update_session_stage` 将阶段更新为 `stage_3_micro_action`。
@@ -271,11 +678,21 @@ orchestrator_agent = LlmAgent(
 2.  【保持简短】回应必须在1-3句话之内。
 3.  【聚焦内在】绝对禁止给出具体的外部世界建议（如代码实现）。
 """,
-    tools=[
-        FunctionTool(check_crisis),
-        FunctionTool(memo_base_tool.get_session),
-        FunctionTool(memo_base_tool.update_session_stage),
-        FunctionTool(memo_base_tool.create_integration_crystal),
-        FunctionTool(retrieve_wisdom),
+    tools=[*onemind_tools],
+    before_agent_callback=onemind_pre_turn,
+    after_agent_callback=conversation_compactor.after_agent,
+    before_tool_callback=tool_dispatcher.before_tool,
+    after_tool_callback=track_stage_update,
+    # Routing comes first, so cached replies are keyed by the routed model.
+    # Compaction follows the response cache, which looks for first turns.
+    before_model_callback=[
+        stage_router.before_model,
+        *([response_cache_before_model] if response_cache else []),
+        conversation_compactor.before_model,
+    ],
+    after_model_callback=[
+        stage_router.after_model,
+        *([response_cache_after_model] if response_cache else []),
     ],
-)
\ No newline at end of file
+)
+context_cache.register(orchestrator_agent, onemind_context)
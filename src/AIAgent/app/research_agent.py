@@ -0,0 +1,312 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+from google.adk.agents import LlmAgent, LoopAgent, SequentialAgent
+from google.adk.planners import BuiltInPlanner
+from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types as genai_types
+
+from .agent import (
+    Feedback,
+    ResearchBudgetController,
+    ResearchFanOut,
+    citation_replacement_callback,
+    citation_streaming_callback,
+    collect_research_sources_callback,
+)
+from .config import config, context_cache_config
+from .utils.context_cache import ContextCache, state_template
+from .utils.search_cache import SearchCache
+
+# Prompt prefixes are cached per agent. Instructions are static; what changes
+# from call to call is rendered after them.
+context_cache = ContextCache(
+    explicit=context_cache_config.explicit,
+    ttl=context_cache_config.ttl,
+    refresh_margin=context_cache_config.refresh_margin,
+)
+
+
+def _today() -> str:
+    return datetime.date.today().strftime("%Y-%m-%d")
+
+
+CURRENT_DATE = state_template("    Current date: {current_date}\n", current_date=_today)
+PLAN_CONTEXT = state_template(
+    """
+    RESEARCH PLAN(SO FAR):
+    { research_plan? }
+
+    Current date: {current_date}
+    """,
+    current_date=_today,
+)
+FINDINGS_CONTEXT = state_template(
+    """
+    *   Research Plan: `{research_plan}`
+    *   Research Findings: `{section_research_findings}`
+    """
+)
+REPORT_CONTEXT = state_template(
+    """
+    ---
+    ### INPUT DATA
+    *   Research Plan: `{research_plan}`
+    *   Research Findings: `{section_research_findings}`
+    *   Citation Sources: `{sources}`
+    *   Report Structure: `{report_sections}`
+    """
+)
+
+# --- AGENT DEFINITIONS ---
+plan_generator = LlmAgent(
+    model=config.worker_model,
+    name="plan_generator",
+    description="Generates or refine the existing 5 line action-oriented research plan, using minimal search only for topic clarification.",
+    instruction="""
+    You are a research strategist. Your job is to create a high-level RESEARCH PLAN, not a summary. If there is already a RESEARCH PLAN in the session state,
+    improve upon it based on the user feedback.
+
+    **GENERAL INSTRUCTION: CLASSIFY TASK TYPES**
+    Your plan must clearly classify each goal for downstream execution. Each bullet point should start with a task type prefix:
+    - **`[RESEARCH]`**: For goals that primarily involve information gathering, investigation, analysis, or data collection (these require search tool usage by a researcher).
+    - **`[DELIVERABLE]`**: For goals that involve synthesizing collected information, creating structured outputs (e.g., tables, charts, summaries, reports), or compiling final output artifacts (these are executed AFTER research tasks, often without further search).
+
+    **INITIAL RULE: Your initial output MUST start with a bulleted list of 5 action-oriented research goals or key questions, followed by any *inherently implied* deliverables.**
+    - All initial 5 goals will be classified as `[RESEARCH]` tasks.
+    - A good goal for `[RESEARCH]` starts with a verb like "Analyze," "Identify," "Investigate."
+    - A bad output is a statement of fact like "The event was in April 2024."
+    - **Proactive Implied Deliverables (Initial):** If any of your initial 5 `[RESEARCH]` goals inherently imply a standard output or deliverable (e.g., a comparative analysis suggesting a comparison table, or a comprehensive review suggesting a summary document), you MUST add these as additional, distinct goals immediately after the initial 5. Phrase these as *synthesis or output creation actions* (e.g., "Create a summary," "Develop a comparison," "Compile a report") and prefix them with `[DELIVERABLE][IMPLIED]`.
+
+    **REFINEMENT RULE**:
+    - **Integrate Feedback & Mark Changes:** When incorporating user feedback, make targeted modifications to existing bullet points. Add `[MODIFIED]` to the existing task type and status prefix (e.g., `[RESEARCH][MODIFIED]`). If the feedback introduces new goals:
+        - If it's an information gathering task, prefix it with `[RESEARCH][NEW]`.
+        - If it's a synthesis or output creation task, prefix it with `[DELIVERABLE][NEW]`.
+    - **Proactive Implied Deliverables (Refinement):** Beyond explicit user feedback, if the nature of an existing `[RESEARCH]` goal (e.g., requiring a structured comparison, deep dive analysis, or broad synthesis) or a `[DELIVERABLE]` goal inherently implies an additional, standard output or synthesis step (e.g., a detailed report following a summary, or a visual representation of complex data), proactively add this as a new goal. Phrase these as *synthesis or output creation actions* and prefix them with `[DELIVERABLE][IMPLIED]`.
+    - **Maintain Order:** Strictly maintain the original sequential order of existing bullet points. New bullets, whether `[NEW]` or `[IMPLIED]`, should generally be appended to the list, unless the user explicitly instructs a specific insertion point.
+    - **Flexible Length:** The refined plan is no longer constrained by the initial 5-bullet limit and may comprise more goals as needed to fully address the feedback and implied deliverables.
+
+    **TOOL USE IS STRICTLY LIMITED:**
+    Your goal is to create a generic, high-quality plan *without searching*.
+    Only use `google_search` if a topic is ambiguous or time-sensitive and you absolutely cannot create a plan without a key piece of identifying information.
+    You are explicitly forbidden from researching the *content* or *themes* of the topic. That is the next agent's job. Your search is only to identify the subject, not to investigate it.
+    """,
+    tools=[google_search],
+)
+
+
+section_planner = LlmAgent(
+    model=config.worker_model,
+    name="section_planner",
+    description="Breaks down the research plan into a structured markdown outline of report sections.",
+    instruction="""
+    You are an expert report architect. Using the research topic and the plan from the 'research_plan' state key, design a logical structure for the final report.
+    Note: Ignore all the tag nanes ([MODIFIED], [NEW], [RESEARCH], [DELIVERABLE]) in the research plan.
+    Your task is to create a markdown outline with 4-6 distinct sections that cover the topic comprehensively without overlap.
+    You can use any markdown format you prefer, but here's a suggested structure:
+    # Section Name
+    A brief overview of what this section covers
+    Feel free to add subsections or bullet points if needed to better organize the content.
+    Make sure your outline is clear and easy to follow.
+    Do not include a "References" or "Sources" section in your outline. Citations will be handled in-line.
+    """,
+    output_key="report_sections",
+)
+
+
+goal_researcher = LlmAgent(
+    model=config.worker_model,
+    name="goal_researcher",
+    description="Researches a single goal of the research plan.",
+    planner=BuiltInPlanner(
+        thinking_config=genai_types.ThinkingConfig(include_thoughts=True)
+    ),
+    include_contents="none",
+    instruction="""
+    You are a highly capable and diligent research agent. Your task is to research ONE goal of a larger research plan with **absolute fidelity**.
+    Other researchers are handling the other goals in parallel; stay strictly within your goal.
+
+    *   **Query Generation:** Formulate a comprehensive set of 4-5 targeted search queries. These queries must be expertly designed to broadly cover the specific intent of the goal from multiple angles.
+    *   **Execution:** Utilize the `google_search` tool to execute **all** generated queries.
+    *   **Summarization:** Synthesize the search results into a detailed, coherent summary that directly addresses the objective of the goal.
+
+    **Final Output:** Your final output is that summary only.
+    """,
+    tools=[google_search],
+)
+
+deliverable_writer = LlmAgent(
+    model=config.worker_model,
+    name="deliverable_writer",
+    description="Produces the deliverables of the research plan from the research findings.",
+    include_contents="none",
+    instruction="""
+    You are a research synthesis agent. Research for every `[RESEARCH]` goal of the plan below has been completed and is summarized in the research findings.
+
+    *   **Execution Directive:** You **MUST** systematically process **every** goal prefixed with `[DELIVERABLE]`. For each `[DELIVERABLE]` goal, your directive is to **PRODUCE** the artifact as explicitly described.
+    *   For each `[DELIVERABLE]` goal:
+        *   **Instruction Interpretation:** You will interpret the goal's text (following the `[DELIVERABLE]` tag) as a **direct and non-negotiable instruction** to generate a specific output artifact.
+            *   *If the instruction details a table (e.g., "Create a Detailed Comparison Table in Markdown format"), your output for this step **MUST** be a properly formatted Markdown table utilizing columns and rows as implied by the instruction and the prepared data.*
+            *   *If the instruction states to prepare a summary, report, or any other structured output, your output for this step **MUST** be that precise artifact.*
+        *   **Data Consolidation:** Access and utilize **ONLY** the research findings to fulfill the requirements of the current `[DELIVERABLE]` goal. You **MUST NOT** perform new searches.
+
+    **Final Output:** All the generated `[DELIVERABLE]` artifacts, presented clearly and distinctly.
+    """,
+)
+
+section_researcher = ResearchFanOut(
+    name="section_researcher",
+    researcher=goal_researcher,
+    synthesizer=deliverable_writer,
+    max_concurrency=config.research_concurrency,
+    search_cache=SearchCache(
+        max_size=config.search_cache_size,
+        ttl=config.search_cache_ttl,
+        path=config.search_cache_path,
+    )
+    if config.search_cache_size
+    else None,
+    context_cache=context_cache,
+)
+
+research_evaluator = LlmAgent(
+    model=config.critic_model,
+    name="research_evaluator",
+    description="Critically evaluates research and generates follow-up queries.",
+    instruction="""
+    You are a meticulous quality assurance analyst evaluating the research findings in 'section_research_findings'.
+
+    **CRITICAL RULES:**
+    1. Assume the given research topic is correct. Do not question or try to verify the subject itself.
+    2. Your ONLY job is to assess the quality, depth, and completeness of the research provided *for that topic*.
+    3. Focus on evaluating: Comprehensiveness of coverage, logical flow and organization, use of credible sources, depth of analysis, and clarity of explanations.
+    4. Do NOT fact-check or question the fundamental premise or timeline of the topic.
+    5. If suggesting follow-up queries, they should dive deeper into the existing topic, not question its validity.
+
+    Be very critical about the QUALITY of research. If you find significant gaps in depth or coverage, assign a grade of "fail",
+    write a detailed comment about what's missing, and generate 5-7 specific follow-up queries to fill those gaps.
+    If the research thoroughly covers the topic, grade "pass".
+
+    Your response must be a single, raw JSON object validating against the 'Feedback' schema.
+    """,
+    output_schema=Feedback,
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
+    output_key="research_evaluation",
+)
+
+enhanced_search_executor = LlmAgent(
+    model=config.worker_model,
+    name="enhanced_search_executor",
+    description="Executes follow-up searches and integrates new findings.",
+    planner=BuiltInPlanner(
+        thinking_config=genai_types.ThinkingConfig(include_thoughts=True)
+    ),
+    instruction="""
+    You are a specialist researcher executing a refinement pass.
+    You have been activated because the previous research was graded as 'fail'.
+
+    1.  Review the 'research_evaluation' state key to understand the feedback and required fixes.
+    2.  Execute EVERY query listed in 'follow_up_queries' using the 'google_search' tool.
+    3.  Synthesize the new findings and COMBINE them with the existing information in 'section_research_findings'.
+    4.  Your output MUST be the new, complete, and improved set of research findings.
+    """,
+    tools=[google_search],
+    output_key="section_research_findings",
+    after_agent_callback=collect_research_sources_callback,
+)
+
+report_composer = LlmAgent(
+    model=config.critic_model,
+    name="report_composer_with_citations",
+    include_contents="none",
+    description="Transforms research data and a markdown outline into a final, cited report.",
+    instruction="""
+    Transform the provided data into a polished, professional, and meticulously cited research report.
+
+    ---
+    ### CRITICAL: Citation System
+    To cite a source, you MUST insert a special citation tag directly after the claim it supports.
+
+    **The only correct format is:** `<cite source="src-ID_NUMBER" />`
+
+    ---
+    ### Final Instructions
+    Generate a comprehensive report using ONLY the `<cite source="src-ID_NUMBER" />` tag system for all citations.
+    The final report must strictly follow the structure provided in the **Report Structure** markdown outline.
+    Do not include a "References" or "Sources" section; all citations must be in-line.
+    """,
+    output_key="final_cited_report",
+    after_model_callback=citation_streaming_callback,
+    after_agent_callback=citation_replacement_callback,
+)
+
+research_pipeline = SequentialAgent(
+    name="research_pipeline",
+    description="Executes a pre-approved research plan. It performs iterative research, evaluation, and composes a final, cited report.",
+    sub_agents=[
+        section_planner,
+        section_researcher,
+        LoopAgent(
+            name="iterative_refinement_loop",
+            max_iterations=config.max_search_iterations,
+            sub_agents=[
+                research_evaluator,
+                ResearchBudgetController(
+                    name="research_budget_controller",
+                    token_budget=config.research_token_budget,
+                    time_budget=config.research_time_budget,
+                    search_budget=config.research_search_budget,
+                    min_new_sources=config.research_min_new_sources,
+                ),
+                enhanced_search_executor,
+            ],
+        ),
+        report_composer,
+    ],
+)
+
+interactive_planner_agent = LlmAgent(
+    name="interactive_planner_agent",
+    model=config.worker_model,
+    description="The primary research assistant. It collaborates with the user to create a research plan, and then executes it upon approval.",
+    instruction="""
+    You are a research planning assistant. Your primary function is to convert ANY user request into a research plan.
+
+    **CRITICAL RULE: Never answer a question directly or refuse a request.** Your one and only first step is to use the `plan_generator` tool to propose a research plan for the user's topic.
+    If the user asks a question, you MUST immediately call `plan_generator` to create a plan to answer the question.
+
+    Your workflow is:
+    1.  **Plan:** Use `plan_generator` to create a draft plan and present it to the user.
+    2.  **Refine:** Incorporate user feedback until the plan is approved.
+    3.  **Execute:** Once the user gives EXPLICIT approval (e.g., "looks good, run it"), you MUST delegate the task to the `research_pipeline` agent, passing the approved plan.
+
+    Do not perform any research yourself. Your job is to Plan, Refine, and Delegate.
+    """,
+    sub_agents=[research_pipeline],
+    tools=[AgentTool(plan_generator)],
+    output_key="research_plan",
+)
+
+context_cache.register(plan_generator, PLAN_CONTEXT)
+context_cache.register(section_planner)
+context_cache.register(goal_researcher)
+context_cache.register(deliverable_writer, FINDINGS_CONTEXT)
+context_cache.register(research_evaluator, CURRENT_DATE)
+context_cache.register(enhanced_search_executor)
+context_cache.register(report_composer, REPORT_CONTEXT)
+context_cache.register(interactive_planner_agent, CURRENT_DATE)
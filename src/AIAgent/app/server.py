@@ -12,54 +12,169 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import functools
+import logging
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-import google.auth
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from google.adk.cli.fast_api import get_fast_api_app
 from google.cloud import logging as google_cloud_logging
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider, export
 
+from app.config import get_project_id, server_config
+from app.onemind_agent import memo_base_tool, supabase
+from app.utils.feedback import (
+    FeedbackBatcher,
+    FeedbackSink,
+    SupabaseFeedbackSink,
+    ThreadedSink,
+)
 from app.utils.gcs import create_bucket_if_not_exists
-from app.utils.tracing import CloudTraceLoggingSpanExporter
+from app.utils.session_service import (
+    SupabaseSessionService,
+    fast_api_session_service,
+)
+from app.utils.tracing import (
+    CloudLoggingSink,
+    CloudTraceLoggingSpanExporter,
+    JsonlSink,
+    LazySpanExporter,
+    SpanLogExporter,
+)
 from app.utils.typing import Feedback
 
-_, project_id = google.auth.default()
-logging_client = google_cloud_logging.Client()
-logger = logging_client.logger(__name__)
+
+@functools.cache
+def get_logger() -> google_cloud_logging.Logger:
+    """Returns the Cloud Logging logger, creating its client on first use."""
+    return google_cloud_logging.Client().logger(__name__)
+
+
+def create_artifact_bucket() -> None:
+    """Creates the GCS artifact bucket if it does not exist."""
+    create_bucket_if_not_exists(
+        bucket_name=bucket_name, project=get_project_id(), location="us-central1"
+    )
+
+
 allow_origins = (
     os.getenv("ALLOW_ORIGINS", "").split(",") if os.getenv("ALLOW_ORIGINS") else None
 )
 
-bucket_name = f"gs://{project_id}-onemind-logs-data"
-create_bucket_if_not_exists(
-    bucket_name=bucket_name, project=project_id, location="us-central1"
-)
+# With lazy startup, importing this module makes no Google Cloud calls (unless
+# ARTIFACT_SERVICE_URI names a GCS bucket, whose client ADK creates with the
+# app): the bucket is provisioned in the lifespan hook, and the logging client
+# and trace exporter are created on first use.
+bucket_name = server_config.artifact_service_uri
+if not server_config.lazy_startup:
+    get_logger()
+    bucket_name = bucket_name or f"gs://{get_project_id()}-onemind-logs-data"
+    create_artifact_bucket()
+
+span_exporter: export.SpanExporter
+if server_config.span_log_path:
+    span_exporter = SpanLogExporter([JsonlSink(server_config.span_log_path)])
+elif server_config.lazy_startup:
+    span_exporter = LazySpanExporter(CloudTraceLoggingSpanExporter)
+else:
+    span_exporter = CloudTraceLoggingSpanExporter()
 
 provider = TracerProvider()
-processor = export.BatchSpanProcessor(CloudTraceLoggingSpanExporter())
+processor = export.BatchSpanProcessor(span_exporter)
 provider.add_span_processor(processor)
 trace.set_tracer_provider(provider)
 
-AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-# In-memory session configuration - no persistent storage
-session_service_uri = None
-
-app: FastAPI = get_fast_api_app(
-    agents_dir=AGENT_DIR,
-    web=True,
-    artifact_service_uri=bucket_name,
-    allow_origins=allow_origins,
-    session_service_uri=session_service_uri,
+
+def _feedback_sink() -> FeedbackSink:
+    if server_config.feedback_sink == "jsonl":
+        return ThreadedSink(lambda: JsonlSink(server_config.feedback_log_path))
+    if server_config.feedback_sink == "supabase":
+        if supabase is None:
+            raise ValueError(
+                "FEEDBACK_SINK=supabase needs SUPABASE_URL and SUPABASE_KEY."
+            )
+        return SupabaseFeedbackSink(supabase)
+    return ThreadedSink(lambda: CloudLoggingSink(get_logger()))
+
+
+# Maximum number of records per /feedback/batch request.
+MAX_FEEDBACK_BATCH = 500
+feedback_batcher = FeedbackBatcher(
+    _feedback_sink(),
+    max_size=server_config.feedback_max_size,
+    flush_size=server_config.feedback_flush_size,
+    flush_interval=server_config.feedback_flush_interval,
+    max_attempts=server_config.feedback_max_attempts,
 )
+
+
+def _session_service() -> SupabaseSessionService | None:
+    if server_config.session_service != "supabase":
+        # In-memory sessions: no persistent storage, one process only.
+        return None
+    if supabase is None:
+        raise ValueError(
+            "SESSION_SERVICE=supabase needs SUPABASE_URL and SUPABASE_KEY."
+        )
+    return SupabaseSessionService(
+        supabase,
+        max_events=server_config.session_max_events,
+        cache_size=server_config.session_service_cache_size,
+    )
+
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+session_service = _session_service()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if server_config.lazy_startup and bucket_name.startswith("gs://"):
+        try:
+            await asyncio.to_thread(create_artifact_bucket)
+        except Exception:
+            logging.exception(f"Failed to provision artifact bucket {bucket_name}.")
+    yield
+    # One failing shutdown step must not keep the others from flushing.
+    try:
+        await feedback_batcher.stop()
+    except Exception:
+        logging.exception("Failed to flush feedback on shutdown.")
+    # Flush queued stage updates and crystals before the instance shuts down.
+    if memo_base_tool.writer is not None:
+        try:
+            await memo_base_tool.writer.stop()
+        except Exception:
+            logging.exception("Failed to flush queued session writes on shutdown.")
+
+
+with fast_api_session_service(session_service) as session_service_uri:
+    app: FastAPI = get_fast_api_app(
+        agents_dir=AGENT_DIR,
+        web=True,
+        artifact_service_uri=bucket_name or None,
+        allow_origins=allow_origins,
+        session_service_uri=session_service_uri,
+        lifespan=lifespan,
+    )
 app.title = "onemind"
 app.description = "API for interacting with the Agent onemind"
 
 
+def _submit_feedback(feedback: list[Feedback]) -> None:
+    if not feedback_batcher.submit([f.model_dump() for f in feedback]):
+        raise HTTPException(
+            status_code=503, detail="Feedback buffer is full, retry later."
+        )
+
+
 @app.post("/feedback")
-def collect_feedback(feedback: Feedback) -> dict[str, str]:
-    """Collect and log feedback.
+async def collect_feedback(feedback: Feedback) -> dict[str, str]:
+    """Collect feedback; it is logged in the background.
 
     Args:
         feedback: The feedback data to log
@@ -67,10 +182,29 @@ def collect_feedback(feedback: Feedback) -> dict[str, str]:
     Returns:
         Success message
     """
-    logger.log_struct(feedback.model_dump(), severity="INFO")
+    _submit_feedback([feedback])
     return {"status": "success"}
 
 
+@app.post("/feedback/batch")
+async def collect_feedback_batch(feedback: list[Feedback]) -> dict[str, str | int]:
+    """Collect several pieces of feedback, e.g. queued offline by the app.
+
+    Args:
+        feedback: The feedback data to log, at most `MAX_FEEDBACK_BATCH` items
+
+    Returns:
+        Success message and the number of accepted items
+    """
+    if len(feedback) > MAX_FEEDBACK_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_FEEDBACK_BATCH} feedback items per request.",
+        )
+    _submit_feedback(feedback)
+    return {"status": "success", "count": len(feedback)}
+
+
 # Main execution
 if __name__ == "__main__":
     import uvicorn
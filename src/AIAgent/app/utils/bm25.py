@@ -0,0 +1,162 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import re
+import unicodedata
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+# ASCII words are terms; other letter runs (CJK has no word boundaries) are
+# split into overlapping character bigrams, or kept whole if one character.
+_TOKEN_RE = re.compile(r"[0-9a-z]+|[^\W0-9a-z_]+")
+
+
+def terms(text: str) -> list[str]:
+    """Splits text into BM25 terms."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    out: list[str] = []
+    for token in _TOKEN_RE.findall(text):
+        if token.isascii() or len(token) == 1:
+            out.append(token)
+        else:
+            out.extend(token[i : i + 2] for i in range(len(token) - 1))
+    return out
+
+
+class BM25Index:
+    """BM25 over weighted fields, with array-backed postings.
+
+    Postings are stored in CSR form: the documents of term `t` are
+    `docs[ptr[t]:ptr[t + 1]]`, in ascending order. Each posting stores its
+    precomputed BM25 impact, so a query only gathers and adds float32 values.
+    Field weights scale term frequencies before saturation (a simplified
+    BM25F), which lets `tags` dominate as the RAG SOP asks.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Sequence[str],
+        ptr: np.ndarray,
+        docs: np.ndarray,
+        weights: np.ndarray,
+        num_docs: int,
+    ) -> None:
+        """
+        Args:
+            vocabulary: Terms, sorted, so lookups can bisect without a dict.
+            ptr: int64[len(vocabulary) + 1] offsets into `docs` and `weights`.
+            docs: uint32 document numbers.
+            weights: float32 BM25 impact of each posting.
+            num_docs: Number of indexed documents.
+        """
+        self.vocabulary = vocabulary
+        self.ptr = ptr
+        self.docs = docs
+        self.weights = weights
+        self.num_docs = num_docs
+
+    @classmethod
+    def build(
+        cls,
+        documents: Iterable[Sequence[tuple[str, float]]],
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> "BM25Index":
+        """Indexes documents given as (field text, field weight) pairs."""
+        term_ids: dict[str, int] = {}
+        rows: list[int] = []
+        cols: list[int] = []
+        freqs: list[float] = []
+        lengths: list[float] = []
+        for number, fields in enumerate(documents):
+            counts: dict[str, float] = {}
+            for text, weight in fields:
+                for term in terms(text):
+                    counts[term] = counts.get(term, 0.0) + weight
+            lengths.append(sum(counts.values()))
+            for term, freq in counts.items():
+                rows.append(term_ids.setdefault(term, len(term_ids)))
+                cols.append(number)
+                freqs.append(freq)
+        num_docs = len(lengths)
+
+        # Renumber terms in sorted order and group postings by term.
+        vocabulary = sorted(term_ids)
+        rank = np.empty(len(term_ids), dtype=np.int64)
+        rank[[term_ids[t] for t in vocabulary]] = np.arange(len(vocabulary))
+        term_of = rank[np.asarray(rows, dtype=np.int64)]
+        order = np.argsort(term_of, kind="stable")
+        term_of = term_of[order]
+        docs = np.asarray(cols, dtype=np.uint32)[order]
+        tf = np.asarray(freqs, dtype=np.float32)[order]
+
+        ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_of, minlength=len(vocabulary)), out=ptr[1:])
+        df = np.diff(ptr).astype(np.float32)
+        idf = np.log1p((num_docs - df + 0.5) / (df + 0.5))
+
+        doc_len = np.asarray(lengths, dtype=np.float32)
+        avg_len = float(doc_len.mean()) if num_docs else 1.0
+        norm = k1 * (1 - b + b * doc_len[docs] / avg_len)
+        weights = (idf[term_of] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(vocabulary, ptr, docs, weights, num_docs)
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def _term_id(self, term: str) -> int | None:
+        position = bisect.bisect_left(self.vocabulary, term)
+        if position < len(self.vocabulary) and self.vocabulary[position] == term:
+            return position
+        return None
+
+    def search(self, query: str, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Scores documents against a query.
+
+        Returns:
+            (docs, scores) of up to `top_k` documents with a positive score,
+            best first.
+        """
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        for term in set(terms(query)):
+            term_id = self._term_id(term)
+            if term_id is None:
+                continue
+            start, end = self.ptr[term_id], self.ptr[term_id + 1]
+            # Documents are unique within a posting list, so no np.add.at.
+            scores[self.docs[start:end]] += self.weights[start:end]
+
+        candidates = np.flatnonzero(scores)[: None if top_k > 0 else 0]
+        if len(candidates) > top_k:
+            best = np.argpartition(scores[candidates], len(candidates) - top_k)
+            candidates = candidates[best[len(candidates) - top_k :]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return ranked, scores[ranked]
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[int]], k: int = 60
+) -> list[tuple[int, float]]:
+    """Fuses ranked lists of document numbers, best first.
+
+    Each list contributes 1 / (k + rank) per document, so documents ranked
+    well by several retrievers rise to the top without comparing raw scores.
+    """
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))
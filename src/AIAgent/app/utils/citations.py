@@ -0,0 +1,111 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import re
+from collections.abc import Mapping
+from typing import Any
+
+CITE_TAG = re.compile(r'<cite\s+source\s*=\s*["\']?\s*(src-\d+)\s*["\']?\s*/>')
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([.,;:])")
+# Text from a '<' that may still grow into a CITE_TAG match.
+_TAG_PREFIX = re.compile(r"<(?:c(?:i(?:t(?:e(?:\s[\s\w=\"'-]*/?)?)?)?)?)?")
+
+DEFAULT_MAX_LOOKAHEAD = 128
+
+
+class CitationRewriter:
+    """Rewrites `<cite source="src-N"/>` tags in streamed text into Markdown links.
+
+    Text is fed in arbitrary chunks and each call returns the rewritten text that
+    is final so far. Two things are held back between chunks: a trailing `<...`
+    that could still become a citation tag, and trailing whitespace that would
+    be dropped if the next chunk starts with punctuation. Both are bounded by
+    `max_lookahead` characters; past that the text is emitted as is. The
+    concatenated output of `feed` and `flush` equals `rewrite_citations` on the
+    whole text.
+
+    Attributes:
+        consumed (int): Number of characters fed so far.
+    """
+
+    def __init__(
+        self,
+        sources: Mapping[str, Mapping[str, Any]],
+        max_lookahead: int = DEFAULT_MAX_LOOKAHEAD,
+    ):
+        self._sources = sources
+        self._max_lookahead = max_lookahead
+        self._tag_tail = ""
+        self._space_tail = ""
+        self._emitted: list[str] = []
+        self.consumed = 0
+
+    @property
+    def text(self) -> str:
+        """All rewritten text emitted so far."""
+        return "".join(self._emitted)
+
+    def feed(self, chunk: str) -> str:
+        """Consumes a chunk of raw text and returns the rewritten text now final."""
+        self.consumed += len(chunk)
+        text = self._tag_tail + chunk
+        hold = self._tag_hold(text)
+        self._tag_tail = text[hold:]
+        return self._emit(CITE_TAG.sub(self._replace, text[:hold]), final=False)
+
+    def flush(self) -> str:
+        """Returns whatever is still held back; call once the stream has ended."""
+        # The held tail has no closing '>', so it can only be literal text.
+        text, self._tag_tail = self._tag_tail, ""
+        return self._emit(text, final=True)
+
+    def _tag_hold(self, text: str) -> int:
+        start = text.rfind("<")
+        if start == -1 or len(text) - start > self._max_lookahead:
+            return len(text)
+        return start if _TAG_PREFIX.fullmatch(text, start) else len(text)
+
+    def _emit(self, text: str, final: bool) -> str:
+        text = _SPACE_BEFORE_PUNCT.sub(r"\1", self._space_tail + text)
+        body = text if final else text.rstrip()
+        if len(text) - len(body) > self._max_lookahead:
+            body = text
+        self._space_tail = text[len(body) :]
+        self._emitted.append(body)
+        return body
+
+    def _replace(self, match: re.Match) -> str:
+        short_id = match.group(1)
+        if not (source_info := self._sources.get(short_id)):
+            logging.warning(f"Invalid citation tag found and removed: {match.group(0)}")
+            return ""
+        display_text = source_info.get("title", source_info.get("domain", short_id))
+        return f" [{display_text}]({source_info['url']})"
+
+
+def rewrite_citations(text: str, sources: Mapping[str, Mapping[str, Any]]) -> str:
+    """Rewrites all citation tags in a complete text.
+
+    Args:
+        text (str): Text containing `<cite source="src-N"/>` tags.
+        sources (Mapping): Source information keyed by short id, as collected in
+            the `sources` state key.
+
+    Returns:
+        str: The text with tags replaced by Markdown links and the whitespace
+            before punctuation removed.
+    """
+    rewriter = CitationRewriter(sources)
+    return rewriter.feed(text) + rewriter.flush()
@@ -0,0 +1,287 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import math
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.events import Event
+from google.adk.models import BaseLlm, LlmRequest
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from opentelemetry import trace
+
+# Writes the summary of a stage: (stage, previous summary, new transcript).
+Summarizer = Callable[[str, str, str], Awaitable[str]]
+
+
+def _text(content: types.Content | None) -> str:
+    parts = content.parts or [] if content else []
+    return "".join(p.text for p in parts if p.text and not p.thought)
+
+
+def _is_user_turn(event: Event) -> bool:
+    return event.author == "user" and bool(_text(event.content))
+
+
+def _is_user_text(content: types.Content) -> bool:
+    return content.role == "user" and any(p.text for p in content.parts or [])
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly counts the tokens of `text`, about one per CJK character."""
+    return math.ceil(len(text.encode()) / 4)
+
+
+def transcript(events: list[Event]) -> str:
+    """Renders the text of `events` as `author: text` lines."""
+    lines = []
+    for event in events:
+        if not event.partial and (text := _text(event.content)):
+            lines.append(f"{event.author}: {text}")
+    return "\n".join(lines)
+
+
+class LlmSummarizer:
+    """Summarizes a stage of a conversation with a model."""
+
+    def __init__(self, model: BaseLlm | str, instruction: str) -> None:
+        """
+        Args:
+            model: The model, or a model name for ADK's model registry.
+            instruction: System instruction telling the model how to summarize.
+        """
+        self.model = model
+        self.instruction = instruction
+
+    def _llm(self) -> BaseLlm:
+        if isinstance(self.model, str):
+            self.model = LLMRegistry.new_llm(self.model)
+        return self.model
+
+    async def __call__(self, stage: str, previous: str, new_turns: str) -> str:
+        llm = self._llm()
+        prompt = (
+            f"Stage: {stage}\n\nPrevious summary:\n{previous or '-'}\n\n"
+            f"New turns:\n{new_turns}"
+        )
+        request = LlmRequest(
+            model=llm.model,
+            contents=[types.Content(role="user", parts=[types.Part(text=prompt)])],
+            config=types.GenerateContentConfig(system_instruction=self.instruction),
+        )
+        summary = ""
+        async for response in llm.generate_content_async(request):
+            if not response.partial:
+                summary += _text(response.content)
+        return summary.strip()
+
+
+@dataclass
+class CompactionMetrics:
+    """Counters for `ConversationCompactor`.
+
+    Attributes:
+        runs: Turns after which older turns were summarized.
+        turns_compacted: User turns folded into a summary.
+        summaries: Summarizer calls.
+        errors: Summarizer calls that failed; the turns stay verbatim.
+        contents_dropped: Contents kept out of model requests.
+    """
+
+    runs: int = 0
+    turns_compacted: int = 0
+    summaries: int = 0
+    errors: int = 0
+    contents_dropped: int = 0
+
+
+class ConversationCompactor:
+    """Replaces the older turns of a long conversation with per-stage summaries.
+
+    After a turn whose prompt exceeded `max_tokens`, `after_agent` summarizes
+    every turn but the last `keep_turns`. Turns are grouped by the stage they
+    started in. A stage the conversation has moved past collapses into a fixed
+    digest. The turns of the current stage are folded into its rolling summary,
+    which is refreshed from the previous summary and the new turns rather than
+    from the whole stage.
+
+    The digest lives in session state under `state_key`:
+
+        {"stages": [{"stage": ..., "summary": ...}, ...],
+         "current": {"stage": ..., "summary": ...} | None,
+         "covered_until": <timestamp of the last summarized event>}
+
+    `before_model` drops the summarized turns from model requests. The agent's
+    instruction is expected to render the digest, e.g. with `render`.
+    """
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        *,
+        stage_key: str,
+        state_key: str = "conversation_digest",
+        max_tokens: int = 8000,
+        keep_turns: int = 4,
+    ) -> None:
+        """
+        Args:
+            summarizer: Writes the summary of a stage.
+            stage_key: Session state key holding the current stage.
+            state_key: Session state key the digest is stored under.
+            max_tokens: Prompt tokens above which older turns are summarized;
+                0 disables compaction.
+            keep_turns: Most recent user turns always kept verbatim.
+        """
+        self.summarizer = summarizer
+        self.stage_key = stage_key
+        self.state_key = state_key
+        self.max_tokens = max_tokens
+        self.keep_turns = max(keep_turns, 1)
+        self.metrics = CompactionMetrics()
+
+    def _turns(self, events: list[Event]) -> list[tuple[str, list[Event]]]:
+        """Splits events into user turns, each with the stage it started in."""
+        turns: list[tuple[str, list[Event]]] = []
+        stage = ""
+        for event in events:
+            if _is_user_turn(event):
+                turns.append((stage, [event]))
+            elif turns:
+                turns[-1][1].append(event)
+            new_stage = str(event.actions.state_delta.get(self.stage_key) or "")
+            if not new_stage:
+                continue
+            if turns and not any(e.content for e in turns[-1][1][1:]):
+                # Set before the model replied, e.g. by a pre-turn hook.
+                turns[-1] = (new_stage, turns[-1][1])
+            stage = new_stage
+        return turns
+
+    def _prompt_tokens(self, events: list[Event], covered_until: float) -> int:
+        for event in reversed(events):
+            usage = event.usage_metadata
+            if usage is not None and usage.prompt_token_count:
+                return usage.prompt_token_count
+        return estimate_tokens(
+            transcript([e for e in events if e.timestamp > covered_until])
+        )
+
+    async def after_agent(self, callback_context: CallbackContext) -> None:
+        """Summarizes older turns once the conversation is over `max_tokens`."""
+        if self.max_tokens <= 0:
+            return None
+        state = callback_context.state
+        digest: Mapping[str, Any] = state.get(self.state_key) or {}
+        covered_until = float(digest.get("covered_until", 0.0))
+        events = callback_context._invocation_context.session.events
+        tokens = self._prompt_tokens(events, covered_until)
+        if tokens <= self.max_tokens:
+            return None
+        turns = [
+            (stage, turn)
+            for stage, turn in self._turns(events)
+            if turn[0].timestamp > covered_until
+        ]
+        if len(turns) <= self.keep_turns:
+            return None
+        compacted, kept = turns[: -self.keep_turns], turns[-self.keep_turns :]
+        stages = list(digest.get("stages", []))
+        current = digest.get("current")
+        groups: list[tuple[str, list[Event]]] = []
+        for stage, turn in compacted:
+            if groups and groups[-1][0] == stage:
+                groups[-1][1].extend(turn)
+            else:
+                groups.append((stage, list(turn)))
+
+        try:
+            for stage, group in groups:
+                if current and current["stage"] != stage:
+                    stages.append(current)
+                    current = None
+                previous = current["summary"] if current else ""
+                summary = await self.summarizer(stage, previous, transcript(group))
+                self.metrics.summaries += 1
+                current = {"stage": stage, "summary": summary}
+        except Exception as e:
+            logging.warning(f"Conversation compaction failed: {e}")
+            self.metrics.errors += 1
+            return None
+        if current and all(stage != current["stage"] for stage, _ in kept):
+            # The conversation has moved past this stage.
+            stages.append(current)
+            current = None
+
+        state[self.state_key] = {
+            "stages": stages,
+            "current": current,
+            "covered_until": compacted[-1][1][-1].timestamp,
+        }
+        self.metrics.runs += 1
+        self.metrics.turns_compacted += len(compacted)
+        trace.get_current_span().set_attributes(
+            {
+                "onemind.compaction.prompt_tokens": tokens,
+                "onemind.compaction.turns": len(compacted),
+                "onemind.compaction.stages": len(stages),
+            }
+        )
+        return None
+
+    def before_model(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        """Drops the turns the digest covers from the request."""
+        digest = callback_context.state.get(self.state_key)
+        if not digest:
+            return None
+        covered_until = digest["covered_until"]
+        session = callback_context._invocation_context.session
+        covered = sum(
+            1
+            for e in session.events
+            if _is_user_turn(e) and e.timestamp <= covered_until
+        )
+        if not covered:
+            return None
+        user_turns = [
+            i
+            for i, content in enumerate(llm_request.contents)
+            if _is_user_text(content)
+        ]
+        if len(user_turns) <= covered:
+            return None
+        start = user_turns[covered]
+        llm_request.contents = llm_request.contents[start:]
+        self.metrics.contents_dropped += start
+        trace.get_current_span().set_attribute("onemind.compaction.dropped", start)
+        return None
+
+
+def render(digest: Mapping[str, Any] | None, *, current_label: str = "") -> list[str]:
+    """Returns one `stage: summary` line per summarized stage, oldest first.
+
+    The rolling summary of the current stage is marked with `current_label`.
+    """
+    if not digest:
+        return []
+    lines = [f"{s['stage']}: {s['summary']}" for s in digest.get("stages", [])]
+    if current := digest.get("current"):
+        lines.append(f"{current['stage']}{current_label}: {current['summary']}")
+    return lines
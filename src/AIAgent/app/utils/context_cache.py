@@ -0,0 +1,323 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import inspect
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.models import Gemini, LlmRequest, LlmResponse
+from google.adk.utils import instructions_utils
+from google.genai import types
+from opentelemetry import trace
+
+# Renders the part of an agent's instruction that changes between calls.
+VolatileContext = Callable[[ReadonlyContext], str | Awaitable[str]]
+
+
+def state_template(template: str, **values: Callable[[], object]) -> VolatileContext:
+    """Returns a provider that renders `template` like an ADK instruction.
+
+    `{key}` and `{key?}` are read from session state. Keys given in `values`
+    are computed on every call instead, e.g. `current_date=today`.
+    """
+
+    async def render(context: ReadonlyContext) -> str:
+        text = template
+        for name, value in values.items():
+            text = text.replace(f"{{{name}}}", str(value()))
+        return await instructions_utils.inject_session_state(text, context)
+
+    return render
+
+
+@dataclass
+class ContextCacheMetrics:
+    """Prompt caching of one agent.
+
+    Attributes:
+        calls: Model responses that reported token usage.
+        hits: Responses for which part of the prompt was read from a cache.
+        prompt_tokens: Prompt tokens of those responses.
+        cached_tokens: Prompt tokens read from a cache, implicit or explicit.
+        creates: Context caches created.
+        refreshes: Context caches whose TTL was extended.
+        errors: Context caches that could not be created or extended.
+    """
+
+    calls: int = 0
+    hits: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    creates: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+    @property
+    def savings(self) -> float:
+        """Fraction of prompt tokens read from a cache."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+@dataclass
+class _CachedPrefix:
+    # None while the cache is being created, or after creating it failed.
+    name: str | None = None
+    # Clock time the cache expires, or when to retry after a failure.
+    expires: float = 0.0
+    busy: bool = False
+
+
+class _AgentPrefix:
+    """The callbacks `ContextCache.register` adds to one agent."""
+
+    def __init__(
+        self, cache: "ContextCache", name: str, volatile: VolatileContext | None
+    ) -> None:
+        self.cache = cache
+        self.name = name
+        self.volatile = volatile
+
+    async def before_model(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        text = ""
+        if self.volatile is not None:
+            rendered = self.volatile(callback_context)
+            text = await rendered if inspect.isawaitable(rendered) else rendered
+        await self.cache.apply(self.name, callback_context, llm_request, text)
+
+    def after_model(
+        self, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> None:
+        self.cache.record(self.name, llm_response)
+
+
+class ContextCache:
+    """Keeps the static prefix of agent requests in a prompt cache.
+
+    A registered agent's `instruction` has no state placeholders. Whatever
+    changes between calls, such as the date, the conversation stage or the
+    research data, comes from its `volatile` provider and is added after the
+    static prefix. Every call of the agent then starts with the same system
+    instruction and tool declarations, which Gemini's implicit caching reuses.
+
+    With `explicit`, that prefix is also stored as a Gemini `CachedContent` per
+    model, instruction and tool set. The cache is created on first use with a
+    `ttl` and extended when less than `refresh_margin` is left. Requests then
+    reference it and carry the volatile text as their first content. Prefixes
+    the API refuses to cache, e.g. because they are too short, are retried
+    after `ttl`.
+
+    Cached and prompt token counts are kept per agent in `metrics` and set on
+    the model call's span.
+    """
+
+    def __init__(
+        self,
+        *,
+        explicit: bool = False,
+        ttl: float = 3600.0,
+        refresh_margin: float = 300.0,
+        max_entries: int = 256,
+        client: Any = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Args:
+            explicit: Create Gemini context caches for the static prefixes.
+            ttl: Seconds a context cache lives after it is created or extended.
+            refresh_margin: Seconds before expiry at which a cache in use is
+                extended.
+            max_entries: Context caches tracked before the oldest is forgotten.
+            client: `google.genai.Client` for the caches. None means the client
+                of the agent's Gemini model; other models are not cached
+                explicitly.
+            clock: Wall clock in seconds.
+        """
+        self.explicit = explicit
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self.client = client
+        self.clock = clock
+        self.metrics: dict[str, ContextCacheMetrics] = {}
+        self._prefixes: dict[str, _CachedPrefix] = {}
+
+    def register(
+        self,
+        agent: LlmAgent,
+        volatile: VolatileContext | None = None,
+        *,
+        name: str | None = None,
+    ) -> LlmAgent:
+        """Adds the cache callbacks to `agent`, in place, and returns it.
+
+        The before-model callback runs after the agent's own, so the model and
+        tools are final. The after-model callback runs first, since ADK skips the
+        rest once one returns a response. Registering an agent again replaces
+        its earlier registration.
+
+        Args:
+            agent: An agent whose instruction has no state placeholders.
+            volatile: Renders the rest of the instruction on every call.
+            name: Name the metrics are kept under; defaults to the agent's.
+        """
+        prefix = _AgentPrefix(self, name or agent.name, volatile)
+        self.metrics.setdefault(prefix.name, ContextCacheMetrics())
+
+        def own(callback: Any) -> bool:
+            return isinstance(getattr(callback, "__self__", None), _AgentPrefix)
+
+        agent.before_model_callback = [
+            *(c for c in agent.canonical_before_model_callbacks if not own(c)),
+            prefix.before_model,
+        ]
+        agent.after_model_callback = [
+            prefix.after_model,
+            *(c for c in agent.canonical_after_model_callbacks if not own(c)),
+        ]
+        return agent
+
+    def _client(self, callback_context: CallbackContext) -> Any:
+        if self.client is not None:
+            return self.client
+        agent = callback_context._invocation_context.agent
+        model = agent.canonical_model if isinstance(agent, LlmAgent) else None
+        return model.api_client if isinstance(model, Gemini) else None
+
+    async def apply(
+        self,
+        name: str,
+        callback_context: CallbackContext,
+        llm_request: LlmRequest,
+        volatile: str,
+    ) -> None:
+        """Points `llm_request` at the cached prefix and adds `volatile`."""
+        config = llm_request.config
+        cached = None
+        if self.explicit and config is not None and config.system_instruction:
+            client = self._client(callback_context)
+            if client is not None:
+                cached = await self._cached_content(client, name, llm_request)
+        if cached and config is not None:
+            config.cached_content = cached
+            config.system_instruction = None
+            config.tools = None
+            config.tool_config = None
+            if volatile:
+                llm_request.contents.insert(
+                    0, types.Content(role="user", parts=[types.Part(text=volatile)])
+                )
+        elif volatile:
+            llm_request.append_instructions([volatile])
+        trace.get_current_span().set_attributes(
+            {
+                "onemind.context_cache.agent": name,
+                "onemind.context_cache.explicit": bool(cached),
+            }
+        )
+
+    async def _cached_content(
+        self, client: Any, name: str, llm_request: LlmRequest
+    ) -> str | None:
+        config = llm_request.config
+        assert config is not None
+        tools = [tool for tool in config.tools or [] if isinstance(tool, types.Tool)]
+        if len(tools) != len(config.tools or []):
+            # Callables and MCP tools are resolved by the model class, not here.
+            return None
+        metrics = self.metrics.setdefault(name, ContextCacheMetrics())
+        key = hashlib.sha256(
+            (
+                f"{llm_request.model}\n"
+                + config.model_dump_json(
+                    include={"system_instruction", "tools", "tool_config"}
+                )
+            ).encode()
+        ).hexdigest()
+        now = self.clock()
+        entry = self._prefixes.get(key)
+        if entry is not None and not entry.busy and now >= entry.expires:
+            # Expired, or a failed create is due for a retry.
+            del self._prefixes[key]
+            entry = None
+        if entry is None:
+            while len(self._prefixes) >= self.max_entries:
+                del self._prefixes[next(iter(self._prefixes))]
+            entry = self._prefixes[key] = _CachedPrefix(busy=True)
+            try:
+                created = await client.aio.caches.create(
+                    model=llm_request.model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=f"{name}-{key[:12]}",
+                        system_instruction=config.system_instruction,
+                        tools=tools or None,
+                        tool_config=config.tool_config,
+                        ttl=f"{int(self.ttl)}s",
+                    ),
+                )
+                entry.name = created.name
+                metrics.creates += 1
+            except Exception as e:
+                logging.warning(f"Context cache for {name} not created: {e}")
+                metrics.errors += 1
+            finally:
+                entry.expires = now + self.ttl
+                entry.busy = False
+            return entry.name
+        if entry.busy or entry.name is None:
+            return None
+        if entry.expires - now < self.refresh_margin:
+            entry.busy = True
+            try:
+                await client.aio.caches.update(
+                    name=entry.name,
+                    config=types.UpdateCachedContentConfig(ttl=f"{int(self.ttl)}s"),
+                )
+                entry.expires = now + self.ttl
+                metrics.refreshes += 1
+            except Exception as e:
+                logging.warning(f"Context cache for {name} not extended: {e}")
+                metrics.errors += 1
+                self._prefixes.pop(key, None)
+                return None
+            finally:
+                entry.busy = False
+        return entry.name
+
+    def record(self, name: str, llm_response: LlmResponse) -> None:
+        """Adds the token usage of a complete response to `name`'s metrics."""
+        usage = llm_response.usage_metadata
+        if llm_response.partial or usage is None:
+            return
+        metrics = self.metrics.setdefault(name, ContextCacheMetrics())
+        cached = usage.cached_content_token_count or 0
+        metrics.calls += 1
+        metrics.hits += bool(cached)
+        metrics.prompt_tokens += usage.prompt_token_count or 0
+        metrics.cached_tokens += cached
+        trace.get_current_span().set_attributes(
+            {
+                "onemind.context_cache.cached_tokens": cached,
+                "onemind.context_cache.prompt_tokens": usage.prompt_token_count or 0,
+                "onemind.context_cache.savings": metrics.savings,
+            }
+        )
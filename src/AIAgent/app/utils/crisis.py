@@ -0,0 +1,442 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+DEFAULT_LEXICON_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "crisis_lexicon.json",
+)
+
+# Traditional -> simplified mapping for the characters that show up in crisis
+# phrases. Lexicon files can extend it through their "variants" field.
+_TRADITIONAL_TO_SIMPLIFIED = {
+    "殺": "杀",
+    "殘": "残",
+    "傷": "伤",
+    "輕": "轻",
+    "結": "结",
+    "東": "东",
+    "絕": "绝",
+    "離": "离",
+    "開": "开",
+    "樓": "楼",
+    "橋": "桥",
+    "藥": "药",
+    "燒": "烧",
+    "氣": "气",
+    "盡": "尽",
+    "斷": "断",
+    "厭": "厌",
+    "後": "后",
+    "這": "这",
+    "個": "个",
+    "們": "们",
+    "來": "来",
+    "沒": "没",
+    "義": "义",
+    "麼": "么",
+    "為": "为",
+    "會": "会",
+    "說": "说",
+    "見": "见",
+    "別": "别",
+    "還": "还",
+    "點": "点",
+    "過": "过",
+    "時": "时",
+    "對": "对",
+    "讓": "让",
+    "無": "无",
+    "從": "从",
+    "給": "给",
+    "聽": "听",
+    "遺": "遗",
+    "書": "书",
+    "囑": "嘱",
+    "準": "准",
+    "備": "备",
+    "計": "计",
+    "劃": "划",
+    "決": "决",
+    "繩": "绳",
+    "懸": "悬",
+    "樑": "梁",
+    "墜": "坠",
+    "撐": "撑",
+    "負": "负",
+    "擔": "担",
+    "軌": "轨",
+    "車": "车",
+    "夠": "够",
+    "麵": "面",
+    "憂": "忧",
+    "鬱": "郁",
+}
+
+# Above this many distinct first characters, jumping between candidate starts
+# with a regex no longer beats stepping through the automaton.
+_MAX_SKIP_ALPHABET = 512
+
+# Unicode categories folded into a single space during normalization. Users
+# sometimes split a keyword with spaces or punctuation ("自 杀", "自.杀") to get
+# past naive substring checks, so separators between CJK characters are then
+# dropped. Between Latin words one space is kept, so patterns cannot match
+# across word boundaries.
+_SEPARATOR_CATEGORIES = frozenset(
+    {"Zs", "Zl", "Zp", "Cc", "Pc", "Pd", "Ps", "Pe", "Pi", "Pf", "Po"}
+)
+_SPACES = re.compile(" +")
+
+
+def _is_cjk(ch: str) -> bool:
+    # CJK radicals through unified ideographs (incl. kana), Hangul syllables,
+    # compatibility ideographs and the supplementary ideograph planes.
+    return (
+        "\u2e80" <= ch <= "\u9fff"
+        or "\uac00" <= ch <= "\ud7af"
+        or "\uf900" <= ch <= "\ufaff"
+        or "\U00020000" <= ch <= "\U0003134f"
+    )
+
+
+def _is_word(ch: str) -> bool:
+    # Letters and digits of space-delimited scripts; CJK characters are alnum too.
+    return ch.isalnum() and not _is_cjk(ch)
+
+
+def _keeps_separator(text: str, start: int, end: int) -> bool:
+    # A run of spaces inside a CJK run is dropped, any other run kept as one.
+    return not (
+        0 < start
+        and end < len(text)
+        and _is_cjk(text[start - 1])
+        and _is_cjk(text[end])
+    )
+
+
+@dataclass(frozen=True)
+class CrisisMatch:
+    """A single lexicon hit, with its span in the original user input."""
+
+    pattern: str
+    category: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class CrisisLexicon:
+    """A versioned set of crisis keywords and phrases grouped by category.
+
+    Attributes:
+        version (str): Version stamp of the lexicon, reported with every hit.
+        entries (tuple[tuple[str, str], ...]): (pattern, category) pairs.
+        variants (dict[str, str]): Extra character substitutions applied during
+            normalization, on top of the built-in traditional mapping.
+        exceptions (tuple[str, ...]): Ordinary words that overlap a pattern,
+            e.g. "死胡同" (dead end) in "去死胡同". Hits overlapping them are
+            ignored.
+    """
+
+    version: str
+    entries: tuple[tuple[str, str], ...]
+    variants: dict[str, str] = field(default_factory=dict)
+    exceptions: tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CrisisLexicon":
+        """Builds a lexicon from its JSON representation.
+
+        The expected shape is::
+
+            {
+              "version": "2025.07.1",
+              "categories": {"suicide": ["自杀", ...], "self_harm": [...]},
+              "variants": {"殺": "杀"},
+              "exceptions": ["死胡同"]
+            }
+        """
+        entries = tuple(
+            (pattern, category)
+            for category, patterns in data.get("categories", {}).items()
+            for pattern in patterns
+        )
+        return cls(
+            version=str(data.get("version", "unversioned")),
+            entries=entries,
+            variants=dict(data.get("variants", {})),
+            exceptions=tuple(data.get("exceptions", ())),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "CrisisLexicon":
+        """Loads a lexicon from a JSON file."""
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+class _FoldTable(dict):
+    """`str.translate` table that computes and caches each character's fold."""
+
+    def __init__(self, variants: dict[str, str]) -> None:
+        super().__init__()
+        self._variants = variants
+
+    def __missing__(self, codepoint: int) -> str:
+        folded = "".join(
+            " "
+            if unicodedata.category(c) in _SEPARATOR_CATEGORIES
+            else self._variants.get(c, c)
+            for c in unicodedata.normalize("NFKC", chr(codepoint)).casefold()
+            # Zero-width and other invisible format characters.
+            if unicodedata.category(c) != "Cf"
+        )
+        self[codepoint] = folded
+        return folded
+
+
+class TextNormalizer:
+    """Folds user input into the canonical form the automaton is built over.
+
+    Full-width and other compatibility characters are folded with NFKC, Latin
+    text is case-folded, traditional characters are mapped to simplified ones
+    and invisible format characters are dropped. Runs of whitespace and
+    punctuation are dropped inside CJK text and become one space elsewhere.
+    """
+
+    def __init__(self, variants: dict[str, str] | None = None) -> None:
+        self._table = _FoldTable({**_TRADITIONAL_TO_SIMPLIFIED, **(variants or {})})
+
+    def fold(self, text: str) -> str:
+        """Returns the normalized text."""
+        folded = text.translate(self._table)
+        if " " not in folded:
+            return folded
+        return _SPACES.sub(
+            lambda m: " " if _keeps_separator(folded, m.start(), m.end()) else "",
+            folded,
+        )
+
+    def normalize(self, text: str) -> tuple[str, list[int]]:
+        """Normalizes text and maps every output character to its source index.
+
+        Args:
+            text: The raw text.
+
+        Returns:
+            The normalized text and, for each of its characters, the index of
+            the original character it came from.
+        """
+        table = self._table
+        chars: list[str] = []
+        sources: list[int] = []
+        for i, ch in enumerate(text):
+            folded = table[ord(ch)]
+            chars.append(folded)
+            sources.extend([i] * len(folded))
+        folded = "".join(chars)
+        # Same separator handling as `fold`, keeping the index map aligned.
+        out: list[str] = []
+        index_map: list[int] = []
+        pos = 0
+        for m in _SPACES.finditer(folded):
+            out.append(folded[pos : m.start()])
+            index_map.extend(sources[pos : m.start()])
+            if _keeps_separator(folded, m.start(), m.end()):
+                out.append(" ")
+                index_map.append(sources[m.start()])
+            pos = m.end()
+        out.append(folded[pos:])
+        index_map.extend(sources[pos:])
+        return "".join(out), index_map
+
+
+class CrisisDetector:
+    """Single-pass multi-pattern crisis matcher (Aho-Corasick automaton).
+
+    The automaton is compiled once from a `CrisisLexicon`; scanning is linear
+    in the input length regardless of how many patterns the lexicon holds.
+    Patterns that start or end with a Latin letter or digit only match at word
+    boundaries, so "kill myself" is not found in "upskill myself".
+    """
+
+    def __init__(self, lexicon: CrisisLexicon) -> None:
+        self.lexicon = lexicon
+        self.normalizer = TextNormalizer(lexicon.variants)
+        # (pattern, category, length, bounded start, bounded end)
+        self._patterns: list[tuple[str, str, int, bool, bool]] = []
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        self._skip: Callable[[str, int], re.Match[str] | None] | None = None
+        self._exceptions = tuple(
+            folded
+            for phrase in lexicon.exceptions
+            if (folded := self.normalizer.fold(phrase).strip())
+        )
+        self._build()
+
+    @property
+    def version(self) -> str:
+        return self.lexicon.version
+
+    def _build(self) -> None:
+        goto, out = self._goto, self._out
+        seen: set[str] = set()
+        for pattern, category in self.lexicon.entries:
+            normalized = self.normalizer.fold(pattern).strip()
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            state = 0
+            for ch in normalized:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = (*out[state], len(self._patterns))
+            self._patterns.append(
+                (
+                    pattern,
+                    category,
+                    len(normalized),
+                    _is_word(normalized[0]),
+                    _is_word(normalized[-1]),
+                )
+            )
+
+        if 0 < len(goto[0]) <= _MAX_SKIP_ALPHABET:
+            first_chars = "".join(sorted(goto[0]))
+            self._skip = re.compile(f"[{re.escape(first_chars)}]").search
+
+        fail = self._fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                # Merge the suffix outputs so each state reports every pattern
+                # ending at it without walking the failure chain at scan time.
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def scan(self, text: str) -> list[CrisisMatch]:
+        """Finds every lexicon hit in the text.
+
+        Args:
+            text: The raw user input.
+
+        Returns:
+            All matches, including overlapping ones, ordered by end position
+            and then longest first. Spans refer to the original (un-normalized) text.
+        """
+        # Most turns contain no hit, so the index map back to the raw text is
+        # only built once there is a span to translate.
+        normalized = self.normalizer.fold(text)
+        goto, fail, out, skip = self._goto, self._fail, self._out, self._skip
+        hits: list[tuple[int, int]] = []
+        state = pos = 0
+        end = len(normalized)
+        while pos < end:
+            if not state and skip is not None:
+                # At the root only a pattern's first character can advance the
+                # automaton, so jump straight to the next one.
+                found = skip(normalized, pos)
+                if found is None:
+                    break
+                pos = found.start()
+            ch = normalized[pos]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.extend((pos, pattern_id) for pattern_id in out[state])
+            pos += 1
+        if not hits:
+            return []
+
+        excepted = [
+            (start, start + len(phrase))
+            for phrase in self._exceptions
+            for start in _occurrences(normalized, phrase)
+        ]
+        index_map: list[int] | None = None
+        matches = []
+        for pos, pattern_id in hits:
+            pattern, category, length, bounded_start, bounded_end = self._patterns[
+                pattern_id
+            ]
+            first = pos - length + 1
+            if bounded_start and first and _is_word(normalized[first - 1]):
+                continue
+            if bounded_end and pos + 1 < end and _is_word(normalized[pos + 1]):
+                continue
+            if any(a <= pos and first < b for a, b in excepted):
+                continue
+            if index_map is None:
+                _, index_map = self.normalizer.normalize(text)
+            matches.append(
+                CrisisMatch(
+                    pattern=pattern,
+                    category=category,
+                    start=index_map[first],
+                    end=index_map[pos] + 1,
+                )
+            )
+        return matches
+
+
+def _occurrences(text: str, phrase: str) -> list[int]:
+    starts = []
+    start = text.find(phrase)
+    while start != -1:
+        starts.append(start)
+        start = text.find(phrase, start + 1)
+    return starts
+
+
+@functools.cache
+def get_crisis_detector(path: str = "") -> CrisisDetector:
+    """Returns the process-wide detector, compiling its lexicon on first use.
+
+    Args:
+        path: Lexicon file to load. Defaults to the bundled lexicon.
+    """
+    lexicon = CrisisLexicon.from_file(path or DEFAULT_LEXICON_PATH)
+    detector = CrisisDetector(lexicon)
+    logging.info(
+        f"Loaded crisis lexicon version '{lexicon.version}' "
+        f"with {len(detector)} patterns."
+    )
+    return detector
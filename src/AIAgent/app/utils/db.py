@@ -0,0 +1,369 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import random
+import time
+import weakref
+from collections.abc import Coroutine, Mapping
+from dataclasses import asdict, dataclass
+from typing import Any, TypeVar
+
+import httpx
+from opentelemetry import trace
+
+T = TypeVar("T")
+
+# Statuses worth retrying: rate limiting and gateway/availability errors.
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+# The subset that means the request was rejected rather than applied. A 502 or
+# 504 may come back for a write the database already committed.
+REJECTED_STATUS_CODES = frozenset({429, 503})
+
+
+class SupabaseError(Exception):
+    """Raised when PostgREST rejects a request."""
+
+    def __init__(self, status_code: int, code: str, message: str) -> None:
+        super().__init__(f"{status_code} {code}: {message}")
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "SupabaseError":
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+        return cls(
+            status_code=response.status_code,
+            code=str(body.get("code", "")),
+            message=str(body.get("message", response.text)),
+        )
+
+
+@dataclass
+class PoolMetrics:
+    """Counters for sizing the connection pool.
+
+    Attributes:
+        in_flight (int): Requests currently holding a pool slot.
+        peak_in_flight (int): Highest `in_flight` value observed.
+        requests (int): HTTP attempts sent, including retries.
+        connections_opened (int): New TCP connections the pool had to open.
+        retries (int): Attempts repeated after a retryable failure.
+        timeouts (int): Attempts that hit the per-call timeout.
+        failures (int): Calls that failed after exhausting their retries.
+        wait_time_total (float): Seconds spent waiting for a free slot.
+        wait_time_max (float): Longest single wait for a free slot, in seconds.
+    """
+
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    requests: int = 0
+    connections_opened: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    failures: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of requests served over an already open keep-alive connection."""
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.connections_opened / self.requests)
+
+    def snapshot(self) -> dict[str, float]:
+        """Returns the current counters, plus derived ratios, as a flat dict."""
+        return {**asdict(self), "reuse_ratio": self.reuse_ratio}
+
+
+class SupabaseRestClient:
+    """Async PostgREST client backed by a bounded keep-alive connection pool.
+
+    At most `pool_size` requests are in flight per event loop; further callers
+    wait for a free slot, and that wait is recorded in `metrics`. Each attempt
+    is bounded by `timeout`, and transient failures are retried with
+    exponential backoff and jitter. Writes that are not idempotent are only
+    retried when the request provably never reached the server or was
+    rejected with 429/503.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        *,
+        pool_size: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 5.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.2,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        Args:
+            url: The Supabase project URL.
+            key: The Supabase API key.
+            pool_size: Maximum concurrent requests and open connections.
+            keepalive_expiry: Seconds an idle connection is kept open.
+            timeout: Per-attempt timeout in seconds.
+            max_retries: Retries after the first attempt.
+            retry_backoff: Base delay in seconds, doubled on every retry.
+            transport: Optional transport override, mainly for tests.
+        """
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.metrics = PoolMetrics()
+        self._transport = transport
+        # httpx clients and semaphores are bound to the event loop that first
+        # uses them, so each loop (the server's, or one per sync call) gets its
+        # own pool.
+        self._pools: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, tuple[httpx.AsyncClient, asyncio.Semaphore]
+        ] = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                transport=self._transport,
+            )
+            pool = (client, asyncio.Semaphore(self.pool_size))
+            self._pools[loop] = pool
+        return pool
+
+    async def _trace(self, event_name: str, info: Mapping[str, Any]) -> None:
+        # httpcore trace hook: fires once per TCP connection the pool opens.
+        if event_name == "connection.connect_tcp.complete":
+            self.metrics.connections_opened += 1
+
+    async def aclose(self) -> None:
+        """Closes the connection pool bound to the running event loop."""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool:
+            await pool[0].aclose()
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Mapping[str, Any] | None = None,
+        json: Any = None,
+        headers: Mapping[str, str] | None = None,
+        timeout: float | None = None,
+        idempotent: bool = True,
+    ) -> Any:
+        """Sends a request through the pool.
+
+        Args:
+            method: The HTTP method.
+            path: Path relative to `/rest/v1`.
+            params: Query parameters.
+            json: JSON body.
+            headers: Extra headers.
+            timeout: Per-attempt timeout overriding the client default.
+            idempotent: Whether the request may be retried after it could have
+                reached the server.
+
+        Returns:
+            The decoded JSON body, or None for empty responses.
+
+        Raises:
+            SupabaseError: If PostgREST returns a non-retryable error status.
+            httpx.HTTPError: If the request still fails after all retries.
+        """
+        client, slots = self._pool()
+        metrics = self.metrics
+        wait_start = time.perf_counter()
+        async with slots:
+            waited = time.perf_counter() - wait_start
+            metrics.wait_time_total += waited
+            metrics.wait_time_max = max(metrics.wait_time_max, waited)
+            metrics.in_flight += 1
+            metrics.peak_in_flight = max(metrics.peak_in_flight, metrics.in_flight)
+            try:
+                return await self._send_with_retries(
+                    client,
+                    method,
+                    path,
+                    params=params,
+                    json=json,
+                    headers=headers,
+                    timeout=timeout,
+                    idempotent=idempotent,
+                    waited=waited,
+                )
+            finally:
+                metrics.in_flight -= 1
+
+    async def _send_with_retries(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        path: str,
+        *,
+        params: Mapping[str, Any] | None,
+        json: Any,
+        headers: Mapping[str, str] | None,
+        timeout: float | None,
+        idempotent: bool,
+        waited: float,
+    ) -> Any:
+        metrics = self.metrics
+        span = trace.get_current_span()
+        attempt = 0
+        while True:
+            metrics.requests += 1
+            try:
+                response = await client.request(
+                    method,
+                    path,
+                    params=params,
+                    json=json,
+                    headers=headers,
+                    timeout=timeout if timeout is not None else self.timeout,
+                    extensions={"trace": self._trace},
+                )
+            except httpx.TimeoutException as e:
+                metrics.timeouts += 1
+                retryable = idempotent or isinstance(
+                    e, httpx.ConnectTimeout | httpx.PoolTimeout
+                )
+                error: Exception = e
+            except httpx.TransportError as e:
+                retryable = idempotent or isinstance(e, httpx.ConnectError)
+                error = e
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    span.set_attributes(
+                        {
+                            "db.pool.wait_ms": waited * 1e3,
+                            "db.pool.in_flight": metrics.in_flight,
+                            "db.attempts": attempt + 1,
+                        }
+                    )
+                    if response.is_error:
+                        raise SupabaseError.from_response(response)
+                    return response.json() if response.content else None
+                retryable = idempotent or response.status_code in REJECTED_STATUS_CODES
+                error = SupabaseError.from_response(response)
+
+            if not retryable or attempt >= self.max_retries:
+                metrics.failures += 1
+                raise error
+            delay = self.retry_backoff * 2**attempt * random.uniform(0.5, 1.5)
+            logging.warning(
+                f"Supabase {method} {path} failed ({error!r}); "
+                f"retrying in {delay:.2f}s."
+            )
+            metrics.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        *,
+        filters: Mapping[str, Any] | None = None,
+        order: str | None = None,
+        desc: bool = False,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Selects rows matching equality filters."""
+        params: dict[str, Any] = {"select": columns}
+        params.update({k: f"eq.{v}" for k, v in (filters or {}).items()})
+        if order:
+            params["order"] = f"{order}.{'desc' if desc else 'asc'}"
+        if limit is not None:
+            params["limit"] = limit
+        return await self.request("GET", f"/{table}", params=params) or []
+
+    async def insert(
+        self, table: str, rows: dict[str, Any] | list[dict[str, Any]]
+    ) -> None:
+        """Inserts one row, or several rows in a single request."""
+        await self.request(
+            "POST",
+            f"/{table}",
+            json=rows,
+            headers={"Prefer": "return=minimal"},
+            idempotent=False,
+        )
+
+    async def update(
+        self, table: str, values: dict[str, Any], *, filters: Mapping[str, Any]
+    ) -> None:
+        """Updates the rows matching equality filters."""
+        await self.request(
+            "PATCH",
+            f"/{table}",
+            params={k: f"eq.{v}" for k, v in filters.items()},
+            json=values,
+            headers={"Prefer": "return=minimal"},
+        )
+
+    async def delete(self, table: str, *, filters: Mapping[str, Any]) -> None:
+        """Deletes the rows matching equality filters."""
+        await self.request(
+            "DELETE",
+            f"/{table}",
+            params={k: f"eq.{v}" for k, v in filters.items()},
+            headers={"Prefer": "return=minimal"},
+        )
+
+    async def rpc(
+        self, function: str, params: dict[str, Any], *, idempotent: bool = False
+    ) -> Any:
+        """Calls a Postgres function exposed through PostgREST."""
+        return await self.request(
+            "POST", f"/rpc/{function}", json=params, idempotent=idempotent
+        )
+
+    def run_sync(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Runs a coroutine that uses this client from synchronous code.
+
+        The coroutine runs on a fresh event loop whose pool is closed
+        afterwards, so this is meant for tests and scripts, not the server.
+        """
+
+        async def _run() -> T:
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+
+        return asyncio.run(_run())
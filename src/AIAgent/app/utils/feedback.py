@@ -0,0 +1,234 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from opentelemetry import trace
+
+from .db import SupabaseRestClient
+from .tracing import SpanSink
+
+# Postgres table from src/sql/11_feedback.sql.
+FEEDBACK_TABLE = "feedback"
+
+
+class FeedbackSink(Protocol):
+    """Destination of feedback records."""
+
+    async def write(self, records: list[dict[str, Any]]) -> None:
+        """Writes a batch of feedback records."""
+
+
+class ThreadedSink:
+    """Runs a blocking sink, such as `CloudLoggingSink`, in a worker thread.
+
+    The sink is built in that thread on the first write.
+    """
+
+    def __init__(self, factory: Callable[[], SpanSink]) -> None:
+        self.factory = factory
+        self._sink: SpanSink | None = None
+
+    async def write(self, records: list[dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, records)
+
+    def _write(self, records: list[dict[str, Any]]) -> None:
+        if self._sink is None:
+            self._sink = self.factory()
+        self._sink.write(records)
+
+
+class SupabaseFeedbackSink:
+    """Inserts feedback into the Postgres `feedback` table, one request per batch."""
+
+    def __init__(self, db: SupabaseRestClient, table: str = FEEDBACK_TABLE) -> None:
+        self.db = db
+        self.table = table
+
+    async def write(self, records: list[dict[str, Any]]) -> None:
+        await self.db.insert(
+            self.table,
+            [
+                {
+                    "invocation_id": record["invocation_id"],
+                    "user_id": record["user_id"],
+                    "score": record["score"],
+                    "text": record["text"],
+                }
+                for record in records
+            ],
+        )
+
+
+@dataclass
+class FeedbackMetrics:
+    """Counters for the feedback batcher.
+
+    Attributes:
+        accepted (int): Records accepted by the buffer.
+        rejected (int): Records rejected because the buffer was full.
+        written (int): Records written to the sink.
+        flushes (int): Flushes that wrote at least one record.
+        failures (int): Flushes that failed.
+        dropped (int): Records dropped after `max_attempts` failed flushes.
+    """
+
+    accepted: int = 0
+    rejected: int = 0
+    written: int = 0
+    flushes: int = 0
+    failures: int = 0
+    dropped: int = 0
+
+
+class FeedbackBatcher:
+    """Buffers feedback records and writes them to a sink in the background.
+
+    `submit` never waits: it accepts all the given records or, if they do not
+    fit in the `max_size` buffer, none of them. The buffer flushes once
+    `flush_size` records are pending, every `flush_interval` seconds, and on
+    `stop()`. Failed flushes are requeued until `max_attempts` flushes in a
+    row have failed; the records are then dropped and logged, so an unavailable
+    sink cannot hold the buffer full forever.
+
+    The background task starts on the first submit and belongs to that event
+    loop; call `stop()` from the same loop to drain it.
+    """
+
+    def __init__(
+        self,
+        sink: FeedbackSink,
+        *,
+        max_size: int = 10000,
+        flush_size: int = 100,
+        flush_interval: float = 1.0,
+        max_attempts: int = 5,
+    ) -> None:
+        """
+        Args:
+            sink: Where feedback is written.
+            max_size: Maximum number of buffered records.
+            flush_size: Number of buffered records that triggers a flush.
+            flush_interval: Maximum seconds a record stays buffered.
+            max_attempts: Consecutive failed flushes after which the buffered
+                records are dropped.
+        """
+        self.sink = sink
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max(max_attempts, 1)
+        self.metrics = FeedbackMetrics()
+        self._failures = 0
+        self._records: list[dict[str, Any]] = []
+        self._task: asyncio.Task[None] | None = None
+        self._wake: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+
+    @property
+    def depth(self) -> int:
+        """Number of records waiting to be flushed."""
+        return len(self._records)
+
+    def submit(self, records: list[dict[str, Any]]) -> bool:
+        """Buffers the records; False if they do not fit."""
+        self._ensure_started()
+        if self.depth + len(records) > self.max_size:
+            self.metrics.rejected += len(records)
+            return False
+        self._records.extend(records)
+        self.metrics.accepted += len(records)
+        trace.get_current_span().set_attribute("onemind.feedback.depth", self.depth)
+        if self.depth >= self.flush_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def flush(self) -> int:
+        """Writes all buffered records now.
+
+        Returns:
+            The number of records written.
+        """
+        self._ensure_started()
+        assert self._flush_lock is not None
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def stop(self) -> None:
+        """Flushes buffered records and stops the background task."""
+        if self._task is None:
+            return
+        assert self._flush_lock is not None
+        # Never cancel the task in the middle of a flush.
+        async with self._flush_lock:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self.flush()
+        finally:
+            # A later submit starts a new background task.
+            self._task = None
+
+    def _ensure_started(self) -> None:
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        assert self._wake is not None and self._flush_lock is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            async with self._flush_lock:
+                try:
+                    await self._flush()
+                except Exception as e:
+                    logging.error(f"Feedback flush failed: {e}")
+
+    async def _flush(self) -> int:
+        records, self._records = self._records, []
+        if not records:
+            return 0
+        try:
+            await self.sink.write(records)
+        except Exception:
+            self.metrics.failures += 1
+            self._failures += 1
+            if self._failures >= self.max_attempts:
+                self._failures = 0
+                self.metrics.dropped += len(records)
+                logging.error(
+                    f"Dropping {len(records)} feedback records after "
+                    f"{self.max_attempts} failed flushes: {records}"
+                )
+            else:
+                # Requeue ahead of newer records.
+                self._records = records + self._records
+            raise
+        self._failures = 0
+        self.metrics.flushes += 1
+        self.metrics.written += len(records)
+        return len(records)
@@ -0,0 +1,447 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Memory-mapped knowledge base index files.
+
+Layout (little-endian), every section aligned to 64 bytes:
+
+    magic "OMKBIDX\\0" | format version u32 | header length u32 | header JSON
+    embeddings      float32[count, dim], unit rows
+    chunk_offsets   uint64[count + 1] into `chunks`
+    chunks          one UTF-8 KnowledgeChunk JSON document per chunk
+    tag_offsets     uint64[tag_count + 1] into `tag_names`
+    tag_names       sorted UTF-8 tag names
+    tag_postings_ptr uint64[tag_count + 1], element offsets into `tag_postings`
+    tag_postings    uint32 chunk numbers per tag
+    bm25_term_offsets uint64[term_count + 1] into `bm25_terms`    (format 2)
+    bm25_terms      sorted UTF-8 BM25 terms                          (format 2)
+    bm25_ptr        int64[term_count + 1] into the two arrays below  (format 2)
+    bm25_docs       uint32 chunk numbers per term                    (format 2)
+    bm25_weights    float32 BM25 impact per posting                  (format 2)
+
+Opening a file only parses the header and creates NumPy views over the mapping,
+so it takes the same time for any knowledge base size, and every worker on a
+host shares the same page-cache pages. Chunks are decoded when accessed.
+
+Build an index from a directory of KnowledgeChunk JSON files with:
+
+    uv run python -m app.utils.kb_index build knowledge/ -o knowledge.omkb
+"""
+
+import argparse
+import bisect
+import functools
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Sequence
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Generic, TypeVar, overload
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .knowledge import (
+    Embedder,
+    HashingEmbedder,
+    KnowledgeBase,
+    KnowledgeChunk,
+    VectorIndex,
+    load_chunks,
+)
+
+T = TypeVar("T")
+
+MAGIC = b"OMKBIDX\x00"
+FORMAT_VERSION = 2
+# Format 1 files have no BM25 sections and are served vector-only.
+SUPPORTED_FORMAT_VERSIONS = frozenset({1, 2})
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _offsets(lengths: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype="<u8")
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def load_chunk_dir(path: str | os.PathLike[str]) -> list[KnowledgeChunk]:
+    """Loads every `*.json` and `*.jsonl` file under a directory, sorted by path.
+
+    Raises:
+        ValueError: If two chunks share an id.
+    """
+    chunks: list[KnowledgeChunk] = []
+    seen: dict[str, Path] = {}
+    for file in sorted(Path(path).rglob("*")):
+        if file.suffix not in (".json", ".jsonl"):
+            continue
+        for chunk in load_chunks(str(file)):
+            if chunk.id in seen:
+                raise ValueError(
+                    f"Duplicate chunk id '{chunk.id}' in {file} and {seen[chunk.id]}."
+                )
+            seen[chunk.id] = file
+            chunks.append(chunk)
+    return chunks
+
+
+def build_index(
+    chunks: Sequence[KnowledgeChunk],
+    path: str | os.PathLike[str],
+    *,
+    version: str | None = None,
+    embedder: Embedder | None = None,
+    embedder_spec: dict[str, Any] | None = None,
+) -> str:
+    """Writes an index file, atomically replacing any file at `path`.
+
+    Args:
+        chunks: The chunks to index.
+        path: Output file.
+        version: Version stamp. Defaults to the UTC build time plus a digest of
+            the chunk contents.
+        embedder: Embedding function. Defaults to `HashingEmbedder`.
+        embedder_spec: Stored in the header so readers can rebuild the embedder;
+            taken from `embedder.spec` when available.
+
+    Returns:
+        The version stamp of the written index.
+    """
+    embedder = embedder or HashingEmbedder()
+    if embedder_spec is None:
+        embedder_spec = getattr(embedder, "spec", {"name": "custom"})
+
+    documents = [chunk.model_dump_json().encode("utf-8") for chunk in chunks]
+    digest = hashlib.sha256(b"\n".join(documents)).hexdigest()[:12]
+    created_at = datetime.now(timezone.utc)
+    version = version or f"{created_at:%Y%m%dT%H%M%SZ}-{digest}"
+
+    embeddings = VectorIndex(
+        embedder([chunk.embedding_text() for chunk in chunks])
+    ).matrix.astype("<f4", copy=False)
+
+    postings: dict[str, list[int]] = {}
+    for number, chunk in enumerate(chunks):
+        for tag in dict.fromkeys(chunk.tags):
+            postings.setdefault(tag, []).append(number)
+    tags = sorted(postings)
+    tag_names = [tag.encode("utf-8") for tag in tags]
+    tag_postings = [postings[tag] for tag in tags]
+
+    bm25 = BM25Index.build(chunk.lexical_fields() for chunk in chunks)
+    bm25_terms = [term.encode("utf-8") for term in bm25.vocabulary]
+
+    sections: list[tuple[str, bytes]] = [
+        ("embeddings", embeddings.tobytes()),
+        ("chunk_offsets", _offsets([len(d) for d in documents]).tobytes()),
+        ("chunks", b"".join(documents)),
+        ("tag_offsets", _offsets([len(n) for n in tag_names]).tobytes()),
+        ("tag_names", b"".join(tag_names)),
+        ("tag_postings_ptr", _offsets([len(p) for p in tag_postings]).tobytes()),
+        (
+            "tag_postings",
+            np.array([n for p in tag_postings for n in p], dtype="<u4").tobytes(),
+        ),
+        ("bm25_term_offsets", _offsets([len(t) for t in bm25_terms]).tobytes()),
+        ("bm25_terms", b"".join(bm25_terms)),
+        ("bm25_ptr", bm25.ptr.astype("<i8").tobytes()),
+        ("bm25_docs", bm25.docs.astype("<u4").tobytes()),
+        ("bm25_weights", bm25.weights.astype("<f4").tobytes()),
+    ]
+    layout: dict[str, dict[str, int]] = {}
+    offset = 0
+    for name, data in sections:
+        layout[name] = {"offset": offset, "length": len(data)}
+        offset = _align(offset + len(data))
+
+    header = json.dumps(
+        {
+            "version": version,
+            "created_at": created_at.isoformat(),
+            "digest": digest,
+            "count": len(chunks),
+            "dim": int(embeddings.shape[1]),
+            "tag_count": len(tags),
+            "embedder": embedder_spec,
+            "sections": layout,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write next to the target and rename over it, so a reader sees either the
+    # old file or the complete new one.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            data_start = _align(f.tell())
+            for name, data in sections:
+                f.seek(data_start + layout[name]["offset"])
+                f.write(data)
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file owner-only; workers may run as another user.
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return version
+
+
+class _MappedSequence(Sequence[T], Generic[T]):
+    """Variable-length records decoded on access from a mapped section."""
+
+    def __init__(
+        self, offsets: np.ndarray, blob: memoryview, decode: Callable[[bytes], T]
+    ) -> None:
+        self._offsets = offsets
+        self._blob = blob
+        self._decode = decode
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[T]: ...
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._decode(bytes(self._blob[start:end]))
+
+
+def _utf8(data: bytes) -> str:
+    return data.decode("utf-8")
+
+
+class KnowledgeIndex:
+    """A read-only view over a memory-mapped index file."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        """
+        Args:
+            path: The index file to map.
+
+        Raises:
+            ValueError: If the file is not a supported index file.
+        """
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Identifies the file this view maps, for hot-swap checks.
+        self.file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        magic, format_version, header_length = _PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a knowledge base index.")
+        if format_version not in SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(
+                f"{self.path} has unsupported index format {format_version}."
+            )
+        self.format_version = format_version
+        header_end = _PREAMBLE.size + header_length
+        self.header: dict[str, Any] = json.loads(
+            self._mmap[_PREAMBLE.size : header_end]
+        )
+        self._data_start = _align(header_end)
+        self._buffer = memoryview(self._mmap)
+
+        count, dim = self.header["count"], self.header["dim"]
+        self.matrix = self._array("embeddings", "<f4").reshape(count, dim)
+        self.chunks = self._strings(
+            "chunk_offsets", "chunks", KnowledgeChunk.model_validate_json
+        )
+        self.tags = self._strings("tag_offsets", "tag_names", _utf8)
+        # Lookups bisect the mapped vocabulary, so nothing is decoded up front.
+        self.bm25: BM25Index | None = None
+        if "bm25_ptr" in self.header["sections"]:
+            self.bm25 = BM25Index(
+                self._strings("bm25_term_offsets", "bm25_terms", _utf8),
+                self._array("bm25_ptr", "<i8"),
+                self._array("bm25_docs", "<u4"),
+                self._array("bm25_weights", "<f4"),
+                count,
+            )
+
+    @property
+    def version(self) -> str:
+        return self.header["version"]
+
+    def __len__(self) -> int:
+        return self.header["count"]
+
+    def _section(self, name: str) -> memoryview:
+        section = self.header["sections"][name]
+        start = self._data_start + section["offset"]
+        return self._buffer[start : start + section["length"]]
+
+    def _array(self, name: str, dtype: str) -> np.ndarray:
+        return np.frombuffer(self._section(name), dtype=dtype)
+
+    def _strings(
+        self, offsets: str, blob: str, decode: Callable[[bytes], T]
+    ) -> _MappedSequence[T]:
+        return _MappedSequence(self._array(offsets, "<u8"), self._section(blob), decode)
+
+    def chunks_with_tag(self, tag: str) -> np.ndarray:
+        """Numbers of the chunks carrying `tag`, in ascending order."""
+        position = bisect.bisect_left(self.tags, tag)
+        if position == len(self.tags) or self.tags[position] != tag:
+            return np.empty(0, dtype=np.uint32)
+        pointers = self._array("tag_postings_ptr", "<u8")
+        start, end = int(pointers[position]), int(pointers[position + 1])
+        return self._array("tag_postings", "<u4")[start:end]
+
+    def embedder(self) -> Embedder:
+        """Rebuilds the embedder recorded in the header.
+
+        Raises:
+            ValueError: If the index was built with a custom embedder.
+        """
+        spec = self.header["embedder"]
+        if spec.get("name") == "hashing":
+            return HashingEmbedder(dim=spec["dim"])
+        raise ValueError(
+            f"{self.path} was built with embedder {spec}; pass it explicitly."
+        )
+
+    def knowledge_base(self, embedder: Embedder | None = None) -> KnowledgeBase:
+        """A knowledge base that searches the mapped arrays without copying them."""
+        return KnowledgeBase(
+            self.chunks,
+            embedder or self.embedder(),
+            VectorIndex(self.matrix, normalized=True),
+            lexical=self.bm25,
+        )
+
+
+class ReloadingKnowledgeBase:
+    """Serves the knowledge base of an index file, following atomic replaces.
+
+    At most once per `check_interval` seconds, `get()` stats the file and, if
+    the builder has renamed a new index over it, maps the new file. Searches
+    already running keep using the old mapping until they drop it.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        check_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._clock = clock
+        self.index = KnowledgeIndex(self.path)
+        self._knowledge_base = self.index.knowledge_base()
+        self._next_check = clock() + check_interval
+        logging.info(
+            f"Mapped knowledge base index {self.path} version "
+            f"'{self.index.version}' with {len(self.index)} chunks."
+        )
+
+    def get(self) -> KnowledgeBase:
+        now = self._clock()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._maybe_reload()
+        return self._knowledge_base
+
+    def _maybe_reload(self) -> None:
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            logging.warning(f"Cannot stat knowledge base index {self.path}: {e}")
+            return
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self.index.file_id:
+            return
+        try:
+            index = KnowledgeIndex(self.path)
+            knowledge_base = index.knowledge_base()
+        except (OSError, ValueError) as e:
+            logging.error(f"Keeping index '{self.index.version}': {e}")
+            return
+        logging.info(
+            f"Swapped knowledge base index '{self.index.version}' "
+            f"for '{index.version}'."
+        )
+        # Publish both together; a reader sees the old or the new pair.
+        self.index, self._knowledge_base = index, knowledge_base
+
+
+@functools.cache
+def _reloader(path: str) -> ReloadingKnowledgeBase:
+    return ReloadingKnowledgeBase(path)
+
+
+def get_mapped_knowledge_base(path: str) -> KnowledgeBase:
+    """Returns the process-wide knowledge base for an index file."""
+    return _reloader(path).get()
+
+
+def main(argv: Iterable[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Knowledge base index files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build an index from chunk files.")
+    build.add_argument("source", help="Directory of KnowledgeChunk JSON files.")
+    build.add_argument("-o", "--output", required=True, help="Index file to write.")
+    build.add_argument("--version", help="Version stamp; defaults to time + digest.")
+    build.add_argument("--dim", type=int, default=256, help="Embedding dimension.")
+
+    info = commands.add_parser("info", help="Print an index header.")
+    info.add_argument("index", help="Index file to inspect.")
+
+    args = parser.parse_args(None if argv is None else list(argv))
+    if args.command == "build":
+        chunks = load_chunk_dir(args.source)
+        version = build_index(
+            chunks,
+            args.output,
+            version=args.version,
+            embedder=HashingEmbedder(dim=args.dim),
+        )
+        print(f"Wrote {len(chunks)} chunks to {args.output} (version {version}).")
+    else:
+        header = KnowledgeIndex(args.index).header
+        print(json.dumps(header, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import json
+import logging
+import os
+import re
+import unicodedata
+import zlib
+from collections.abc import Callable, Sequence
+from typing import Any
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .bm25 import BM25Index, reciprocal_rank_fusion
+
+DEFAULT_KNOWLEDGE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "knowledge_chunks.json",
+)
+
+# Maps a batch of texts to a (len(texts), dim) float32 matrix.
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+# ASCII words are hashed whole plus their character trigrams, so inflections
+# still overlap; every other letter run (CJK text has no word boundaries) is
+# hashed as character unigrams and bigrams.
+_TOKEN_RE = re.compile(r"[0-9a-z]+|[^\W0-9a-z_]+")
+
+
+class KnowledgeChunk(BaseModel):
+    """A knowledge base entry, as specified in doc/MVP/6_RAG知识库构建与迭代SOP.md."""
+
+    id: str = Field(description="Unique identifier, formatted OKC-YYYYMMDD-NNN.")
+    title: str = Field(description="Short title of the knowledge.")
+    tags: list[str] = Field(default_factory=list, description="Core keywords.")
+    scene_description: str = Field(
+        default="", description="The user situation this knowledge applies to."
+    )
+    core_concept: str = Field(description="The knowledge itself.")
+    inquiry_exemplar: str = Field(
+        default="", description="An example question the AI can ask."
+    )
+    source: str = Field(default="", description="Where the knowledge comes from.")
+
+    def embedding_text(self) -> str:
+        """The text that represents this chunk in the index."""
+        return "\n".join(
+            [self.title, " ".join(self.tags), self.scene_description, self.core_concept]
+        )
+
+    def lexical_fields(self) -> list[tuple[str, float]]:
+        """(text, weight) pairs for the BM25 index.
+
+        The RAG SOP makes tags the most important retrieval basis, so they
+        weigh the most.
+        """
+        return [
+            (" ".join(self.tags), 3.0),
+            (self.title, 2.0),
+            (self.scene_description, 1.0),
+            (self.core_concept, 1.0),
+        ]
+
+
+def load_chunks(path: str) -> list[KnowledgeChunk]:
+    """Loads chunks from a JSON Lines file, or a JSON array or single object."""
+    records: Any
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+    if isinstance(records, dict):
+        records = [records]
+    return [KnowledgeChunk.model_validate(record) for record in records]
+
+
+class _FeatureTable(dict[str, tuple[int, float]]):
+    """Memoizes feature -> (bucket, sign); the vocabulary repeats heavily."""
+
+    def __init__(self, dim: int) -> None:
+        super().__init__()
+        self.dim = dim
+
+    def __missing__(self, feature: str) -> tuple[int, float]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        value = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+        self[feature] = value
+        return value
+
+
+class HashingEmbedder:
+    """Offline embedding function based on signed feature hashing.
+
+    Captures lexical overlap only, but needs no model download, so it is the
+    default and what the tests use. Any `Embedder` can replace it.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        """
+        Args:
+            dim: Embedding dimension.
+        """
+        self.dim = dim
+        self._table = _FeatureTable(dim)
+
+    @property
+    def spec(self) -> dict[str, Any]:
+        """Parameters stored in index files to rebuild this embedder."""
+        return {"name": "hashing", "dim": self.dim}
+
+    def features(self, text: str) -> list[str]:
+        """Splits text into the hashed features."""
+        text = unicodedata.normalize("NFKC", text).casefold()
+        features = []
+        for token in _TOKEN_RE.findall(text):
+            if token.isascii():
+                features.append(token)
+                padded = f"<{token}>"
+                features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+            else:
+                features.extend(token)
+                features.extend(token[i : i + 2] for i in range(len(token) - 1))
+        return features
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        table = self._table
+        for row, text in enumerate(texts):
+            hashed = [table[feature] for feature in self.features(text)]
+            if hashed:
+                buckets, signs = zip(*hashed, strict=True)
+                out[row] = np.bincount(buckets, weights=signs, minlength=self.dim)
+        return out
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+class VectorIndex:
+    """Exact cosine top-k over a contiguous float32 matrix of unit vectors."""
+
+    def __init__(self, embeddings: np.ndarray, normalized: bool = False) -> None:
+        """
+        Args:
+            embeddings: A (n, dim) matrix, one row per chunk.
+            normalized: Whether `embeddings` is already a C-contiguous float32
+                matrix of unit rows. It is then used as is, without a copy, so
+                it can be a read-only view of a memory-mapped file.
+        """
+        if normalized:
+            self.matrix = np.asarray(embeddings, dtype=np.float32)
+            if not self.matrix.flags.c_contiguous:
+                raise ValueError("Normalized embeddings must be C-contiguous.")
+        else:
+            self.matrix = _normalize_rows(
+                np.array(embeddings, dtype=np.float32, order="C", copy=True)
+            )
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def search(self, queries: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Finds the most similar rows for a batch of queries.
+
+        Args:
+            queries: A (q, dim) matrix, or a single (dim,) vector.
+            top_k: Number of results per query.
+
+        Returns:
+            (indices, scores), both (q, k) with k = min(top_k, len(self)), best
+            match first.
+        """
+        queries = _normalize_rows(np.atleast_2d(queries).astype(np.float32))
+        scores = queries @ self.matrix.T
+        n = scores.shape[1]
+        k = min(top_k, n)
+        if k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.intp), empty.astype(np.float32)
+        if k < n:
+            # O(n) selection of the k best, then a sort of just those k.
+            indices = np.argpartition(scores, n - k, axis=1)[:, n - k :]
+        else:
+            indices = np.broadcast_to(np.arange(n), scores.shape)
+        top = np.take_along_axis(scores, indices, axis=1)
+        order = np.argsort(-top, axis=1, kind="stable")
+        return (
+            np.take_along_axis(indices, order, axis=1),
+            np.take_along_axis(top, order, axis=1),
+        )
+
+
+class KnowledgeBase:
+    """In-process search over knowledge chunks.
+
+    Ranks by vector similarity, or, when given a lexical index, fuses the
+    vector and BM25 rankings with reciprocal rank fusion.
+    """
+
+    def __init__(
+        self,
+        chunks: Sequence[KnowledgeChunk],
+        embedder: Embedder | None = None,
+        index: VectorIndex | None = None,
+        lexical: BM25Index | None = None,
+        candidate_depth: int = 50,
+    ) -> None:
+        """
+        Args:
+            chunks: The chunks to search. Any sequence works, e.g. one that
+                decodes chunks lazily from an index file.
+            embedder: Embedding function for chunks and queries. Defaults to
+                `HashingEmbedder`.
+            index: A prebuilt index whose rows match `chunks`. Built from the
+                chunks when omitted.
+            lexical: Optional BM25 index over the same chunks.
+            candidate_depth: Results taken from each ranking before fusion.
+        """
+        self.chunks = chunks
+        self.embedder = embedder or HashingEmbedder()
+        if index is None:
+            index = VectorIndex(
+                self.embedder([chunk.embedding_text() for chunk in self.chunks])
+            )
+        if len(index) != len(self.chunks):
+            raise ValueError(
+                f"Index has {len(index)} rows but there are {len(self.chunks)} chunks."
+            )
+        if lexical is not None and len(lexical) != len(self.chunks):
+            raise ValueError(
+                f"BM25 index has {len(lexical)} documents "
+                f"but there are {len(self.chunks)} chunks."
+            )
+        self.index = index
+        self.lexical = lexical
+        self.candidate_depth = candidate_depth
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(
+        self, query: str, top_k: int = 3, min_score: float = 0.0
+    ) -> list[tuple[KnowledgeChunk, float]]:
+        """Returns the chunks most similar to the query, best first."""
+        return self.search_batch([query], top_k, min_score)[0]
+
+    def search_batch(
+        self, queries: Sequence[str], top_k: int = 3, min_score: float = 0.0
+    ) -> list[list[tuple[KnowledgeChunk, float]]]:
+        """Searches several queries with a single matrix product.
+
+        Vector results with a cosine similarity of `min_score` or lower are
+        dropped: an irrelevant chunk does more harm than no chunk. The score
+        returned is the cosine similarity, or the fused RRF score in hybrid
+        mode, where a chunk also qualifies by matching query terms.
+        """
+        if not queries:
+            return []
+        depth = top_k if self.lexical is None else max(top_k, self.candidate_depth)
+        indices, scores = self.index.search(self.embedder(queries), depth)
+        results = []
+        for query, row_indices, row_scores in zip(
+            queries, indices, scores, strict=True
+        ):
+            ranked = [
+                (int(i), float(score))
+                for i, score in zip(row_indices, row_scores, strict=True)
+                if score > min_score
+            ]
+            if self.lexical is not None:
+                lexical_ranking = self.lexical.search(query, depth)[0].tolist()
+                ranked = reciprocal_rank_fusion(
+                    [[i for i, _ in ranked], lexical_ranking]
+                )
+            results.append([(self.chunks[i], score) for i, score in ranked[:top_k]])
+        return results
+
+
+@functools.cache
+def get_knowledge_base(path: str = "") -> KnowledgeBase:
+    """Returns the process-wide knowledge base, indexing it on first use.
+
+    Args:
+        path: Chunk file to load. Defaults to the bundled knowledge chunks.
+    """
+    chunks = load_chunks(path or DEFAULT_KNOWLEDGE_PATH)
+    knowledge_base = KnowledgeBase(
+        chunks, lexical=BM25Index.build(chunk.lexical_fields() for chunk in chunks)
+    )
+    logging.info(f"Indexed {len(knowledge_base)} knowledge chunks.")
+    return knowledge_base
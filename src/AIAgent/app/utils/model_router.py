@@ -0,0 +1,239 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from opentelemetry import trace
+
+
+@dataclass(frozen=True)
+class StageRoute:
+    """Model and tools for one conversation stage.
+
+    Attributes:
+        model: Model to call; empty means the agent's model.
+        tools: Names of the tools declared to the model; None means all of them.
+    """
+
+    model: str = ""
+    tools: frozenset[str] | None = None
+
+
+def _pairs(spec: str) -> dict[str, str]:
+    pairs = {}
+    for item in spec.split(";"):
+        if item.strip():
+            key, _, value = item.partition("=")
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+def parse_stage_routes(models: str, tools: str) -> dict[str, StageRoute]:
+    """Builds routes from `stage=model;...` and `stage=tool,tool;...` specs.
+
+    Args:
+        models: Model per stage, e.g. "stage_1_awareness=gemini-2.5-flash".
+        tools: Comma-separated tool names per stage, e.g.
+            "stage_2_integration=retrieve_wisdom,update_session_stage".
+
+    Returns:
+        The route of every stage named in either spec.
+    """
+    model_specs = _pairs(models)
+    tool_specs = {
+        stage: frozenset(name.strip() for name in names.split(",") if name.strip())
+        for stage, names in _pairs(tools).items()
+    }
+    return {
+        stage: StageRoute(model=model_specs.get(stage, ""), tools=tool_specs.get(stage))
+        for stage in model_specs.keys() | tool_specs.keys()
+    }
+
+
+def restrict_tools(llm_request: LlmRequest, allowed: Collection[str]) -> int:
+    """Removes the function declarations not in `allowed` from the request.
+
+    The tools stay in `llm_request.tools_dict`, so a call to a hidden tool still
+    runs.
+
+    Returns:
+        The number of declarations removed.
+    """
+    config = llm_request.config
+    if config is None or not config.tools:
+        return 0
+    removed = 0
+    tools = []
+    for tool in config.tools:
+        if not isinstance(tool, types.Tool) or not tool.function_declarations:
+            tools.append(tool)
+            continue
+        declarations = tool.function_declarations
+        kept = [d for d in declarations if d.name in allowed]
+        removed += len(declarations) - len(kept)
+        if kept:
+            tools.append(tool.model_copy(update={"function_declarations": kept}))
+    config.tools = tools or None
+    return removed
+
+
+class LatencyWindow:
+    """Time to the first response chunk of recent model calls, per model."""
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        min_samples: int = 5,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            window: Seconds a sample counts towards the percentile.
+            min_samples: Samples needed before a percentile is reported.
+            clock: Monotonic clock in seconds.
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.clock = clock
+        self._samples: defaultdict[str, deque[tuple[float, float]]] = defaultdict(deque)
+
+    def _recent(self, model: str) -> deque[tuple[float, float]]:
+        samples = self._samples[model]
+        horizon = self.clock() - self.window
+        while samples and samples[0][0] < horizon:
+            samples.popleft()
+        return samples
+
+    def record(self, model: str, seconds: float) -> None:
+        self._recent(model).append((self.clock(), seconds))
+
+    def p95(self, model: str) -> float | None:
+        """Returns the 95th percentile latency of `model`, or None if unknown."""
+        samples = self._recent(model)
+        if len(samples) < self.min_samples:
+            return None
+        latencies = sorted(seconds for _, seconds in samples)
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+
+@dataclass
+class RouterMetrics:
+    """Counters for `StageRouter`.
+
+    Attributes:
+        calls: Model calls routed.
+        fallbacks: Calls sent to the fallback model because of latency.
+        declarations_removed: Tool declarations kept out of requests.
+    """
+
+    calls: int = 0
+    fallbacks: int = 0
+    declarations_removed: int = 0
+
+
+class StageRouter:
+    """Picks the model and the declared tools of each call by conversation stage.
+
+    `before_model` reads the stage from session state, sets the model of its
+    `StageRoute` and removes the declarations of the tools the stage does not
+    offer. When the p95 time to first chunk of that model over the last
+    `latency_window` seconds exceeds `latency_slo`, the call goes to
+    `fallback_model` instead. Once the slow samples age out of the window the
+    routed model is tried again. `after_model` records the latencies.
+    """
+
+    def __init__(
+        self,
+        routes: Mapping[str, StageRoute],
+        *,
+        stage_key: str,
+        fallback_model: str = "",
+        latency_slo: float = 0.0,
+        latency_window: float = 60.0,
+        max_pending: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            routes: Route per stage. Other stages use the agent's model and tools.
+            stage_key: Session state key holding the current stage.
+            fallback_model: Model used under latency pressure; empty disables
+                the fallback.
+            latency_slo: Seconds to the first response chunk at p95; 0 disables
+                the fallback.
+            latency_window: Seconds of latency samples the p95 covers.
+            max_pending: Model calls awaiting their first chunk that are tracked.
+            clock: Monotonic clock in seconds.
+        """
+        self.routes = dict(routes)
+        self.stage_key = stage_key
+        self.fallback_model = fallback_model
+        self.latency_slo = latency_slo
+        self.latency = LatencyWindow(latency_window, clock=clock)
+        self.max_pending = max_pending
+        self.clock = clock
+        self.metrics = RouterMetrics()
+        # (model, start time) of calls awaiting their first chunk, by invocation id.
+        self._pending: dict[str, tuple[str, float]] = {}
+
+    def _over_slo(self, model: str) -> bool:
+        if not self.fallback_model or self.latency_slo <= 0:
+            return False
+        if model == self.fallback_model:
+            return False
+        p95 = self.latency.p95(model)
+        return p95 is not None and p95 > self.latency_slo
+
+    def before_model(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        stage = callback_context.state.get(self.stage_key)
+        route = self.routes.get(stage, StageRoute()) if stage else StageRoute()
+        model = route.model or llm_request.model or ""
+        fallback = self._over_slo(model)
+        if fallback:
+            model = self.fallback_model
+            self.metrics.fallbacks += 1
+        llm_request.model = model
+        removed = 0
+        if route.tools is not None:
+            removed = restrict_tools(llm_request, route.tools)
+            self.metrics.declarations_removed += removed
+        self.metrics.calls += 1
+        trace.get_current_span().set_attributes(
+            {
+                "onemind.route.stage": str(stage or ""),
+                "onemind.route.model": model,
+                "onemind.route.fallback": fallback,
+                "onemind.route.declarations_removed": removed,
+            }
+        )
+        while len(self._pending) >= self.max_pending:
+            del self._pending[next(iter(self._pending))]
+        self._pending[callback_context.invocation_id] = (model, self.clock())
+
+    def after_model(
+        self, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> None:
+        pending = self._pending.pop(callback_context.invocation_id, None)
+        if pending is not None:
+            model, started = pending
+            self.latency.record(model, self.clock() - started)
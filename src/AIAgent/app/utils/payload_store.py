@@ -0,0 +1,224 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Protocol
+
+import google.cloud.storage as storage
+
+# Upper bound on the UTF-8 bytes per character.
+_UTF8_BYTES_PER_CHAR = 4
+# Characters of an attribute kept when it cannot be offloaded.
+TRUNCATED_PREVIEW_CHARS = 1024
+
+
+def text_size(value: Any) -> int:
+    """Cheap size estimate of a JSON-like value: its string and key lengths."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(k) + text_size(v) for k, v in value.items())
+    if isinstance(value, list | tuple):
+        return sum(text_size(v) for v in value)
+    return 8
+
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=str).encode()
+
+
+class PayloadStore(Protocol):
+    """Blob storage for payloads too large to log."""
+
+    def available(self) -> bool:
+        """Whether payloads can be stored."""
+
+    def uri(self, name: str) -> str:
+        """The URI `name` is stored under."""
+
+    def put(self, name: str, data: bytes, content_encoding: str) -> None:
+        """Stores a JSON payload encoded with `content_encoding`."""
+
+
+class GcsPayloadStore:
+    """Stores payloads in a Cloud Storage bucket.
+
+    Whether the bucket exists is checked once, on first use.
+    """
+
+    def __init__(self, bucket: storage.Bucket) -> None:
+        self.bucket = bucket
+        self._exists: bool | None = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        with self._lock:
+            if self._exists is None:
+                self._exists = self.bucket.exists()
+                if not self._exists:
+                    logging.warning(
+                        f"Bucket {self.bucket.name} not found. "
+                        "Unable to store span attributes in GCS."
+                    )
+            return self._exists
+
+    def uri(self, name: str) -> str:
+        return f"gs://{self.bucket.name}/{name}"
+
+    def put(self, name: str, data: bytes, content_encoding: str) -> None:
+        blob = self.bucket.blob(name)
+        # GCS decompresses the payload for clients that do not accept gzip.
+        blob.content_encoding = content_encoding
+        blob.upload_from_string(data, content_type="application/json")
+
+
+class LocalPayloadStore:
+    """Stores payloads as files under a local directory."""
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        self.root = Path(root)
+
+    def available(self) -> bool:
+        return True
+
+    def uri(self, name: str) -> str:
+        return (self.root / name).absolute().as_uri()
+
+    def put(self, name: str, data: bytes, content_encoding: str) -> None:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+@dataclass
+class OffloadMetrics:
+    """Counters for attribute offloading.
+
+    Attributes:
+        offloaded (int): Attributes replaced by a reference to the store.
+        truncated (int): Attributes truncated because the store was unavailable.
+        bytes_in (int): Serialized size of the offloaded attributes.
+        bytes_stored (int): Compressed size of the offloaded attributes.
+        failures (int): Uploads that failed.
+    """
+
+    offloaded: int = 0
+    truncated: int = 0
+    bytes_in: int = 0
+    bytes_stored: int = 0
+    failures: int = 0
+
+
+class AttributeOffloader:
+    """Moves the largest attributes of oversized spans to a `PayloadStore`.
+
+    Attributes are left alone unless a cheap size estimate says they could
+    exceed `max_bytes`; only then are they serialized to measure them. The
+    largest attributes are offloaded one by one until the rest fit. Each is
+    gzipped and uploaded in the background under `<prefix>/<key>.json.gz`, and
+    replaced by `{"offloaded": uri, "bytes": size}` right away. If the store is
+    unavailable, attributes are truncated instead.
+    """
+
+    def __init__(
+        self,
+        store: PayloadStore,
+        max_bytes: int = 255 * 1024,
+        *,
+        max_workers: int = 4,
+        max_pending: int = 64,
+    ) -> None:
+        """
+        Args:
+            store: Where offloaded attributes are uploaded.
+            max_bytes: Maximum serialized size of the attributes that are kept.
+            max_workers: Concurrent uploads.
+            max_pending: Uploads queued or running before `offload` waits.
+        """
+        self.store = store
+        self.max_bytes = max_bytes
+        self.metrics = OffloadMetrics()
+        self._executor = ThreadPoolExecutor(max_workers, "AttributeOffloader")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending: set[Future[None]] = set()
+        self._lock = threading.Lock()
+
+    def offload(self, attributes: dict[str, Any], prefix: str) -> dict[str, Any]:
+        """Returns `attributes` with the largest ones offloaded until they fit."""
+        if text_size(attributes) * _UTF8_BYTES_PER_CHAR <= self.max_bytes:
+            return attributes
+        encoded = {key: _encode(value) for key, value in attributes.items()}
+        total = sum(len(key) + len(data) for key, data in encoded.items())
+        if total <= self.max_bytes:
+            return attributes
+        available = self.store.available()
+        result = dict(attributes)
+        for key in sorted(encoded, key=lambda k: len(encoded[k]), reverse=True):
+            if total <= self.max_bytes:
+                break
+            data = encoded[key]
+            if available:
+                result[key] = self._upload(f"{prefix}/{key}.json.gz", data)
+            else:
+                result[key] = {
+                    "truncated": data.decode()[:TRUNCATED_PREVIEW_CHARS],
+                    "bytes": len(data),
+                }
+                self.metrics.truncated += 1
+            total += len(_encode(result[key])) - len(data)
+        return result
+
+    def flush(self) -> None:
+        """Waits for the uploads in flight."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+
+    def close(self) -> None:
+        """Waits for the uploads in flight and stops the workers."""
+        self._executor.shutdown(wait=True)
+
+    def _upload(self, name: str, data: bytes) -> dict[str, Any]:
+        self.metrics.offloaded += 1
+        self.metrics.bytes_in += len(data)
+        self._slots.acquire()
+        future = self._executor.submit(self._put, name, data)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return {"offloaded": self.store.uri(name), "bytes": len(data)}
+
+    def _put(self, name: str, data: bytes) -> None:
+        compressed = gzip.compress(data, compresslevel=6)
+        try:
+            self.store.put(name, compressed, "gzip")
+        except Exception:
+            logging.exception(f"Failed to store span attribute payload {name}.")
+            with self._lock:
+                self.metrics.failures += 1
+            return
+        with self._lock:
+            self.metrics.bytes_stored += len(compressed)
+
+    def _done(self, future: Future[None]) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
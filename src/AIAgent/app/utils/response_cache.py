@@ -0,0 +1,157 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from .knowledge import Embedder, HashingEmbedder
+from .search_cache import normalize_query
+
+
+@dataclass
+class ResponseCacheStats:
+    """Cumulative cache counters."""
+
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    bypasses: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+
+@dataclass
+class _Entry:
+    value: str
+    vector: np.ndarray
+    size: int
+
+
+class ResponseCache:
+    """Model responses keyed by context and prompt, with near-duplicate lookup.
+
+    The context key holds everything besides the prompt that the response depends
+    on (model, stage, tool state); only prompts within the same context are ever
+    compared. A prompt matches on its normalized text. Near-duplicate lookup,
+    which serves the most similar cached prompt whose cosine similarity is at
+    least `similarity`, is off by default: a lexical embedding scores prompts
+    that differ by a negation, e.g. "I want to" and "I don't want to", as near
+    duplicates.
+
+    Entries are evicted least recently used first, keeping at most `max_entries`
+    entries and `max_bytes` bytes of values and embeddings.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 16 * 2**20,
+        similarity: float = math.inf,
+        embedder: Embedder | None = None,
+    ) -> None:
+        """
+        Args:
+            max_entries: Maximum number of cached responses.
+            max_bytes: Maximum total size of cached values and embeddings.
+            similarity: Minimum cosine similarity for a near-duplicate hit;
+                above 1, the default, serves exact matches only.
+            embedder: Embeds normalized prompts; a `HashingEmbedder` if
+                omitted, which makes near duplicates lexical ones.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self.embedder: Embedder = embedder or HashingEmbedder()
+        self.stats = ResponseCacheStats()
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._lru: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._contexts: dict[str, dict[str, _Entry]] = {}
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def get(self, context: str, prompt: str) -> str | None:
+        """Returns the cached response for `prompt` in `context`, or None."""
+        text = normalize_query(prompt)
+        with self._lock:
+            entries = self._contexts.get(context, {})
+            if text in entries:
+                self.stats.hits += 1
+                self._lru.move_to_end((context, text))
+                return entries[text].value
+            if entries and self.similarity <= 1:
+                query = self._embed(text)
+                keys = list(entries)
+                scores = np.stack([entries[k].vector for k in keys]) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity:
+                    self.stats.semantic_hits += 1
+                    self._lru.move_to_end((context, keys[best]))
+                    return entries[keys[best]].value
+            self.stats.misses += 1
+            return None
+
+    def put(self, context: str, prompt: str, value: str) -> None:
+        """Caches `value` as the response to `prompt` in `context`."""
+        text = normalize_query(prompt)
+        vector = self._embed(text)
+        entry = _Entry(value, vector, len(value.encode()) + vector.nbytes)
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove((context, text))
+            self._lru[(context, text)] = entry
+            self._contexts.setdefault(context, {})[text] = entry
+            self.bytes += entry.size
+            self.stats.stores += 1
+            while len(self._lru) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._lru)))
+                self.stats.evictions += 1
+
+    def bypass(self) -> None:
+        """Counts a request that was not eligible for caching."""
+        self.stats.bypasses += 1
+
+    def span_attributes(self) -> dict[str, int]:
+        """Counters formatted as OpenTelemetry span attributes."""
+        return {
+            f"onemind.response_cache.{name}": value
+            for name, value in {
+                **asdict(self.stats),
+                "size": len(self),
+                "bytes": self.bytes,
+            }.items()
+        }
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = self.embedder([text])[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        # Caller holds the lock.
+        entry = self._lru.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        context, text = key
+        entries = self._contexts[context]
+        del entries[text]
+        if not entries:
+            del self._contexts[context]
@@ -0,0 +1,196 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+# Plan tags such as [RESEARCH][MODIFIED], Markdown emphasis and punctuation.
+_NOISE = re.compile(r"\[[A-Z]+\]|[^\w\s]")
+
+
+def normalize_query(query: str) -> str:
+    """Reduces a search query or research goal to its cache key.
+
+    Applies NFKC, case folding, and drops plan tags, punctuation and repeated
+    whitespace, so near-duplicates such as `**[RESEARCH]** Analyze X.` and
+    `analyze  x` share one entry.
+    """
+    query = _NOISE.sub(" ", unicodedata.normalize("NFKC", query))
+    return " ".join(query.casefold().split())
+
+
+@dataclass
+class SearchCacheStats:
+    """Cumulative cache counters."""
+
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    deduplicated: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class SearchCache:
+    """TTL + LRU cache of search results keyed by normalized query.
+
+    Values are opaque strings (serialized grounded model responses). An optional
+    SQLite file backs the in-memory LRU so entries survive restarts; it is opened
+    on first use. Concurrent lookups of the same key are deduplicated with
+    `claim` and `release`: the first caller runs the search, the others wait for
+    its result.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl: float = 86400.0,
+        path: str = "",
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Args:
+            max_size: Maximum number of entries kept in memory.
+            ttl: Seconds an entry stays valid after it was written.
+            path: Optional SQLite file backing the cache.
+            clock: Wall-clock time source (entries outlive the process),
+                overridable in tests.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.stats = SearchCacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._pending: dict[str, asyncio.Future[str | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached value, or None on a miss or expired entry."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self.stats.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry[0]
+            row = None
+            if self.path:
+                row = (
+                    self._store()
+                    .execute(
+                        "SELECT value, expires_at FROM search_results"
+                        " WHERE key = ? AND expires_at > ?",
+                        (key, now),
+                    )
+                    .fetchone()
+                )
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self.stats.disk_hits += 1
+            self._insert(key, row[0], row[1])
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Caches a value for `ttl` seconds."""
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._insert(key, value, expires_at)
+            if self.path:
+                db = self._store()
+                db.execute(
+                    "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+                db.commit()
+
+    def claim(self, key: str) -> asyncio.Future[str | None] | None:
+        """Registers the caller as the one searching for `key`.
+
+        Returns None if the caller should run the search and then `release` the
+        key, or the future of the search already in flight for it.
+        """
+        if (pending := self._pending.get(key)) is not None:
+            self.stats.deduplicated += 1
+            return pending
+        self._pending[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def release(self, key: str, value: str | None) -> None:
+        """Publishes the result of a claimed search (None if it failed)."""
+        pending = self._pending.pop(key, None)
+        if pending is not None and not pending.done():
+            pending.set_result(value)
+        if value is not None:
+            self.put(key, value)
+
+    def purge_expired(self) -> None:
+        """Drops expired rows from the SQLite store."""
+        if self.path:
+            with self._lock:
+                db = self._store()
+                db.execute(
+                    "DELETE FROM search_results WHERE expires_at <= ?", (self._clock(),)
+                )
+                db.commit()
+
+    def span_attributes(self) -> dict[str, int | float]:
+        """Counters and the hit rate formatted as OpenTelemetry span attributes."""
+        lookups = self.stats.hits + self.stats.disk_hits + self.stats.misses
+        hit_rate = (
+            (self.stats.hits + self.stats.disk_hits) / lookups if lookups else 0.0
+        )
+        return {
+            f"onemind.search_cache.{name}": value
+            for name, value in {
+                **asdict(self.stats),
+                "size": len(self),
+                "hit_rate": round(hit_rate, 4),
+            }.items()
+        }
+
+    def _insert(self, key: str, value: str, expires_at: float) -> None:
+        # Caller holds the lock.
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _store(self) -> sqlite3.Connection:
+        # Caller holds the lock.
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS search_results"
+                " (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
@@ -0,0 +1,162 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+
+@dataclass(frozen=True)
+class SessionState:
+    """The per-session values `get_session` returns to the orchestrator."""
+
+    stage: str
+    memory_insight: str
+
+
+@dataclass
+class SessionCacheStats:
+    """Cumulative cache counters."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class SessionStateCache:
+    """In-process TTL + LRU cache of session state keyed by (user_id, session_id).
+
+    Writers update the cache right after the database write succeeds
+    (write-through), so steady-state reads never go to Supabase. The TTL bounds
+    how stale an entry can get when another worker changes the same session.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            max_size: Maximum number of cached sessions.
+            ttl: Seconds an entry stays valid after it was last written.
+            clock: Monotonic time source, overridable in tests.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = SessionCacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple[SessionState, float]] = (
+            OrderedDict()
+        )
+        # Secondary indexes for write-through updates that only know one half
+        # of the key: stage updates carry a session id, crystals a user id.
+        self._owner: dict[str, str] = {}
+        self._sessions_by_user: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, session_id: str) -> SessionState | None:
+        """Returns the cached state, or None on a miss or expired entry."""
+        key = (user_id, session_id)
+        with self._lock:
+            state = self._live(key)
+            if state is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return state
+
+    def put(self, user_id: str, session_id: str, state: SessionState) -> None:
+        """Caches the state of a session, evicting the least recently used."""
+        key = (user_id, session_id)
+        with self._lock:
+            self._entries[key] = (state, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            self._owner[session_id] = user_id
+            self._sessions_by_user.setdefault(user_id, set()).add(session_id)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def set_stage(self, session_id: str, stage: str) -> None:
+        """Write-through for `update_session_stage`."""
+        with self._lock:
+            user_id = self._owner.get(session_id)
+        if user_id is None:
+            return
+        state = self._peek(user_id, session_id)
+        if state is not None:
+            self.put(user_id, session_id, SessionState(stage, state.memory_insight))
+
+    def set_memory_insight(self, user_id: str, memory_insight: str) -> None:
+        """Write-through for `create_integration_crystal`.
+
+        The latest crystal is shared by all of a user's sessions.
+        """
+        with self._lock:
+            session_ids = list(self._sessions_by_user.get(user_id, ()))
+        for session_id in session_ids:
+            state = self._peek(user_id, session_id)
+            if state is not None:
+                self.put(user_id, session_id, SessionState(state.stage, memory_insight))
+
+    def invalidate(self, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._remove((user_id, session_id))
+
+    def span_attributes(self) -> dict[str, int]:
+        """Counters formatted as OpenTelemetry span attributes."""
+        return {
+            f"onemind.session_cache.{name}": value
+            for name, value in {**asdict(self.stats), "size": len(self)}.items()
+        }
+
+    def _peek(self, user_id: str, session_id: str) -> SessionState | None:
+        # Reads without touching LRU order or hit/miss counters. Write-through
+        # updates must not give an expired entry a fresh TTL.
+        with self._lock:
+            return self._live((user_id, session_id))
+
+    def _live(self, key: tuple[str, str]) -> SessionState | None:
+        # Caller holds the lock. Drops the entry if it has expired.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        state, expires_at = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        return state
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        # Caller holds the lock.
+        if self._entries.pop(key, None) is None:
+            return
+        user_id, session_id = key
+        self._owner.pop(session_id, None)
+        sessions = self._sessions_by_user.get(user_id)
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self._sessions_by_user[user_id]
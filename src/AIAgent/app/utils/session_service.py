@@ -0,0 +1,377 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import re
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any
+
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+from opentelemetry import trace
+
+from .db import SupabaseRestClient
+
+# Placeholder URI under which `fast_api_session_service` installs a service.
+SESSION_SERVICE_URI = "onemind://sessions"
+
+_TIMESTAMP = re.compile(r"(.*\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}(?::?\d{2})?)?")
+
+
+def parse_timestamp(value: str) -> float:
+    """Returns the POSIX time of a PostgREST `timestamptz` value.
+
+    Postgres drops trailing zeros from fractional seconds and may write the
+    offset as `+00`, neither of which `datetime.fromisoformat` accepts before
+    Python 3.11.
+    """
+    match = _TIMESTAMP.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    time, fraction, offset = match.groups()
+    if fraction:
+        time += "." + fraction[:6].ljust(6, "0")
+    if offset == "Z":
+        offset = "+00:00"
+    elif offset:
+        digits = offset[1:].replace(":", "")
+        offset = f"{offset[0]}{digits[:2]}:{digits[2:] or '00'}"
+    return datetime.fromisoformat(time + (offset or "")).timestamp()
+
+
+def split_state(
+    state: dict[str, Any] | None,
+) -> tuple[dict[str, Any], dict[str, Any], dict[str, Any]]:
+    """Splits ADK state into its session, app and user scopes.
+
+    `temp:` keys are dropped; app and user keys keep their prefix.
+    """
+    session: dict[str, Any] = {}
+    app: dict[str, Any] = {}
+    user: dict[str, Any] = {}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            app[key] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return session, app, user
+
+
+@dataclass
+class _HotSession:
+    state: dict[str, Any]
+    events: list[Event]
+    event_count: int
+    update_time: float
+
+
+@dataclass
+class SessionServiceMetrics:
+    """Counters for the session service.
+
+    Attributes:
+        hits (int): `get_session` calls served from a cached session, fetching
+            only the events appended since.
+        misses (int): `get_session` calls that fetched the recent events.
+        evictions (int): Sessions dropped from the cache to respect its size.
+        events_loaded (int): Events fetched from the database.
+        events_appended (int): Events written to the database.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    events_loaded: int = 0
+    events_appended: int = 0
+
+
+class HotSessionCache:
+    """LRU cache of the state and recent events of active sessions."""
+
+    def __init__(self, max_size: int, metrics: SessionServiceMetrics) -> None:
+        """
+        Args:
+            max_size: Maximum number of cached sessions; 0 disables the cache.
+            metrics: Counters to record evictions in.
+        """
+        self.max_size = max_size
+        self.metrics = metrics
+        self._entries: OrderedDict[tuple[str, str, str], _HotSession] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple[str, str, str]) -> _HotSession | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple[str, str, str], entry: _HotSession) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.metrics.evictions += 1
+
+    def invalidate(self, key: tuple[str, str, str]) -> None:
+        self._entries.pop(key, None)
+
+
+class SupabaseSessionService(BaseSessionService):
+    """ADK session service backed by Postgres, through Supabase.
+
+    Uses the tables and functions of src/sql/12_adk_sessions.sql. Appending an
+    event is one RPC that inserts the event and merges its state delta on the
+    server, without reading the session first. Loading a session fetches its
+    state and only its `max_events` most recent events.
+
+    Sessions read or written by this process stay in a bounded LRU cache. A
+    cached session is still validated on every read, but only the events
+    appended since it was cached, e.g. by another worker, are fetched.
+    """
+
+    def __init__(
+        self,
+        db: SupabaseRestClient,
+        *,
+        max_events: int = 100,
+        cache_size: int = 1000,
+    ) -> None:
+        """
+        Args:
+            db: The Supabase client.
+            max_events: Events loaded per session when the caller does not ask
+                for a number of recent events.
+            cache_size: Maximum number of cached sessions; 0 disables the cache.
+        """
+        self.db = db
+        self.max_events = max_events
+        self.metrics = SessionServiceMetrics()
+        self.cache = HotSessionCache(cache_size, self.metrics)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+    ) -> Session:
+        session_id = (
+            session_id.strip() if session_id and session_id.strip() else None
+        ) or str(uuid.uuid4())
+        session_state, app_state, user_state = split_state(state)
+        result = await self.db.rpc(
+            "create_adk_session",
+            {
+                "p_app_name": app_name,
+                "p_user_id": user_id,
+                "p_session_id": session_id,
+                "p_state": session_state,
+                "p_app_state": app_state,
+                "p_user_state": user_state,
+            },
+        )
+        self.cache.put(
+            (app_name, user_id, session_id),
+            _HotSession(result["state"], [], 0, result["update_time"]),
+        )
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=copy.deepcopy(result["state"]),
+            last_update_time=result["update_time"],
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        key = (app_name, user_id, session_id)
+        limit = (config and config.num_recent_events) or self.max_events
+        after_timestamp = config.after_timestamp if config else None
+        # The cache holds the last `max_events` events, so it can only serve
+        # reads of at most that many events and no time filter.
+        cached = (
+            self.cache.get(key)
+            if limit <= self.max_events and after_timestamp is None
+            else None
+        )
+        result = await self.db.rpc(
+            "get_adk_session",
+            {
+                "p_app_name": app_name,
+                "p_user_id": user_id,
+                "p_session_id": session_id,
+                "p_limit": limit if cached is None else self.max_events,
+                "p_after_position": -1 if cached is None else cached.event_count - 1,
+                "p_after_timestamp": after_timestamp,
+            },
+            idempotent=True,
+        )
+        if result is None:
+            self.cache.invalidate(key)
+            return None
+
+        loaded = [Event.model_validate(event) for event in result["events"]]
+        self.metrics.events_loaded += len(loaded)
+        if cached is None:
+            self.metrics.misses += 1
+            events = loaded
+        else:
+            self.metrics.hits += 1
+            events = (cached.events + loaded)[-self.max_events :]
+        if cached is not None or (after_timestamp is None and limit >= self.max_events):
+            self.cache.put(
+                key,
+                _HotSession(
+                    result["state"],
+                    events[-self.max_events :],
+                    result["event_count"],
+                    result["update_time"],
+                ),
+            )
+        trace.get_current_span().set_attribute(
+            "onemind.sessions.events_loaded", len(loaded)
+        )
+        return Session(
+            id=session_id,
+            app_name=app_name,
+            user_id=user_id,
+            state=copy.deepcopy(result["state"]),
+            events=events[-limit:],
+            last_update_time=result["update_time"],
+        )
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str
+    ) -> ListSessionsResponse:
+        rows = await self.db.select(
+            "adk_sessions",
+            "id,update_time",
+            filters={"app_name": app_name, "user_id": user_id},
+        )
+        return ListSessionsResponse(
+            sessions=[
+                Session(
+                    id=row["id"],
+                    app_name=app_name,
+                    user_id=user_id,
+                    last_update_time=parse_timestamp(row["update_time"]),
+                )
+                for row in rows
+            ]
+        )
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        await self.db.delete(
+            "adk_sessions",
+            filters={"app_name": app_name, "user_id": user_id, "id": session_id},
+        )
+        self.cache.invalidate((app_name, user_id, session_id))
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        delta = event.actions.state_delta if event.actions else None
+        state_delta, app_delta, user_delta = split_state(delta)
+        event_count = await self.db.rpc(
+            "append_adk_event",
+            {
+                "p_app_name": session.app_name,
+                "p_user_id": session.user_id,
+                "p_session_id": session.id,
+                "p_event": event.model_dump(mode="json", exclude_none=True),
+                "p_timestamp": event.timestamp,
+                "p_state_delta": state_delta,
+                "p_app_state_delta": app_delta,
+                "p_user_state_delta": user_delta,
+            },
+        )
+        if event_count is None:
+            raise ValueError(f"Session {session.id} not found.")
+        self.metrics.events_appended += 1
+        await super().append_event(session, event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        cached = self.cache.get(key)
+        if cached is None:
+            return event
+        if cached.event_count != event_count - 1:
+            # Another writer appended in between; refetch on the next read.
+            self.cache.invalidate(key)
+            return event
+        cached.state.update({**state_delta, **app_delta, **user_delta})
+        cached.events = [*cached.events, event][-self.max_events :]
+        cached.event_count = event_count
+        cached.update_time = event.timestamp
+        return event
+
+    def span_attributes(self) -> dict[str, int]:
+        """Counters formatted as OpenTelemetry span attributes."""
+        return {
+            f"onemind.sessions.{name}": value
+            for name, value in {
+                **asdict(self.metrics),
+                "cached": len(self.cache),
+            }.items()
+        }
+
+
+@contextmanager
+def fast_api_session_service(
+    service: BaseSessionService | None,
+) -> Iterator[str | None]:
+    """Makes ADK's `get_fast_api_app` use `service` for sessions.
+
+    ADK 1.5 only builds session services from a URI, and builds its SQL
+    `DatabaseSessionService` for any URI it does not recognize. While the
+    context is active, that class is replaced by `service`; pass the yielded
+    URI as `session_service_uri`. Without a service, yields None, which keeps
+    ADK's in-memory sessions.
+    """
+    if service is None:
+        yield None
+        return
+    from google.adk.cli import fast_api
+
+    original = fast_api.DatabaseSessionService
+    fast_api.DatabaseSessionService = lambda db_url: service  # type: ignore[assignment]
+    try:
+        yield SESSION_SERVICE_URI
+    finally:
+        fast_api.DatabaseSessionService = original
@@ -0,0 +1,168 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from google.adk.tools import BaseTool, ToolContext
+from google.genai import types
+from opentelemetry import trace
+
+tracer = trace.get_tracer(__name__)
+
+
+@dataclass
+class ToolDispatchMetrics:
+    """Counters for `ParallelToolDispatcher`.
+
+    Attributes:
+        batches: Model responses whose calls were started together.
+        calls: Calls started by the dispatcher.
+        in_flight: Calls running right now.
+        peak_in_flight: Highest `in_flight` seen.
+    """
+
+    batches: int = 0
+    calls: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+class ParallelToolDispatcher:
+    """Runs the independent function calls of one model response concurrently.
+
+    ADK executes the function calls of a model response one after another. Used
+    as an agent's `before_tool_callback`, the dispatcher starts every call of the
+    response to one of its `tools` as soon as the first of them is about to run,
+    at most `max_concurrency` at a time, and hands each result to ADK when ADK
+    reaches that call. The calls then take as long as the slowest one rather than
+    their sum. Responses with a single such call, and calls to other tools, are
+    left to ADK.
+
+    Each started call gets an `onemind.tool <name>` span with its queueing and
+    run time, under the span of the call that started the batch.
+
+    Only tools that ignore their `ToolContext` may be given: a call started early
+    runs with a context of its own, whose state and actions ADK never sees.
+    """
+
+    def __init__(
+        self,
+        tools: Iterable[BaseTool],
+        max_concurrency: int = 4,
+        max_pending: int = 1024,
+    ) -> None:
+        """
+        Args:
+            tools: Tools whose calls may run concurrently with each other.
+            max_concurrency: Calls of one invocation running at the same time.
+            max_pending: Started calls ADK has not collected yet before the
+                oldest are cancelled, e.g. after an earlier call failed.
+        """
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.metrics = ToolDispatchMetrics()
+        # Calls started ahead of ADK, by function call id.
+        self._started: OrderedDict[str, asyncio.Task[Any]] = OrderedDict()
+
+    async def before_tool(
+        self, tool: BaseTool, args: dict[str, Any], tool_context: ToolContext
+    ) -> dict[str, Any] | None:
+        """Returns the result of a call started with its batch, or None."""
+        call_id = tool_context.function_call_id
+        if tool.name not in self.tools or not call_id:
+            return None
+        task = self._started.pop(call_id, None)
+        if task is None:
+            calls = self._batch(tool_context, call_id)
+            if len(calls) < 2:
+                return None
+            self._start(calls, tool_context)
+            task = self._started.pop(call_id)
+        wait_start = time.perf_counter()
+        result = await task
+        trace.get_current_span().set_attribute(
+            "onemind.tool.wait_ms", (time.perf_counter() - wait_start) * 1e3
+        )
+        # ADK wraps results the same way, and runs the tool itself when the
+        # callback returns an empty dict.
+        if isinstance(result, dict) and result:
+            return result
+        return {"result": result}
+
+    def _batch(
+        self, tool_context: ToolContext, call_id: str
+    ) -> list[types.FunctionCall]:
+        # The model response has been appended to the session before its calls run.
+        for event in reversed(tool_context._invocation_context.session.events):
+            calls = event.get_function_calls()
+            if any(call.id == call_id for call in calls):
+                return [call for call in calls if call.name in self.tools]
+        return []
+
+    def _start(
+        self, calls: list[types.FunctionCall], tool_context: ToolContext
+    ) -> None:
+        # The responses of an invocation are handled one after another, so a
+        # semaphore per response caps the invocation.
+        slots = asyncio.Semaphore(self.max_concurrency)
+        invocation_context = tool_context._invocation_context
+        self.metrics.batches += 1
+        for call in calls:
+            if not call.id or not call.name or call.id in self._started:
+                continue
+            context = ToolContext(invocation_context, function_call_id=call.id)
+            self._started[call.id] = asyncio.create_task(
+                self._run(self.tools[call.name], call, context, slots, len(calls))
+            )
+            self.metrics.calls += 1
+        while len(self._started) > self.max_pending:
+            _, stale = self._started.popitem(last=False)
+            stale.cancel()
+
+    async def _run(
+        self,
+        tool: BaseTool,
+        call: types.FunctionCall,
+        tool_context: ToolContext,
+        slots: asyncio.Semaphore,
+        batch_size: int,
+    ) -> Any:
+        metrics = self.metrics
+        with tracer.start_as_current_span(f"onemind.tool {tool.name}") as span:
+            queued = time.perf_counter()
+            async with slots:
+                started = time.perf_counter()
+                metrics.in_flight += 1
+                metrics.peak_in_flight = max(metrics.peak_in_flight, metrics.in_flight)
+                try:
+                    return await tool.run_async(
+                        args=call.args or {}, tool_context=tool_context
+                    )
+                finally:
+                    metrics.in_flight -= 1
+                    finished = time.perf_counter()
+                    span.set_attributes(
+                        {
+                            "onemind.tool.call_id": call.id or "",
+                            "onemind.tool.batch_size": batch_size,
+                            "onemind.tool.queue_ms": (started - queued) * 1e3,
+                            "onemind.tool.duration_ms": (finished - started) * 1e3,
+                        }
+                    )
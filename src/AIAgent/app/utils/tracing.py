@@ -14,14 +14,297 @@
 
 import json
 import logging
-from collections.abc import Sequence
-from typing import Any
+import sys
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol, TextIO
 
 import google.cloud.storage as storage
 from google.cloud import logging as google_cloud_logging
+from opentelemetry import trace
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import ReadableSpan
-from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.util import ns_to_iso_str
+
+from .payload_store import AttributeOffloader, GcsPayloadStore, PayloadStore, text_size
+
+# Cloud Logging accepts entries up to 256 KB and requests up to 10 MB.
+MAX_LOG_ENTRY_BYTES = 255 * 1024
+MAX_LOG_REQUEST_BYTES = 8 * 2**20
+
+
+def _resource_dict(resource: Resource) -> dict[str, Any]:
+    return {"attributes": dict(resource.attributes), "schema_url": resource.schema_url}
+
+
+def span_to_dict(span: ReadableSpan) -> dict[str, Any]:
+    """Returns the fields of `span.to_json()` without the JSON round trip.
+
+    Attribute values are kept as they are (tuples are not turned into lists).
+    """
+    context = span.context
+    status = {"status_code": span.status.status_code.name}
+    if span.status.description:
+        status["description"] = span.status.description
+    return {
+        "name": span.name,
+        "context": {
+            "trace_id": f"0x{trace.format_trace_id(context.trace_id)}",
+            "span_id": f"0x{trace.format_span_id(context.span_id)}",
+            "trace_state": repr(context.trace_state),
+        }
+        if context
+        else None,
+        "kind": str(span.kind),
+        "parent_id": f"0x{trace.format_span_id(span.parent.span_id)}"
+        if span.parent
+        else None,
+        "start_time": ns_to_iso_str(span.start_time) if span.start_time else None,
+        "end_time": ns_to_iso_str(span.end_time) if span.end_time else None,
+        "status": status,
+        "attributes": dict(span.attributes or {}),
+        "events": [
+            {
+                "name": event.name,
+                "timestamp": ns_to_iso_str(event.timestamp),
+                "attributes": dict(event.attributes or {}),
+            }
+            for event in span.events
+        ],
+        "links": [
+            {
+                "context": {
+                    "trace_id": f"0x{trace.format_trace_id(link.context.trace_id)}",
+                    "span_id": f"0x{trace.format_span_id(link.context.span_id)}",
+                    "trace_state": repr(link.context.trace_state),
+                },
+                "attributes": dict(link.attributes or {}),
+            }
+            for link in span.links
+        ],
+        "resource": _resource_dict(span.resource),
+    }
+
+
+class SpanSink(Protocol):
+    """Destination of serialized spans."""
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        """Writes a batch of span entries."""
+
+    def close(self) -> None:
+        """Releases the sink's resources."""
+
+
+class CloudLoggingSink:
+    """Writes span entries to Cloud Logging, one API call per batch.
+
+    Batches are split so that no request exceeds Cloud Logging's size limit.
+    """
+
+    def __init__(
+        self,
+        logger: google_cloud_logging.Logger,
+        labels: dict[str, str] | None = None,
+        severity: str = "INFO",
+    ) -> None:
+        self.logger = logger
+        self.labels = labels
+        self.severity = severity
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        batch = self.logger.batch()
+        size = 0
+        for entry in entries:
+            entry_size = text_size(entry) * 4  # UTF-8 bytes per character, at most
+            if size and size + entry_size > MAX_LOG_REQUEST_BYTES:
+                batch.commit()
+                batch, size = self.logger.batch(), 0
+            batch.log_struct(entry, labels=self.labels, severity=self.severity)
+            size += entry_size
+        batch.commit()
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlSink:
+    """Appends span entries to a JSON Lines file, or writes them to stdout."""
+
+    def __init__(self, path: str = "-") -> None:
+        """
+        Args:
+            path: The file to append to; "-" for stdout.
+        """
+        self.path = path
+        self._file: TextIO = (
+            sys.stdout if path == "-" else open(path, "a", encoding="utf-8")
+        )
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        self._file.write(
+            "".join(
+                json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+                for entry in entries
+            )
+        )
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+@dataclass
+class SpanLogMetrics:
+    """Counters for the span log exporter.
+
+    Attributes:
+        enqueued (int): Spans accepted by the queue.
+        dropped (int): Spans dropped because the queue was full or closed.
+        written (int): Spans written to the sinks.
+        batches (int): Batches written.
+        failures (int): Batch writes that failed, per sink.
+    """
+
+    enqueued: int = 0
+    dropped: int = 0
+    written: int = 0
+    batches: int = 0
+    failures: int = 0
+
+
+class SpanLogExporter(SpanExporter):
+    """Writes spans to sinks in batches from a bounded background queue.
+
+    `export` only enqueues spans, so it never waits for a sink. A background
+    thread serializes each span once with `span_to_dict`, applies `transform`,
+    and writes up to `batch_size` entries per sink call, as soon as a batch is
+    full or every `flush_interval` seconds. Spans exported while
+    `max_queue_size` spans are pending are dropped and counted. `force_flush`
+    and `shutdown` drain the queue.
+    """
+
+    def __init__(
+        self,
+        sinks: Iterable[SpanSink],
+        *,
+        max_queue_size: int = 4096,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        transform: Callable[[ReadableSpan, dict[str, Any]], dict[str, Any]]
+        | None = None,
+    ) -> None:
+        """
+        Args:
+            sinks: Destinations every batch is written to.
+            max_queue_size: Maximum number of pending spans.
+            batch_size: Maximum number of entries per sink call.
+            flush_interval: Maximum seconds a span stays queued.
+            transform: Optional function turning a span and its dict into the
+                entry to write.
+        """
+        self.sinks = list(sinks)
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.transform = transform
+        self.metrics = SpanLogMetrics()
+        self._queue: deque[ReadableSpan] = deque()
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._writing = False
+        self._flushes = 0
+        self._closed = False
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """Enqueues the spans, dropping those that do not fit."""
+        with self._cond:
+            if self._closed:
+                self.metrics.dropped += len(spans)
+                return SpanExportResult.FAILURE
+            accepted = max(0, min(len(spans), self.max_queue_size - len(self._queue)))
+            self._queue.extend(spans[:accepted])
+            self.metrics.enqueued += accepted
+            self.metrics.dropped += len(spans) - accepted
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="SpanLogExporter", daemon=True
+                )
+                self._thread.start()
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Waits until the queued spans are written; False on timeout."""
+        with self._cond:
+            self._flushes += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not (self._queue or self._writing) or self._thread is None,
+                    timeout_millis / 1e3,
+                )
+            finally:
+                self._flushes -= 1
+
+    def shutdown(self) -> None:
+        """Writes the queued spans, stops the thread and closes the sinks."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        for sink in self.sinks:
+            sink.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: (
+                        len(self._queue) >= self.batch_size
+                        or self._flushes
+                        or self._closed
+                    ),
+                    self.flush_interval,
+                )
+                if not self._queue:
+                    if self._closed:
+                        return
+                    continue
+                batch = [
+                    self._queue.popleft()
+                    for _ in range(min(self.batch_size, len(self._queue)))
+                ]
+                self._writing = True
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def _write(self, batch: list[ReadableSpan]) -> None:
+        entries = [span_to_dict(span) for span in batch]
+        if self.transform is not None:
+            entries = [
+                self.transform(s, e) for s, e in zip(batch, entries, strict=True)
+            ]
+        for sink in self.sinks:
+            try:
+                sink.write(entries)
+            except Exception:
+                self.metrics.failures += 1
+                logging.exception(f"Failed to write {len(entries)} spans.")
+        self.metrics.written += len(entries)
+        self.metrics.batches += 1
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -38,6 +321,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         logging_client: google_cloud_logging.Client | None = None,
         storage_client: storage.Client | None = None,
         bucket_name: str | None = None,
+        payload_store: PayloadStore | None = None,
         debug: bool = False,
         **kwargs: Any,
     ) -> None:
@@ -47,6 +331,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param logging_client: Google Cloud Logging client
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
+        :param payload_store: Store for large payloads, instead of the GCS bucket
         :param debug: Enable debug mode for additional logging
         :param kwargs: Additional arguments to pass to the parent class
         """
@@ -61,91 +346,123 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             bucket_name or f"{self.project_id}-onemind-logs-data"
         )
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        self.offloader = AttributeOffloader(
+            payload_store or GcsPayloadStore(self.bucket), MAX_LOG_ENTRY_BYTES
+        )
+        # Log entries are written in batches from a background thread.
+        self.log_exporter = SpanLogExporter(
+            [
+                CloudLoggingSink(
+                    self.logger,
+                    labels={"type": "agent_telemetry", "service_name": "onemind"},
+                )
+            ],
+            transform=self._log_entry,
+        )
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
-        Export the spans to Google Cloud Logging and Cloud Trace.
+        Queue the spans for Google Cloud Logging and export them to Cloud Trace.
 
         :param spans: A sequence of spans to export
-        :return: The result of the export operation
+        :return: The result of the Cloud Trace export
         """
-        for span in spans:
-            span_context = span.get_span_context()
-            trace_id = format(span_context.trace_id, "x")
-            span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
-
-            span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
-            span_dict["span_id"] = span_id
+        self.log_exporter.export(spans)
+        # Export spans to Google Cloud Trace using the parent class method
+        return super().export(spans)
 
-            span_dict = self._process_large_attributes(
-                span_dict=span_dict, span_id=span_id
-            )
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """
+        Wait until the queued spans are written to Google Cloud Logging.
 
-            if self.debug:
-                print(span_dict)
+        :param timeout_millis: Maximum time to wait
+        :return: False if the timeout expired
+        """
+        return self.log_exporter.force_flush(timeout_millis)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
-                span_dict,
-                labels={
-                    "type": "agent_telemetry",
-                    "service_name": "onemind",
-                },
-                severity="INFO",
-            )
-        # Export spans to Google Cloud Trace using the parent class method
-        return super().export(spans)
+    def shutdown(self) -> None:
+        """Flush the queued spans to Google Cloud Logging and shut down."""
+        self.log_exporter.shutdown()
+        self.offloader.close()
+        super().shutdown()
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def _log_entry(self, span: ReadableSpan, span_dict: dict) -> dict:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Build the Google Cloud Logging entry of a span.
 
-        :param content: The content to store
-        :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        :param span: The span
+        :param span_dict: The span data dictionary
+        :return: The log entry
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
-            logging.warning(
-                f"Bucket {self.bucket_name} not found. "
-                "Unable to store span attributes in GCS."
-            )
-            return "GCS bucket not found"
+        span_context = span.get_span_context()
+        trace_id = format(span_context.trace_id, "x")
+        span_id = format(span_context.span_id, "x")
 
-        blob_name = f"spans/{span_id}.json"
-        blob = self.bucket.blob(blob_name)
+        span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
+        span_dict["span_id"] = span_id
 
-        blob.upload_from_string(content, "application/json")
-        return f"gs://{self.bucket_name}/{blob_name}"
+        span_dict = self._process_large_attributes(span_dict=span_dict, span_id=span_id)
+
+        if self.debug:
+            print(span_dict)
+        return span_dict
 
     def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
         """
-        Process large attribute values by storing them in GCS if they exceed the size
-        limit of Google Cloud Logging.
+        Offload the largest attribute values to GCS if the attributes exceed the
+        size limit of Google Cloud Logging.
 
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
         :return: The updated span dictionary
         """
-        attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
+        span_dict["attributes"] = self.offloader.offload(
+            span_dict["attributes"], prefix=f"spans/{span_id}"
+        )
+        return span_dict
 
-            span_dict["attributes"] = attributes_retain
-            logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
-            )
 
-        return span_dict
+class LazySpanExporter(SpanExporter):
+    """
+    A span exporter that builds the exporter it wraps on the first export.
+
+    Span processors export from a background thread, so the clients of the wrapped
+    exporter are created there instead of at import time. If building it fails
+    (for example without credentials or network access), the batch is dropped
+    and the next export tries again.
+    """
+
+    def __init__(self, factory: Callable[[], SpanExporter]) -> None:
+        """
+        Initialize the exporter.
+
+        :param factory: Builds the wrapped exporter
+        """
+        self.factory = factory
+        self._exporter: SpanExporter | None = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """
+        Export the spans with the wrapped exporter, building it if needed.
+
+        :param spans: A sequence of spans to export
+        :return: The result of the export operation
+        """
+        with self._lock:
+            if self._exporter is None:
+                try:
+                    self._exporter = self.factory()
+                except Exception:
+                    logging.exception("Failed to create the span exporter.")
+                    return SpanExportResult.FAILURE
+        return self._exporter.export(spans)
+
+    def shutdown(self) -> None:
+        """Shut down the wrapped exporter if it was built."""
+        if self._exporter is not None:
+            self._exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Flush the wrapped exporter if it was built."""
+        return self._exporter is None or self._exporter.force_flush(timeout_millis)
@@ -0,0 +1,322 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import logging
+import os
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Literal, Protocol
+
+from opentelemetry import trace
+
+from .db import SupabaseRestClient
+
+
+@dataclass(frozen=True)
+class PendingWrite:
+    """A database write waiting in the queue.
+
+    Attributes:
+        kind (str): "stage" for a session stage update, "crystal" for a new
+            integration crystal row.
+        payload (dict): `{"session_id", "stage"}` for stages, the row to insert
+            for crystals.
+    """
+
+    kind: Literal["stage", "crystal"]
+    payload: dict[str, Any]
+
+
+class DurabilityHook(Protocol):
+    """Persists queued writes so they survive a crash between flushes."""
+
+    def record(self, write: PendingWrite) -> None:
+        """Called for every write as it is enqueued."""
+
+    def checkpoint(self, pending: list[PendingWrite]) -> None:
+        """Called after a flush with the writes that are still pending."""
+
+    def recover(self) -> list[PendingWrite]:
+        """Returns the writes to replay when the queue starts."""
+
+
+class JsonlJournal:
+    """Durability hook that appends queued writes to a local JSON Lines file.
+
+    Only as durable as the local disk: on Cloud Run this covers process
+    restarts within an instance, not instance loss.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path)
+
+    def record(self, write: PendingWrite) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(write), ensure_ascii=False) + "\n")
+
+    def checkpoint(self, pending: list[PendingWrite]) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            for write in pending:
+                f.write(json.dumps(asdict(write), ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    def recover(self) -> list[PendingWrite]:
+        if not self.path.exists():
+            return []
+        with self.path.open(encoding="utf-8") as f:
+            return [PendingWrite(**json.loads(line)) for line in f if line.strip()]
+
+
+@dataclass
+class WriteBehindMetrics:
+    """Counters for the write-behind queue.
+
+    Attributes:
+        enqueued (int): Writes accepted by the queue.
+        coalesced (int): Stage updates replaced by a newer one before flushing.
+        flushes (int): Flushes that wrote at least one row.
+        rows_written (int): Stage updates and crystals written to the database.
+        failures (int): Flushes that failed and were requeued.
+        blocked (int): Enqueues that had to wait for the queue to drain.
+    """
+
+    enqueued: int = 0
+    coalesced: int = 0
+    flushes: int = 0
+    rows_written: int = 0
+    failures: int = 0
+    blocked: int = 0
+
+
+class WriteBehindQueue:
+    """Bounded queue that writes stage updates and crystals in the background.
+
+    Only the latest stage per session is kept, and crystals are inserted in a
+    single bulk request. The queue flushes once `flush_size` writes are pending,
+    every `flush_interval` seconds, and on `stop()`. When `max_size` writes are
+    pending, producers wait for the next flush. Failed flushes are requeued, so
+    delivery is at least once, and retried with exponential backoff and jitter,
+    starting at `flush_interval` and capped at `max_backoff`.
+
+    The background task starts on the first enqueue and belongs to that event
+    loop; call `stop()` from the same loop to drain it.
+    """
+
+    def __init__(
+        self,
+        db: SupabaseRestClient,
+        *,
+        max_size: int = 1000,
+        flush_size: int = 100,
+        flush_interval: float = 1.0,
+        max_backoff: float = 60.0,
+        hook: DurabilityHook | None = None,
+    ) -> None:
+        """
+        Args:
+            db: The Supabase client used for flushing.
+            max_size: Maximum number of pending writes before producers wait.
+            flush_size: Number of pending writes that triggers a flush.
+            flush_interval: Maximum seconds a write stays queued.
+            max_backoff: Maximum seconds between retries of a failing flush.
+            hook: Optional durability hook, e.g. a `JsonlJournal`.
+        """
+        self.db = db
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.hook = hook
+        self.metrics = WriteBehindMetrics()
+        # Dicts preserve insertion order, so stages flush oldest session first.
+        self._stages: dict[str, str] = {}
+        self._crystals: list[dict[str, Any]] = []
+        self._task: asyncio.Task[None] | None = None
+        self._wake: asyncio.Event | None = None
+        self._drained: asyncio.Event | None = None
+        self._flush_lock: asyncio.Lock | None = None
+        self._recovered = False
+        # Flushes that failed in a row, for the retry backoff.
+        self._failures = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of writes waiting to be flushed."""
+        return len(self._stages) + len(self._crystals)
+
+    async def enqueue_stage(self, session_id: str, stage: str) -> None:
+        """Queues a stage update, replacing any pending one for the session."""
+        await self._reserve(session_id in self._stages)
+        if session_id in self._stages:
+            self.metrics.coalesced += 1
+            # Move to the end so the dict stays in enqueue order.
+            del self._stages[session_id]
+        self._stages[session_id] = stage
+        self._accepted(
+            PendingWrite("stage", {"session_id": session_id, "stage": stage})
+        )
+
+    async def enqueue_crystal(self, row: dict[str, Any]) -> None:
+        """Queues an integration crystal row for bulk insertion."""
+        await self._reserve(False)
+        self._crystals.append(row)
+        self._accepted(PendingWrite("crystal", row))
+
+    async def flush(self) -> int:
+        """Writes all pending writes now.
+
+        Returns:
+            The number of rows written.
+        """
+        self._ensure_started()
+        assert self._flush_lock is not None
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def stop(self) -> None:
+        """Flushes pending writes and stops the background task."""
+        if self._task is None:
+            return
+        assert self._flush_lock is not None
+        # Never cancel the task in the middle of a flush.
+        async with self._flush_lock:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self.flush()
+        finally:
+            # A later enqueue starts a new background task.
+            self._task = None
+
+    def _ensure_started(self) -> None:
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        if self.hook and not self._recovered:
+            self._recovered = True
+            for write in self.hook.recover():
+                self._restore(write)
+            if self.depth:
+                logging.info(f"Write-behind queue recovered {self.depth} writes.")
+        self._task = asyncio.create_task(self._run())
+
+    async def _reserve(self, coalesces: bool) -> None:
+        self._ensure_started()
+        assert self._drained is not None and self._wake is not None
+        while not coalesces and self.depth >= self.max_size:
+            self.metrics.blocked += 1
+            self._drained.clear()
+            self._wake.set()
+            await self._drained.wait()
+
+    def _accepted(self, write: PendingWrite) -> None:
+        self.metrics.enqueued += 1
+        if self.hook:
+            self.hook.record(write)
+        trace.get_current_span().set_attribute("onemind.write_behind.depth", self.depth)
+        if self.depth >= self.flush_size and self._wake is not None:
+            self._wake.set()
+
+    def _restore(self, write: PendingWrite) -> None:
+        if write.kind == "stage":
+            self._stages.pop(write.payload["session_id"], None)
+            self._stages[write.payload["session_id"]] = write.payload["stage"]
+        else:
+            self._crystals.append(write.payload)
+
+    async def _run(self) -> None:
+        assert self._wake is not None and self._flush_lock is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            async with self._flush_lock:
+                try:
+                    await self._flush()
+                except Exception as e:
+                    logging.error(f"Write-behind flush failed: {e}")
+                    self._failures += 1
+                else:
+                    self._failures = 0
+            if self._failures:
+                # Back off outside the lock, so `stop()` is not held up.
+                delay = min(
+                    self.max_backoff, self.flush_interval * 2 ** (self._failures - 1)
+                )
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    async def _flush(self) -> int:
+        stages, self._stages = self._stages, {}
+        crystals, self._crystals = self._crystals, []
+        if not stages and not crystals:
+            return 0
+        written = len(stages) + len(crystals)
+        inserted = False
+        try:
+            if crystals:
+                await self.db.insert("integration_crystals", crystals)
+                # Inserted; only the stages are requeued if an update fails.
+                crystals = []
+                inserted = True
+            # PostgREST has no bulk update with per-row values; the pool bounds
+            # how many of these run at once.
+            await asyncio.gather(
+                *(
+                    self.db.update(
+                        "sessions",
+                        {"current_stage": stage},
+                        filters={"session_id": session_id},
+                    )
+                    for session_id, stage in stages.items()
+                )
+            )
+        except Exception:
+            self.metrics.failures += 1
+            # Requeue ahead of newer writes; a newer stage for the same session
+            # wins over the one that failed.
+            self._stages = {**stages, **self._stages}
+            self._crystals = crystals + self._crystals
+            if inserted:
+                # Keep the inserted crystals from being replayed, and let
+                # producers waiting for room use it.
+                if self.hook:
+                    self.hook.checkpoint(self._pending())
+                if self._drained is not None:
+                    self._drained.set()
+            raise
+
+        if self._drained is not None:
+            self._drained.set()
+        self.metrics.flushes += 1
+        self.metrics.rows_written += written
+        if self.hook:
+            self.hook.checkpoint(self._pending())
+        return written
+
+    def _pending(self) -> list[PendingWrite]:
+        return [
+            PendingWrite("stage", {"session_id": session_id, "stage": stage})
+            for session_id, stage in self._stages.items()
+        ] + [PendingWrite("crystal", row) for row in self._crystals]
@@ -0,0 +1,247 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Four-stage OneMind conversations against the server with a fake model.
+
+Starts `tests.benchmarks.fake_server` (the real `app.server:app` with a fake
+model and a fake Supabase) in a subprocess, then runs `--sessions`
+conversations, `--concurrency` at a time. Each conversation creates a session
+and sends one `/run_sse` turn per stage. Reports session creation latency, time
+to the first SSE byte and p50/p95/p99 turn latency, turn throughput, and the
+server's resident memory growth per session (Linux only).
+
+Results are written to `--output` as JSON. Pass an earlier file as
+`--baseline` to print the change of every metric.
+
+Usage:
+    uv run python -m tests.benchmarks.conversation_benchmark --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+TURNS = [
+    "我最近总是拖延\uff0c明明知道该做的事就是不想动。",
+    "我想改变这种状态\uff0c我该怎么办呢\uff1f",
+    "我明白了\uff0c拖延是在保护我。那我先每天写十分钟。",
+    "今天写完了十分钟\uff0c感觉轻松了一些。",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _rss_bytes(pid: int) -> int | None:
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+async def _wait_until_ready(
+    client: httpx.AsyncClient, server: subprocess.Popen[bytes]
+) -> None:
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}.")
+        try:
+            if (await client.get("/list-apps")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("Server did not start within 120s.")
+
+
+async def _conversation(
+    client: httpx.AsyncClient, samples: dict[str, list[float]]
+) -> None:
+    user_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    response = await client.post(f"/apps/app/users/{user_id}/sessions", json={})
+    response.raise_for_status()
+    samples["session_create"].append(time.perf_counter() - start)
+    session_id = response.json()["id"]
+
+    for text in TURNS:
+        body = {
+            "app_name": "app",
+            "user_id": user_id,
+            "session_id": session_id,
+            "new_message": {
+                "role": "user",
+                "parts": [{"text": text}],
+            },
+            "streaming": True,
+        }
+        start = time.perf_counter()
+        first_byte = None
+        async with client.stream("POST", "/run_sse", json=body) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                if first_byte is None and chunk:
+                    first_byte = time.perf_counter() - start
+                if b'"error' in chunk:
+                    raise RuntimeError(chunk.decode(errors="replace"))
+        samples["turn"].append(time.perf_counter() - start)
+        samples["first_byte"].append(first_byte or 0.0)
+
+
+async def _run(args: argparse.Namespace) -> dict[str, Any]:
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "tests.benchmarks.fake_server",
+            "--port",
+            str(port),
+            "--llm-latency",
+            str(args.llm_latency),
+            "--tokens-per-second",
+            str(args.tokens_per_second),
+            "--db-latency",
+            str(args.db_latency),
+        ],
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    samples: dict[str, list[float]] = {
+        "session_create": [],
+        "first_byte": [],
+        "turn": [],
+    }
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            timeout=120,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            await _wait_until_ready(client, server)
+            # One warm-up conversation so imports and caches do not skew p99.
+            await _conversation(client, {name: [] for name in samples})
+            rss_before = _rss_bytes(server.pid)
+
+            slots = asyncio.Semaphore(args.concurrency)
+
+            async def bounded() -> None:
+                async with slots:
+                    await _conversation(client, samples)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(bounded() for _ in range(args.sessions)))
+            elapsed = time.perf_counter() - start
+            rss_after = _rss_bytes(server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    memory = (
+        (rss_after - rss_before) / args.sessions
+        if rss_before is not None and rss_after is not None
+        else None
+    )
+    return {
+        "config": {
+            "sessions": args.sessions,
+            "concurrency": args.concurrency,
+            "turns_per_session": len(TURNS),
+            "llm_latency": args.llm_latency,
+            "tokens_per_second": args.tokens_per_second,
+            "db_latency": args.db_latency,
+        },
+        "metrics": {
+            "session_create_ms": {
+                k: v * 1e3 for k, v in _percentiles(samples["session_create"]).items()
+            },
+            "first_byte_ms": {
+                k: v * 1e3 for k, v in _percentiles(samples["first_byte"]).items()
+            },
+            "turn_ms": {k: v * 1e3 for k, v in _percentiles(samples["turn"]).items()},
+            "turns_per_second": len(samples["turn"]) / elapsed,
+            "wall_s": elapsed,
+            "rss_per_session_kb": memory / 1024 if memory is not None else None,
+        },
+    }
+
+
+def _flatten(metrics: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif value is not None:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    args = parser.parse_args()
+
+    result = asyncio.run(_run(args))
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+
+    current = _flatten(result["metrics"])
+    baseline = (
+        _flatten(json.loads(args.baseline.read_text())["metrics"])
+        if args.baseline
+        else {}
+    )
+    print(f"{'metric':<26} {'value':>10} {'baseline':>10} {'change':>8}")
+    for name, value in current.items():
+        line = f"{name:<26} {value:>10.1f}"
+        if name in baseline:
+            before = baseline[name]
+            change = (value - before) / before * 100 if before else 0.0
+            line += f" {before:>10.1f} {change:>+7.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
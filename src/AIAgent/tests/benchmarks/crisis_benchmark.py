@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Microbenchmark for the crisis detection automaton.
+
+Compares `CrisisDetector.scan` with the naive `keyword in text` loop it
+replaced, for lexicons of 1 to 10k patterns and inputs of up to 100k characters.
+
+Usage:
+    uv run python -m tests.benchmarks.crisis_benchmark
+"""
+
+import random
+import time
+from collections.abc import Callable
+
+from app.utils.crisis import CrisisDetector, CrisisLexicon
+
+PATTERN_COUNTS = [1, 10, 100, 1_000, 10_000]
+INPUT_LENGTHS = [100, 1_000, 10_000, 100_000]
+# Common CJK range; wide enough that random patterns rarely collide.
+_ALPHABET = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+
+
+def _random_text(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(_ALPHABET, k=length))
+
+
+def _timeit(fn: Callable[[], object], min_time: float = 0.2) -> float:
+    """Returns the mean wall time of one call, in microseconds."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / runs * 1e6
+
+
+def main() -> None:
+    rng = random.Random(42)
+    inputs = {n: _random_text(rng, n) for n in INPUT_LENGTHS}
+
+    print(
+        f"{'patterns':>8} {'build ms':>9} {'input':>7} {'automaton us':>13} {'naive us':>10}"
+    )
+    for count in PATTERN_COUNTS:
+        patterns = [_random_text(rng, rng.randint(2, 6)) for _ in range(count)]
+        lexicon = CrisisLexicon.from_dict(
+            {"version": "bench", "categories": {"bench": patterns}}
+        )
+        start = time.perf_counter()
+        detector = CrisisDetector(lexicon)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        for length, text in inputs.items():
+            automaton_us = _timeit(
+                lambda text=text, detector=detector: detector.scan(text)
+            )
+            naive_us = _timeit(
+                lambda text=text, patterns=patterns: [p for p in patterns if p in text]
+            )
+            print(
+                f"{count:>8} {build_ms:>9.1f} {length:>7} "
+                f"{automaton_us:>13.1f} {naive_us:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Serves `app.server:app` with a fake model and a fake Supabase.
+
+The OneMind orchestrator's model is replaced by `FakeLlm`, which plays the
+four-stage protocol deterministically: every turn it reads the stage the
+pre-turn hook put in the instruction, calls the tool that advances it
+(together with `retrieve_wisdom` in stage 2, `create_integration_crystal` in
+stage 4), and finally streams a short reply. `MemoBaseTool` talks to `FakeSupabase`, an
+in-memory PostgREST stand-in. `retrieve_wisdom` uses the bundled knowledge base.
+Nothing leaves the machine.
+
+Usage:
+    uv run python -m tests.benchmarks.fake_server --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import httpx
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types as genai_types
+
+# Session context the pre-turn hook renders into the instruction.
+STAGE_PATTERN = re.compile(r"`current_stage`: (\S+)")
+IDS_PATTERN = re.compile(r"session_id=(\S+), user_id=(\S+)")
+NEXT_STAGE = {
+    "stage_1_awareness": "stage_2_integration",
+    "stage_2_integration": "stage_3_micro_action",
+    "stage_3_micro_action": "stage_4_solidification",
+}
+REPLY = (
+    "我听见了你的感受。这份拖延里\uff0c也许藏着想保护你的善意。愿意一起看看它吗\uff1f"
+)
+
+# Environment for a server that needs no credentials or network access.
+SERVER_ENV = {
+    "GOOGLE_CLOUD_PROJECT": "onemind-benchmark",
+    "LAZY_STARTUP": "true",
+    "SPAN_LOG_PATH": os.devnull,
+    "FEEDBACK_SINK": "jsonl",
+    "FEEDBACK_LOG_PATH": os.devnull,
+}
+
+
+def _text(content: genai_types.Content) -> str:
+    return "".join(part.text or "" for part in content.parts or [])
+
+
+def _call(name: str, **args: Any) -> genai_types.Part:
+    return genai_types.Part(
+        function_call=genai_types.FunctionCall(name=name, args=args)
+    )
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic stand-in for the orchestrator model.
+
+    Attributes:
+        latency: Seconds before the first chunk of every response.
+        tokens_per_second: Streaming rate of the final reply.
+        reply: The final reply, streamed one character per token.
+    """
+
+    latency: float = 0.5
+    tokens_per_second: float = 50.0
+    reply: str = REPLY
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.latency)
+        config = llm_request.config
+        instruction = str(config.system_instruction or "") if config else ""
+        calls = self._next_calls(instruction, llm_request.contents)
+        if calls:
+            yield LlmResponse(content=genai_types.Content(role="model", parts=calls))
+            return
+        if stream:
+            for token in self.reply:
+                yield LlmResponse(
+                    content=genai_types.Content(
+                        role="model", parts=[genai_types.Part(text=token)]
+                    ),
+                    partial=True,
+                )
+                await asyncio.sleep(1 / self.tokens_per_second)
+        else:
+            await asyncio.sleep(len(self.reply) / self.tokens_per_second)
+        yield LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text=self.reply)]
+            )
+        )
+
+    def _next_calls(
+        self, instruction: str, contents: list[genai_types.Content]
+    ) -> list[genai_types.Part]:
+        stage_match = STAGE_PATTERN.search(instruction)
+        ids_match = IDS_PATTERN.search(instruction)
+        stage = stage_match.group(1) if stage_match else ""
+        session_id, user_id = ids_match.groups() if ids_match else ("", "")
+        user_text = next(
+            (
+                _text(c)
+                for c in reversed(contents)
+                if c.role == "user" and any(p.text for p in c.parts or [])
+            ),
+            "",
+        )
+        called = {
+            part.function_response.name
+            for part in (contents[-1].parts or [] if contents else [])
+            if part.function_response
+        }
+        if called:
+            return []
+        if stage == "stage_2_integration":
+            return [
+                _call("retrieve_wisdom", query=user_text),
+                self._advance(session_id, "stage_3_micro_action"),
+            ]
+        if stage == "stage_4_solidification":
+            return [
+                _call(
+                    "create_integration_crystal",
+                    crystal_input={
+                        "user_id": user_id,
+                        "name": "拖延的善意",
+                        "insight": "拖延在保护我不被评判。",
+                        "session_id": session_id,
+                    },
+                )
+            ]
+        if stage in NEXT_STAGE:
+            return [self._advance(session_id, NEXT_STAGE[stage])]
+        return []
+
+    @staticmethod
+    def _advance(session_id: str, stage: str) -> genai_types.Part:
+        return _call(
+            "update_session_stage",
+            stage_update={"session_id": session_id, "next_stage": stage},
+        )
+
+
+class FakeSupabase:
+    """In-memory PostgREST stand-in for the tables `MemoBaseTool` uses."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        """
+        Args:
+            latency: Seconds added to every request.
+        """
+        self.latency = latency
+        self.stages: dict[str, str] = {}
+        self.insights: dict[str, str] = {}
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        path = request.url.path.removeprefix("/rest/v1")
+        body: Any = json.loads(request.content) if request.content else None
+        if path == "/rpc/get_or_create_session":
+            stage = self.stages.setdefault(
+                body["p_session_id"], body["p_default_stage"]
+            )
+            return httpx.Response(
+                200,
+                json=[
+                    {
+                        "stage": stage,
+                        "memory_insight": self.insights.get(body["p_user_id"]),
+                    }
+                ],
+            )
+        if path == "/sessions" and request.method == "PATCH":
+            session_id = request.url.params["session_id"].removeprefix("eq.")
+            self.stages[session_id] = body["current_stage"]
+            return httpx.Response(204)
+        if path == "/integration_crystals" and request.method == "POST":
+            for row in body if isinstance(body, list) else [body]:
+                self.insights[row["user_id"]] = row["key_insight"]
+            return httpx.Response(201)
+        return httpx.Response(404, json={"code": "PGRST202", "message": path})
+
+
+def install_fakes(
+    llm_latency: float, tokens_per_second: float, db_latency: float
+) -> None:
+    """Points the orchestrator and `MemoBaseTool` at the fakes."""
+    from app.onemind_agent import memo_base_tool, orchestrator_agent
+    from app.utils.db import SupabaseRestClient
+
+    orchestrator_agent.model = FakeLlm(
+        model="fake-onemind",
+        latency=llm_latency,
+        tokens_per_second=tokens_per_second,
+    )
+    memo_base_tool.db = SupabaseRestClient(
+        "https://fake.supabase.co",
+        "fake-key",
+        transport=httpx.MockTransport(FakeSupabase(db_latency).handle),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    for name, value in SERVER_ENV.items():
+        os.environ.setdefault(name, value)
+    install_fakes(args.llm_latency, args.tokens_per_second, args.db_latency)
+
+    import uvicorn
+
+    from app.server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Import time of the app modules, the bulk of a cold start.
+
+Imports each module in a fresh interpreter with `-X importtime` and reports the
+median cumulative import time and the process wall time, then the slowest
+imports (by self time) of the last `app.server` run. Lazy startup needs no
+credentials or network access; `--eager` also measures the default startup,
+which resolves credentials and provisions the artifact bucket.
+
+Usage:
+    uv run python -m tests.benchmarks.import_benchmark
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ["app.config", "app.onemind_agent", "app.agent", "app.server"]
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _import(module: str, lazy: bool) -> tuple[float, float, list[tuple[int, str]]]:
+    """Returns the import and wall time in ms, and (self us, module) per import."""
+    env = {**os.environ, "LAZY_STARTUP": str(lazy).lower()}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = (time.perf_counter() - start) * 1e3
+    imports = []
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        imports.append((int(self_us), name.strip()))
+        if name.strip() == module:
+            cumulative = int(cumulative_us)
+    return cumulative / 1e3, wall, imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--eager", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'module':<20} {'startup':>8} {'import ms':>10} {'wall ms':>10}")
+    imports: list[tuple[int, str]] = []
+    for module in args.modules:
+        for lazy in (True, False) if args.eager else (True,):
+            runs = [_import(module, lazy) for _ in range(args.runs)]
+            import_ms = statistics.median(run[0] for run in runs)
+            wall_ms = statistics.median(run[1] for run in runs)
+            mode = "lazy" if lazy else "eager"
+            print(f"{module:<20} {mode:>8} {import_ms:>10.0f} {wall_ms:>10.0f}")
+            if module == "app.server" and lazy:
+                imports = runs[-1][2]
+
+    if imports:
+        print("\nSlowest imports of app.server (lazy), self time:")
+        for self_us, name in sorted(imports, reverse=True)[: args.top]:
+            print(f"{self_us / 1e3:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
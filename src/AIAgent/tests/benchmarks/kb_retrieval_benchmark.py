@@ -0,0 +1,150 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Recall and latency of vector, BM25 and hybrid (RRF) wisdom retrieval.
+
+Generates a synthetic corpus of KnowledgeChunks: each belongs to a topic whose
+vocabulary supplies its tags, title and part of its text, the rest being
+common filler words. A query names two of a chunk's tags, one title word and
+some filler, and counts as recalled when that chunk is in the top k.
+
+Usage:
+    uv run python -m tests.benchmarks.kb_retrieval_benchmark --chunks 100000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from collections.abc import Callable
+
+from app.utils.bm25 import BM25Index
+from app.utils.knowledge import KnowledgeBase, KnowledgeChunk, VectorIndex
+
+_ALPHABET = [chr(c) for c in range(0x4E00, 0x4E00 + 3000)]
+RECALL_AT = [1, 5, 10]
+
+
+def _corpus(
+    rng: random.Random, size: int, topics: int
+) -> tuple[list[KnowledgeChunk], list[str]]:
+    words = list(
+        {"".join(rng.choices(_ALPHABET, k=rng.randint(2, 3))) for _ in range(30_000)}
+    )
+    common, topical = words[:2_000], words[2_000:]
+    topic_words = [rng.sample(topical, 30) for _ in range(topics)]
+    chunks = []
+    for i in range(size):
+        vocabulary = topic_words[i % topics]
+
+        def text(n: int, vocabulary: list[str] = vocabulary) -> str:
+            return "".join(
+                rng.choice(vocabulary) if rng.random() < 0.5 else rng.choice(common)
+                for _ in range(n)
+            )
+
+        chunks.append(
+            KnowledgeChunk(
+                id=f"OKC-BENCH-{i:06d}",
+                title="".join(rng.sample(vocabulary, 3)),
+                tags=rng.sample(vocabulary, 4),
+                scene_description=text(10),
+                core_concept=text(40),
+            )
+        )
+    return chunks, common
+
+
+def _query(rng: random.Random, chunk: KnowledgeChunk, common: list[str]) -> str:
+    parts = [*rng.sample(chunk.tags, 2), chunk.title[:2], *rng.sample(common, 2)]
+    rng.shuffle(parts)
+    return "\uff0c".join(parts)
+
+
+def _evaluate(
+    search: Callable[[str], list[int]], queries: list[tuple[str, int]]
+) -> tuple[dict[int, float], list[float]]:
+    hits = dict.fromkeys(RECALL_AT, 0)
+    latencies = []
+    for query, target in queries:
+        start = time.perf_counter()
+        ranked = search(query)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        for k in RECALL_AT:
+            hits[k] += target in ranked[:k]
+    return {k: hits[k] / len(queries) for k in RECALL_AT}, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--topics", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    chunks, common = _corpus(rng, args.chunks, args.topics)
+    print(f"generated {len(chunks)} chunks in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    vector_only = KnowledgeBase(chunks)
+    vector_build = time.perf_counter() - start
+    start = time.perf_counter()
+    bm25 = BM25Index.build(chunk.lexical_fields() for chunk in chunks)
+    bm25_build = time.perf_counter() - start
+    hybrid = KnowledgeBase(
+        chunks,
+        vector_only.embedder,
+        VectorIndex(vector_only.index.matrix, normalized=True),
+        lexical=bm25,
+    )
+    postings_mb = (bm25.ptr.nbytes + bm25.docs.nbytes + bm25.weights.nbytes) / 2**20
+    print(
+        f"vector build {vector_build:.1f}s, "
+        f"matrix {vector_only.index.matrix.nbytes / 2**20:.1f} MiB"
+    )
+    print(
+        f"bm25 build {bm25_build:.1f}s, {len(bm25.vocabulary)} terms, "
+        f"{len(bm25.docs)} postings, {postings_mb:.1f} MiB"
+    )
+
+    number = {chunk.id: i for i, chunk in enumerate(chunks)}
+    targets = rng.sample(range(len(chunks)), args.queries)
+    queries = [(_query(rng, chunks[i], common), i) for i in targets]
+    depth = max(RECALL_AT)
+
+    def ids(knowledge_base: KnowledgeBase) -> Callable[[str], list[int]]:
+        return lambda query: [
+            number[chunk.id] for chunk, _ in knowledge_base.search(query, top_k=depth)
+        ]
+
+    retrievers: list[tuple[str, Callable[[str], list[int]]]] = [
+        ("vector", ids(vector_only)),
+        ("bm25", lambda query: bm25.search(query, depth)[0].tolist()),
+        ("hybrid", ids(hybrid)),
+    ]
+
+    recall_header = " ".join(f"{f'R@{k}':>6}" for k in RECALL_AT)
+    print(f"{'retriever':<10} {recall_header} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, search in retrievers:
+        for query, _ in queries[:10]:
+            search(query)
+        recall, latencies = _evaluate(search, queries)
+        recalls = " ".join(f"{recall[k]:>6.3f}" for k in RECALL_AT)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{name:<10} {recalls} {statistics.median(latencies):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
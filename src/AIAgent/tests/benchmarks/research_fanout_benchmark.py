@@ -0,0 +1,110 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""End-to-end latency of the research fan-out against a mocked model.
+
+Runs `ResearchFanOut` through a `Runner` on a plan of N `[RESEARCH]` goals and
+one `[DELIVERABLE]`, with every model call answered by a fake model after a
+fixed delay. Concurrency 1 is the serial baseline.
+
+Usage:
+    uv run python -m tests.benchmarks.research_fanout_benchmark --goals 8
+"""
+
+import argparse
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types as genai_types
+
+from app.agent import ResearchFanOut, deliverable_writer, goal_researcher
+
+
+class _SlowLlm(BaseLlm):
+    latency: float = 0.0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        await asyncio.sleep(self.latency)
+        yield LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text="Findings.")]
+            ),
+            grounding_metadata=genai_types.GroundingMetadata(
+                grounding_chunks=[
+                    genai_types.GroundingChunk(
+                        web=genai_types.GroundingChunkWeb(
+                            uri=f"https://example.com/{time.perf_counter_ns()}",
+                            title="Page",
+                            domain="example.com",
+                        )
+                    )
+                ]
+            ),
+        )
+
+
+async def _run(goals: int, concurrency: int, latency: float) -> float:
+    llm = _SlowLlm(model="gemini-2.5-flash", latency=latency)
+
+    def with_model(agent: Any) -> Any:
+        return agent.model_copy(update={"model": llm, "parent_agent": None})
+
+    agent = ResearchFanOut(
+        name="section_researcher",
+        researcher=with_model(goal_researcher),
+        synthesizer=with_model(deliverable_writer),
+        max_concurrency=concurrency,
+    )
+    plan = "\n".join(f"- [RESEARCH] Analyze topic {i}" for i in range(goals))
+    plan += "\n- [DELIVERABLE] Create a summary table"
+    service = InMemorySessionService()
+    session = await service.create_session(
+        app_name="bench", user_id="u", state={"research_plan": plan}
+    )
+    runner = Runner(app_name="bench", agent=agent, session_service=service)
+    start = time.perf_counter()
+    async for _ in runner.run_async(
+        user_id="u",
+        session_id=session.id,
+        new_message=genai_types.Content(
+            role="user", parts=[genai_types.Part(text="Run it.")]
+        ),
+    ):
+        pass
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--goals", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{args.goals} goals, {args.latency:.2f}s per model call")
+    print(f"{'concurrency':>11} {'wall s':>8} {'speedup':>8}")
+    baseline = None
+    for concurrency in sorted({1, 2, 4, args.goals}):
+        elapsed = asyncio.run(_run(args.goals, concurrency, args.latency))
+        baseline = baseline or elapsed
+        print(f"{concurrency:>11} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
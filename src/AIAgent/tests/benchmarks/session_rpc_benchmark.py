@@ -0,0 +1,155 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Latency of `get_session`: separate queries vs. the `get_or_create_session` RPC.
+
+Loads `src/sql/9_supabase_schema.sql` and `10_get_or_create_session.sql` into a
+local Postgres that stands in for Supabase, then times both code paths for
+first visits and returning visits. Everything runs inside one transaction that
+is rolled back at the end, so the target database is left untouched.
+
+Local round trips are nearly free, so the report also projects each path onto a
+network round-trip time (`--rtt-ms`, e.g. the latency from Cloud Run to the
+Supabase region).
+
+Usage:
+    POSTGRES_DSN=postgresql://postgres@localhost/postgres \\
+        uv run python -m tests.benchmarks.session_rpc_benchmark --rtt-ms 20
+"""
+
+import argparse
+import os
+import statistics
+import time
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extensions import cursor
+
+SQL_DIR = Path(__file__).resolve().parents[3] / "sql"
+
+# Minimal stand-ins for the Supabase objects the schema references.
+SUPABASE_STUBS = """
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (id UUID PRIMARY KEY);
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID
+LANGUAGE sql STABLE AS $$ SELECT NULL::UUID $$;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        CREATE ROLE authenticated;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        CREATE ROLE service_role;
+    END IF;
+END $$;
+"""
+
+
+def _queries_path(cur: cursor, session_id: str, user_id: str) -> int:
+    """Mirrors MemoBaseTool._load_session_queries; returns round trips used."""
+    cur.execute(
+        "SELECT current_stage FROM public.sessions"
+        " WHERE session_id = %s AND user_id = %s",
+        (session_id, user_id),
+    )
+    round_trips = 1
+    if not cur.fetchall():
+        cur.execute(
+            "INSERT INTO public.sessions (session_id, user_id, current_stage)"
+            " VALUES (%s, %s, 'stage_1_awareness')",
+            (session_id, user_id),
+        )
+        round_trips += 1
+    cur.execute(
+        "SELECT key_insight FROM public.integration_crystals WHERE user_id = %s"
+        " ORDER BY created_at DESC LIMIT 1",
+        (user_id,),
+    )
+    cur.fetchall()
+    return round_trips + 1
+
+
+def _rpc_path(cur: cursor, session_id: str, user_id: str) -> int:
+    cur.execute(
+        "SELECT * FROM public.get_or_create_session(%s, %s)", (session_id, user_id)
+    )
+    cur.fetchall()
+    return 1
+
+
+def _measure(
+    cur: cursor,
+    path: Callable[..., int],
+    sessions: list[tuple[str, str]],
+) -> tuple[list[float], int]:
+    latencies, round_trips = [], 0
+    for session_id, user_id in sessions:
+        start = time.perf_counter()
+        round_trips = path(cur, session_id, user_id)
+        latencies.append((time.perf_counter() - start) * 1e3)
+    return latencies, round_trips
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("POSTGRES_DSN", ""))
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--crystals-per-user", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute(SUPABASE_STUBS)
+        for name in ["9_supabase_schema.sql", "10_get_or_create_session.sql"]:
+            cur.execute((SQL_DIR / name).read_text(encoding="utf-8"))
+
+        users = [str(uuid.uuid4()) for _ in range(args.users)]
+        cur.executemany(
+            "INSERT INTO auth.users (id) VALUES (%s)", [(u,) for u in users]
+        )
+        cur.executemany(
+            "INSERT INTO public.integration_crystals (user_id, name, key_insight)"
+            " VALUES (%s, %s, %s)",
+            [
+                (u, f"crystal-{i}", f"insight {i}")
+                for u in users
+                for i in range(args.crystals_per_user)
+            ],
+        )
+
+        print(
+            f"{'path':<10} {'visit':<10} {'trips':>5} {'p50 ms':>8} {'p95 ms':>8}"
+            f" {f'@{args.rtt_ms:g}ms rtt':>14}"
+        )
+        for name, path in [("queries", _queries_path), ("rpc", _rpc_path)]:
+            sessions = [(f"{name}-{uuid.uuid4()}", u) for u in users]
+            for visit in ["first", "returning"]:
+                latencies, trips = _measure(cur, path, sessions)
+                p50 = statistics.median(latencies)
+                p95 = statistics.quantiles(latencies, n=20)[-1]
+                print(
+                    f"{name:<10} {visit:<10} {trips:>5} {p50:>8.3f} {p95:>8.3f}"
+                    f" {p50 + trips * args.rtt_ms:>14.1f}"
+                )
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-call cost of `collect_research_sources_callback` as sessions grow.
+
+Appends one grounded event per call, as the research refinement loop does, and
+compares the incremental callback with a full rescan of `session.events` (the
+previous implementation). Also reports the duplicated claims the full rescan
+accumulates.
+
+Usage:
+    uv run python -m tests.benchmarks.source_collection_benchmark
+"""
+
+import argparse
+import time
+from typing import Any
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types as genai_types
+
+from app.agent import collect_research_sources_callback, section_researcher
+
+SESSION_SIZES = [100, 1_000, 5_000]
+
+
+def _event(n: int) -> Event:
+    url = f"https://example.com/{n % 200}"
+    return Event(
+        author="section_researcher",
+        grounding_metadata=genai_types.GroundingMetadata(
+            grounding_chunks=[
+                genai_types.GroundingChunk(
+                    web=genai_types.GroundingChunkWeb(
+                        uri=url, title=f"Page {n % 200}", domain="example.com"
+                    )
+                )
+            ],
+            grounding_supports=[
+                genai_types.GroundingSupport(
+                    segment=genai_types.Segment(text=f"claim {n}-{i}"),
+                    grounding_chunk_indices=[0],
+                    confidence_scores=[0.9],
+                )
+                for i in range(3)
+            ],
+        ),
+    )
+
+
+def _full_rescan(session: Session, state: dict[str, Any]) -> None:
+    """The previous callback body: walks every event on every call."""
+    url_to_short_id = state.get("url_to_short_id", {})
+    sources = state.get("sources", {})
+    for event in session.events:
+        metadata = event.grounding_metadata
+        if not (metadata and metadata.grounding_chunks):
+            continue
+        chunks_info = {}
+        for idx, chunk in enumerate(metadata.grounding_chunks):
+            if not chunk.web:
+                continue
+            url = chunk.web.uri
+            if url not in url_to_short_id:
+                short_id = f"src-{len(url_to_short_id) + 1}"
+                url_to_short_id[url] = short_id
+                sources[short_id] = {"url": url, "supported_claims": []}
+            chunks_info[idx] = url_to_short_id[url]
+        for support in metadata.grounding_supports or []:
+            for i, chunk_idx in enumerate(support.grounding_chunk_indices or []):
+                if chunk_idx in chunks_info:
+                    scores = support.confidence_scores or []
+                    sources[chunks_info[chunk_idx]]["supported_claims"].append(
+                        {
+                            "text_segment": support.segment.text
+                            if support.segment
+                            else "",
+                            "confidence": scores[i] if i < len(scores) else 0.5,
+                        }
+                    )
+    state["url_to_short_id"] = url_to_short_id
+    state["sources"] = sources
+
+
+def _incremental(session: Session, state: dict[str, Any]) -> None:
+    context = CallbackContext(
+        InvocationContext(
+            session_service=InMemorySessionService(),
+            invocation_id="bench",
+            agent=section_researcher,
+            session=session,
+        )
+    )
+    collect_research_sources_callback(context)
+    session.state.update(context._event_actions.state_delta)
+
+
+def _claims(state: dict[str, Any]) -> int:
+    return sum(len(s["supported_claims"]) for s in state.get("sources", {}).values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SESSION_SIZES)
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'events':>7} {'full rescan us':>15} {'incremental us':>15}"
+        f" {'claims (rescan)':>16} {'claims (incr)':>14}"
+    )
+    for size in args.sizes:
+        results = []
+        for collect in (_full_rescan, _incremental):
+            session = Session(id="s", app_name="app", user_id="u")
+            session.events.extend(_event(n) for n in range(size))
+            collect(session, session.state)
+            start = time.perf_counter()
+            for n in range(size, size + args.calls):
+                session.events.append(_event(n))
+                collect(session, session.state)
+            elapsed = (time.perf_counter() - start) / args.calls * 1e6
+            results.append((elapsed, _claims(session.state)))
+        (rescan_us, rescan_claims), (incr_us, incr_claims) = results
+        print(
+            f"{size:>7} {rescan_us:>15.0f} {incr_us:>15.0f}"
+            f" {rescan_claims:>16} {incr_claims:>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Span log export throughput: per-span writes vs. `SpanLogExporter`.
+
+Exports spans shaped like ADK's LLM call spans (a few KB of JSON attributes)
+to a JSON Lines sink on /dev/null whose every call also sleeps for
+`--call-latency` ms, standing in for a Cloud Logging request. The per-span path
+is the previous `CloudTraceLoggingSpanExporter` loop: `json.loads(span.to_json())`
+and one sink call per span, on the exporting thread. The batched path enqueues
+spans and writes them from `SpanLogExporter`'s background thread.
+
+Usage:
+    uv run python -m tests.benchmarks.span_export_benchmark
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any
+
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from app.utils.tracing import JsonlSink, SpanLogExporter
+
+
+class SlowSink(JsonlSink):
+    """`JsonlSink` with a fixed delay per call."""
+
+    def __init__(self, path: str, latency: float) -> None:
+        super().__init__(path)
+        self.latency = latency
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        time.sleep(self.latency)
+        super().write(entries)
+
+
+def _spans(count: int) -> list[ReadableSpan]:
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = provider.get_tracer(__name__)
+    request = json.dumps({"contents": [{"text": "我最近总是拖延" * 50}] * 4})
+    for i in range(count):
+        with tracer.start_as_current_span(
+            "call_llm",
+            attributes={
+                "gen_ai.system": "gcp.vertex.agent",
+                "gcp.vertex.agent.invocation_id": f"inv-{i}",
+                "gcp.vertex.agent.llm_request": request,
+                "gcp.vertex.agent.llm_response": request[:1000],
+            },
+        ) as span:
+            span.add_event("tool_call", {"name": "check_crisis"})
+    return list(memory.get_finished_spans())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=5000)
+    parser.add_argument("--export-size", type=int, default=512)
+    parser.add_argument("--call-latency", type=float, default=2.0)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    spans = _spans(args.spans)
+    chunks = [
+        spans[i : i + args.export_size] for i in range(0, len(spans), args.export_size)
+    ]
+    latency = args.call_latency / 1e3
+    print(f"{'path':<10} {'spans/s':>10} {'export us/span':>15} {'sink calls':>11}")
+
+    sink = SlowSink(os.devnull, latency)
+    start = time.perf_counter()
+    for chunk in chunks:
+        for span in chunk:
+            sink.write([json.loads(span.to_json())])
+    elapsed = time.perf_counter() - start
+    sink.close()
+    print(
+        f"{'per-span':<10} {len(spans) / elapsed:>10.0f}"
+        f" {elapsed / len(spans) * 1e6:>15.1f} {len(spans):>11}"
+    )
+
+    exporter = SpanLogExporter(
+        [SlowSink(os.devnull, latency)],
+        max_queue_size=len(spans),
+        batch_size=args.batch_size,
+    )
+    start = time.perf_counter()
+    for chunk in chunks:
+        exporter.export(chunk)
+    exported = time.perf_counter() - start
+    exporter.force_flush()
+    elapsed = time.perf_counter() - start
+    exporter.shutdown()
+    assert exporter.metrics.written == len(spans), exporter.metrics
+    print(
+        f"{'batched':<10} {len(spans) / elapsed:>10.0f}"
+        f" {exported / len(spans) * 1e6:>15.1f} {exporter.metrics.batches:>11}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -34,6 +34,7 @@ logger = logging.getLogger(__name__)
 BASE_URL = "http://127.0.0.1:8000/"
 STREAM_URL = BASE_URL + "run_sse"
 FEEDBACK_URL = BASE_URL + "feedback"
+FEEDBACK_BATCH_URL = BASE_URL + "feedback/batch"
 
 HEADERS = {"Content-Type": "application/json"}
 
@@ -205,3 +206,20 @@ def test_collect_feedback(server_fixture: subprocess.Popen[str]) -> None:
         FEEDBACK_URL, json=feedback_data, headers=HEADERS, timeout=10
     )
     assert response.status_code == 200
+
+
+def test_collect_feedback_batch(server_fixture: subprocess.Popen[str]) -> None:
+    """
+    Test the batch feedback endpoint (/feedback/batch) to ensure it accepts
+    several records in one request.
+    """
+    feedback_data = [
+        {"score": score, "invocation_id": str(uuid.uuid4()), "text": ""}
+        for score in (1, 5)
+    ]
+
+    response = requests.post(
+        FEEDBACK_BATCH_URL, json=feedback_data, headers=HEADERS, timeout=10
+    )
+    assert response.status_code == 200
+    assert response.json() == {"status": "success", "count": 2}
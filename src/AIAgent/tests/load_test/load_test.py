@@ -16,7 +16,6 @@ import os
 import time
 import uuid
 
-import requests
 from locust import HttpUser, between, task
 
 ENDPOINT = "/run_sse"
@@ -37,9 +36,9 @@ class ChatStreamUser(HttpUser):
         user_id = f"user_{uuid.uuid4()}"
         session_data = {"state": {"preferred_language": "English", "visit_count": 1}}
 
-        session_url = f"{self.client.base_url}/apps/app/users/{user_id}/sessions"
-        session_response = requests.post(
-            session_url,
+        session_response = self.client.post(
+            f"/apps/app/users/{user_id}/sessions",
+            name="/apps/app/users/[user_id]/sessions",
             headers=headers,
             json=session_data,
             timeout=10,
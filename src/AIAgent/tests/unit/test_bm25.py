@@ -0,0 +1,54 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import pytest
+
+from app.utils.bm25 import BM25Index, reciprocal_rank_fusion, terms
+
+
+def test_terms_split_cjk_into_bigrams() -> None:
+    assert terms("完美主义 IFS\uff0c拖") == ["完美", "美主", "主义", "ifs", "拖"]
+
+
+def test_scores_match_bm25_formula() -> None:
+    documents = [
+        [("拖延 完美", 3.0), ("拖延", 1.0)],
+        [("焦虑", 3.0), ("完美", 1.0)],
+        [("天气", 1.0)],
+    ]
+    index = BM25Index.build(documents, k1=1.2, b=0.75)
+
+    docs, scores = index.search("完美", top_k=10)
+
+    lengths = [3.0 + 3.0 + 1.0, 3.0 + 1.0, 1.0]
+    avg_len = sum(lengths) / 3
+    idf = math.log1p((3 - 2 + 0.5) / (2 + 0.5))
+
+    def impact(tf: float, length: float) -> float:
+        return idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg_len))
+
+    assert docs.tolist() == [0, 1]
+    assert scores.tolist() == pytest.approx(
+        [impact(3.0, lengths[0]), impact(1.0, lengths[1])], rel=1e-5
+    )
+    assert index.search("不存在", top_k=10)[0].size == 0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement() -> None:
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+
+    assert [doc for doc, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
@@ -0,0 +1,121 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import random
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models import LlmResponse
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types as genai_types
+
+from app.agent import (
+    citation_replacement_callback,
+    citation_streaming_callback,
+    report_composer,
+)
+from app.utils.citations import CitationRewriter, rewrite_citations
+
+SOURCES = {
+    "src-1": {"url": "https://a.example", "title": "A"},
+    "src-2": {"url": "https://b.example", "domain": "b.example"},
+}
+REPORT = (
+    "Claim one <cite source=\"src-1\"/>. Claim two<cite source = 'src-2' />, "
+    'and a bad one <cite source="src-9"/> ; a < b, <b>bold</b> <cite '
+    'source="src-1" />\n'
+)
+EXPECTED = (
+    "Claim one  [A](https://a.example). Claim two [b.example](https://b.example),"
+    " and a bad one; a < b, <b>bold</b>  [A](https://a.example)\n"
+)
+
+
+def stream(text: str, cuts: list[int], max_lookahead: int = 128) -> str:
+    rewriter = CitationRewriter(SOURCES, max_lookahead=max_lookahead)
+    bounds = [0, *cuts, len(text)]
+    out = "".join(rewriter.feed(text[a:b]) for a, b in itertools.pairwise(bounds))
+    out += rewriter.flush()
+    assert out == rewriter.text
+    return out
+
+
+def test_rewrite_matches_expected() -> None:
+    assert rewrite_citations(REPORT, SOURCES) == EXPECTED
+
+
+def test_every_split_point_and_single_characters() -> None:
+    for cut in range(len(REPORT) + 1):
+        assert stream(REPORT, [cut]) == EXPECTED
+    for a in range(0, len(REPORT), 3):
+        for b in range(a, len(REPORT), 5):
+            assert stream(REPORT, [a, b]) == EXPECTED
+    assert stream(REPORT, list(range(1, len(REPORT)))) == EXPECTED
+
+
+def test_random_splits_and_empty_chunks() -> None:
+    rng = random.Random(7)
+    for _ in range(500):
+        cuts = sorted(rng.choices(range(len(REPORT) + 1), k=rng.randint(1, 20)))
+        assert stream(REPORT, cuts) == EXPECTED
+
+
+def test_lookahead_is_bounded() -> None:
+    rewriter = CitationRewriter(SOURCES, max_lookahead=16)
+    emitted = rewriter.feed("x <cite ")
+    assert emitted == "x"  # the possible tag and the space before it are held
+    emitted += rewriter.feed(" " * 40)
+    assert emitted == "x <cite" + " " * 41  # too long to be a tag
+    # Text that cannot become a tag is not held at all.
+    assert rewriter.feed("<p>a <b") == "<p>a <b"
+    assert rewriter.flush() == ""
+
+
+def _context(session: Session) -> CallbackContext:
+    return CallbackContext(
+        InvocationContext(
+            session_service=InMemorySessionService(),
+            invocation_id="inv-stream",
+            agent=report_composer,
+            session=session,
+        )
+    )
+
+
+def test_callbacks_stream_then_reuse_output() -> None:
+    session = Session(id="s", app_name="app", user_id="u", state={"sources": SOURCES})
+    streamed = ""
+    for i in range(0, len(REPORT), 7):
+        response = LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text=REPORT[i : i + 7])]
+            ),
+            partial=True,
+        )
+        result = citation_streaming_callback(_context(session), response)
+        assert result is not None and result.content and result.content.parts
+        streamed += result.content.parts[0].text or ""
+    final = LlmResponse(
+        content=genai_types.Content(role="model", parts=[genai_types.Part(text=REPORT)])
+    )
+    assert citation_streaming_callback(_context(session), final) is None
+
+    session.state["final_cited_report"] = REPORT
+    context = _context(session)
+    content = citation_replacement_callback(context)
+
+    assert EXPECTED.startswith(streamed)
+    assert content.parts and content.parts[0].text == EXPECTED
+    assert context.state["final_report_with_citations"] == EXPECTED
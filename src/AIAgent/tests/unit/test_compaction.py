@@ -0,0 +1,176 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types as genai_types
+from pydantic import Field
+
+from app.onemind_agent import DIGEST_STATE_KEY, onemind_context, orchestrator_agent
+from app.utils.compaction import ConversationCompactor, LlmSummarizer
+
+
+class _EchoLlm(BaseLlm):
+    """Replies "reply <n>" and keeps the texts of every request's contents."""
+
+    requests: list[list[str]] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.requests.append(
+            ["".join(p.text or "" for p in c.parts or []) for c in llm_request.contents]
+        )
+        text = f"reply {len(self.requests)}"
+        yield LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text=text)]
+            )
+        )
+
+
+class _Summarizer:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.calls: list[tuple[str, str, str]] = []
+
+    async def __call__(self, stage: str, previous: str, new_turns: str) -> str:
+        if self.fail:
+            raise ValueError("quota exceeded")
+        self.calls.append((stage, previous, new_turns))
+        return f"{stage}#{len(self.calls)}"
+
+
+def _run(
+    compactor: ConversationCompactor, stages: list[str]
+) -> tuple[_EchoLlm, dict[str, Any]]:
+    llm = _EchoLlm(model="fake")
+    schedule = iter(stages)
+
+    def set_stage(callback_context: CallbackContext) -> None:
+        callback_context.state["stage"] = next(schedule)
+
+    agent = LlmAgent(
+        name="agent",
+        model=llm,
+        before_agent_callback=set_stage,
+        after_agent_callback=compactor.after_agent,
+        before_model_callback=compactor.before_model,
+    )
+    service = InMemorySessionService()
+
+    async def scenario() -> dict[str, Any]:
+        session = await service.create_session(app_name="app", user_id="u1")
+        runner = Runner(app_name="app", agent=agent, session_service=service)
+        for turn in range(1, len(stages) + 1):
+            async for _ in runner.run_async(
+                user_id="u1",
+                session_id=session.id,
+                new_message=genai_types.Content(
+                    role="user", parts=[genai_types.Part(text=f"turn {turn}")]
+                ),
+            ):
+                pass
+        loaded = await service.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert loaded is not None
+        return loaded.state
+
+    return llm, asyncio.run(scenario())
+
+
+def test_older_turns_collapse_into_rolling_stage_summaries() -> None:
+    summarizer = _Summarizer()
+    compactor = ConversationCompactor(
+        summarizer, stage_key="stage", max_tokens=1, keep_turns=2
+    )
+    llm, state = _run(compactor, ["s1", "s1", "s2", "s2", "s2"])
+
+    assert [request[0] for request in llm.requests] == [
+        "turn 1",
+        "turn 1",
+        "turn 1",
+        "turn 2",
+        "turn 3",
+    ]
+    assert llm.requests[-1] == ["turn 3", "reply 3", "turn 4", "reply 4", "turn 5"]
+    # Each summary extends the previous one of its stage with the new turns only.
+    assert summarizer.calls == [
+        ("s1", "", "user: turn 1\nagent: reply 1"),
+        ("s1", "s1#1", "user: turn 2\nagent: reply 2"),
+        ("s2", "", "user: turn 3\nagent: reply 3"),
+    ]
+    digest = state["conversation_digest"]
+    assert digest["stages"] == [{"stage": "s1", "summary": "s1#2"}]
+    assert digest["current"] == {"stage": "s2", "summary": "s2#3"}
+    assert (compactor.metrics.runs, compactor.metrics.turns_compacted) == (3, 3)
+
+
+def test_failed_summary_keeps_the_history_verbatim() -> None:
+    compactor = ConversationCompactor(
+        _Summarizer(fail=True), stage_key="stage", max_tokens=1, keep_turns=1
+    )
+    llm, state = _run(compactor, ["s1", "s1", "s1"])
+
+    assert len(llm.requests[-1]) == 5
+    assert "conversation_digest" not in state
+    assert compactor.metrics.errors == 2
+
+
+def test_orchestrator_reads_the_digest_from_its_session_context() -> None:
+    llm = _EchoLlm(model="fake")
+    summary = asyncio.run(LlmSummarizer(llm, "Summarize.")("s1", "", "user: hi"))
+    assert summary == "reply 1"
+    assert llm.requests == [
+        ["Stage: s1\n\nPrevious summary:\n-\n\nNew turns:\nuser: hi"]
+    ]
+
+    digest = {
+        "stages": [{"stage": "stage_1_awareness", "summary": "A"}],
+        "current": {"stage": "stage_2_integration", "summary": "B"},
+        "covered_until": 0.0,
+    }
+    session = Session(
+        id="s",
+        app_name="app",
+        user_id="u",
+        state={
+            "current_stage": "stage_2_integration",
+            "memory_insight": "",
+            "session_id": "s",
+            "user_id": "u",
+            DIGEST_STATE_KEY: digest,
+        },
+    )
+    context = CallbackContext(
+        InvocationContext(
+            session_service=InMemorySessionService(),
+            invocation_id="inv",
+            agent=orchestrator_agent,
+            session=session,
+        )
+    )
+    text = asyncio.run(onemind_context(context))
+    assert text.endswith(
+        "- stage_1_awareness: A\n- stage_2_integration\uff08进行中\uff09: B\n"
+    )
@@ -0,0 +1,187 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import AsyncGenerator
+from types import SimpleNamespace
+from typing import Any
+
+from google.adk.agents import LlmAgent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool
+from google.genai import types as genai_types
+from pydantic import Field
+
+from app.utils.context_cache import ContextCache, state_template
+
+STATIC = "You are a careful assistant."
+
+
+def lookup(query: str) -> str:
+    """Looks something up."""
+    return query
+
+
+class _UsageLlm(BaseLlm):
+    """Replies with text and reports every call after the first as cached."""
+
+    requests: list[LlmRequest] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        config = (
+            llm_request.config.model_copy(deep=True) if llm_request.config else None
+        )
+        contents = [c.model_copy(deep=True) for c in llm_request.contents]
+        self.requests.append(
+            LlmRequest(model=llm_request.model, config=config, contents=contents)
+        )
+        yield LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text="ok")]
+            ),
+            usage_metadata=genai_types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=100,
+                cached_content_token_count=80 if len(self.requests) > 1 else None,
+            ),
+        )
+
+
+class _FakeCaches:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.created: list[genai_types.CreateCachedContentConfig] = []
+        self.updated: list[str] = []
+
+    async def create(
+        self, *, model: str, config: genai_types.CreateCachedContentConfig
+    ) -> genai_types.CachedContent:
+        if self.fail:
+            raise ValueError("Cached content is too small.")
+        self.created.append(config)
+        return genai_types.CachedContent(name=f"cachedContents/{len(self.created)}")
+
+    async def update(
+        self, *, name: str, config: genai_types.UpdateCachedContentConfig
+    ) -> genai_types.CachedContent:
+        self.updated.append(name)
+        return genai_types.CachedContent(name=name)
+
+
+def _run(cache: ContextCache, stages: list[str]) -> _UsageLlm:
+    llm = _UsageLlm(model="fake")
+    agent = cache.register(
+        LlmAgent(
+            name="agent",
+            model=llm,
+            instruction=STATIC,
+            tools=[FunctionTool(lookup)],
+        ),
+        state_template("Stage: {stage}. Today: {today}", today=lambda: "2025-01-01"),
+    )
+    service = InMemorySessionService()
+
+    async def scenario() -> None:
+        runner = Runner(app_name="app", agent=agent, session_service=service)
+        for stage in stages:
+            session = await service.create_session(
+                app_name="app", user_id="u1", state={"stage": stage}
+            )
+            async for _ in runner.run_async(
+                user_id="u1",
+                session_id=session.id,
+                new_message=genai_types.Content(
+                    role="user", parts=[genai_types.Part(text="hi")]
+                ),
+            ):
+                pass
+
+    asyncio.run(scenario())
+    return llm
+
+
+def _system(request: LlmRequest) -> str:
+    assert request.config is not None
+    return str(request.config.system_instruction or "")
+
+
+def test_volatile_context_follows_a_stable_prefix() -> None:
+    cache = ContextCache()
+    first, second = _run(cache, ["stage_1", "stage_2"]).requests
+
+    assert _system(first).startswith(STATIC)
+    assert _system(first).endswith("Stage: stage_1. Today: 2025-01-01")
+    assert _system(second).endswith("Stage: stage_2. Today: 2025-01-01")
+    prefix = _system(first).rsplit("Stage:", 1)[0]
+    assert _system(second).startswith(prefix)
+    metrics = cache.metrics["agent"]
+    assert (metrics.calls, metrics.hits, metrics.creates) == (2, 1, 0)
+    assert metrics.savings == 0.4
+
+
+def test_explicit_cache_is_created_once_and_refreshed_before_expiry() -> None:
+    now = [0.0]
+    caches = _FakeCaches()
+    cache = ContextCache(
+        explicit=True,
+        ttl=600,
+        refresh_margin=60,
+        client=SimpleNamespace(aio=SimpleNamespace(caches=caches)),
+        clock=lambda: now[0],
+    )
+    llm = _run(cache, ["stage_1", "stage_2"])
+    now[0] = 590.0
+    llm.requests += _run(cache, ["stage_3"]).requests
+
+    (created,) = caches.created
+    assert str(created.system_instruction).startswith(STATIC)
+    assert "Stage:" not in str(created.system_instruction)
+    assert created.tools and created.ttl == "600s"
+    assert caches.updated == ["cachedContents/1"]
+    for request, stage in zip(
+        llm.requests, ["stage_1", "stage_2", "stage_3"], strict=True
+    ):
+        assert request.config is not None
+        assert request.config.cached_content == "cachedContents/1"
+        assert request.config.system_instruction is None
+        assert request.config.tools is None
+        assert request.contents[0].parts == [
+            genai_types.Part(text=f"Stage: {stage}. Today: 2025-01-01")
+        ]
+    metrics = cache.metrics["agent"]
+    assert (metrics.creates, metrics.refreshes, metrics.errors) == (1, 1, 0)
+
+
+def test_uncacheable_prefix_falls_back_and_is_retried_after_ttl() -> None:
+    now = [0.0]
+    caches = _FakeCaches(fail=True)
+    cache = ContextCache(
+        explicit=True,
+        ttl=600,
+        client=SimpleNamespace(aio=SimpleNamespace(caches=caches)),
+        clock=lambda: now[0],
+    )
+    requests: list[Any] = _run(cache, ["stage_1", "stage_2"]).requests
+    assert all(r.config.cached_content is None for r in requests)
+    assert _system(requests[1]).endswith("Stage: stage_2. Today: 2025-01-01")
+    assert cache.metrics["agent"].errors == 1
+
+    caches.fail = False
+    now[0] = 600.0
+    (request,) = _run(cache, ["stage_3"]).requests
+    assert request.config is not None
+    assert request.config.cached_content == "cachedContents/1"
@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+
+from app.utils.crisis import CrisisDetector, CrisisLexicon, get_crisis_detector
+
+
+def _detector(**categories: list[str]) -> CrisisDetector:
+    return CrisisDetector(
+        CrisisLexicon.from_dict({"version": "t1", "categories": categories})
+    )
+
+
+def test_reports_every_hit_with_original_span() -> None:
+    """Overlapping patterns are all reported, with spans in the raw input."""
+    detector = _detector(suicide=["自杀", "想自杀"], method=["跳楼"])
+    text = "我最近想自杀\uff0c甚至想过跳楼"
+    matches = detector.scan(text)
+
+    assert [(m.pattern, text[m.start : m.end]) for m in matches] == [
+        ("想自杀", "想自杀"),
+        ("自杀", "自杀"),
+        ("跳楼", "跳楼"),
+    ]
+    assert {m.category for m in matches} == {"suicide", "method"}
+
+
+def test_normalizes_obfuscated_input() -> None:
+    """Full-width, traditional and whitespace-split variants still match."""
+    detector = _detector(suicide=["自杀", "kill myself"])
+
+    for text in ["自 杀", "自​杀", "自.杀", "自殺", "ＫＩＬＬ　ＭＹＳＥＬＦ"]:  # noqa: RUF001
+        matches = detector.scan(text)
+        assert len(matches) == 1, text
+        assert matches[0].start == 0 and matches[0].end == len(text)
+
+
+def test_no_false_positive_on_clean_input() -> None:
+    detector = _detector(suicide=["自杀", "不想活了"])
+
+    assert detector.scan("今天的作业我不想写了\uff0c但还是想活得更好") == []
+    assert detector.scan("") == []
+
+
+def test_latin_patterns_match_whole_words_only() -> None:
+    detector = get_crisis_detector()
+
+    for text in [
+        "I want to spend my life with my family",
+        "I will upskill myself this year",
+        "I need to defend my life choices",
+        "Suicides of characters in this novel",
+    ]:
+        assert detector.scan(text) == [], text
+    for text in [
+        "I want to end my life.",
+        "sometimes I want to KILL myself",
+        "self-harm",
+    ]:
+        matches = detector.scan(text)
+        assert len(matches) == 1, text
+        assert text[matches[0].start : matches[0].end].lower() in {
+            "end my life",
+            "kill myself",
+            "self-harm",
+        }
+
+
+def test_exceptions_suppress_hits_inside_ordinary_words() -> None:
+    detector = get_crisis_detector()
+
+    assert detector.scan("这条路走不通\uff0c去死胡同看看") == []
+    assert detector.scan("双十一跳楼价") == []
+    assert [m.pattern for m in detector.scan("我真想去死\uff0c走进了死胡同")] == [
+        "想去死",
+        "去死",
+    ]
+
+
+def test_lexicon_file_roundtrip(tmp_path: Path) -> None:
+    path = tmp_path / "lexicon.json"
+    path.write_text(
+        json.dumps(
+            {
+                "version": "2099.1",
+                "categories": {"x": ["呜呜"]},
+                "variants": {"嗚": "呜"},
+            }
+        ),
+        encoding="utf-8",
+    )
+    detector = CrisisDetector(CrisisLexicon.from_file(str(path)))
+
+    assert detector.version == "2099.1"
+    assert len(detector.scan("嗚嗚")) == 1
+
+
+def test_bundled_lexicon_covers_legacy_keywords() -> None:
+    detector = get_crisis_detector()
+
+    for keyword in ["自杀", "自残", "不想活了", "去死"]:
+        assert detector.scan(f"……{keyword}……"), keyword
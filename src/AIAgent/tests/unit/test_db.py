@@ -0,0 +1,208 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+import httpx
+import pytest
+
+from app.onemind_agent import MemoBaseTool, SessionInput, StageUpdateInput
+from app.utils.db import SupabaseError, SupabaseRestClient
+
+
+def _client(
+    handler: Callable[[httpx.Request], httpx.Response]
+    | Callable[[httpx.Request], Coroutine[None, None, httpx.Response]],
+    **kwargs: Any,
+) -> SupabaseRestClient:
+    return SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(handler),
+        retry_backoff=0,
+        **kwargs,
+    )
+
+
+def test_select_builds_postgrest_query() -> None:
+    seen: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return httpx.Response(200, json=[{"current_stage": "stage_2_integration"}])
+
+    db = _client(handler)
+    rows = db.run_sync(
+        db.select(
+            "sessions",
+            "current_stage",
+            filters={"session_id": "s1"},
+            order="created_at",
+            desc=True,
+            limit=1,
+        )
+    )
+
+    assert rows == [{"current_stage": "stage_2_integration"}]
+    assert seen[0].url.path == "/rest/v1/sessions"
+    assert dict(seen[0].url.params) == {
+        "select": "current_stage",
+        "session_id": "eq.s1",
+        "order": "created_at.desc",
+        "limit": "1",
+    }
+    assert seen[0].headers["apikey"] == "anon-key"
+
+
+def test_retries_transient_errors_then_succeeds() -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            return httpx.Response(503, json={"message": "unavailable"})
+        return httpx.Response(200, json=[])
+
+    db = _client(handler, max_retries=2)
+    assert db.run_sync(db.select("sessions")) == []
+    assert db.metrics.retries == 2
+    assert db.metrics.requests == 3
+
+
+def test_non_idempotent_write_is_not_retried_after_read_timeout() -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        raise httpx.ReadTimeout("slow", request=request)
+
+    db = _client(handler, max_retries=3)
+    with pytest.raises(httpx.ReadTimeout):
+        db.run_sync(db.insert("integration_crystals", {"name": "x"}))
+    assert calls == 1
+    assert db.metrics.timeouts == 1
+    assert db.metrics.failures == 1
+
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_non_idempotent_write_is_not_retried_after_gateway_error(status: int) -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(status, json={"message": "bad gateway"})
+
+    db = _client(handler, max_retries=3)
+    with pytest.raises(SupabaseError):
+        db.run_sync(db.insert("integration_crystals", {"name": "x"}))
+    # The insert may have been committed behind the gateway.
+    assert calls == 1
+    assert db.metrics.retries == 0
+
+
+def test_client_errors_raise_without_retry() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, json={"code": "PGRST202", "message": "missing"})
+
+    db = _client(handler)
+    with pytest.raises(SupabaseError) as excinfo:
+        db.run_sync(db.rpc("nope", {}))
+    assert excinfo.value.code == "PGRST202"
+    assert db.metrics.retries == 0
+
+
+def test_pool_bounds_in_flight_requests() -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=[])
+
+    db = _client(handler, pool_size=2)
+
+    async def burst() -> None:
+        await asyncio.gather(*(db.select("sessions") for _ in range(6)))
+
+    db.run_sync(burst())
+    assert db.metrics.peak_in_flight == 2
+    assert db.metrics.in_flight == 0
+    assert db.metrics.wait_time_max > 0
+
+
+def test_memo_base_tool_sync_wrappers() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "/rpc/" in request.url.path:
+            return httpx.Response(404, json={"code": "PGRST202", "message": "x"})
+        if request.url.path.endswith("/sessions") and request.method == "GET":
+            return httpx.Response(200, json=[{"current_stage": "stage_3_micro_action"}])
+        if request.url.path.endswith("/integration_crystals"):
+            return httpx.Response(200, json=[{"key_insight": "start small"}])
+        return httpx.Response(204)
+
+    tool = MemoBaseTool(_client(handler))
+
+    assert tool.get_session_sync(SessionInput(session_id="s1", user_id="u1")) == {
+        "stage": "stage_3_micro_action",
+        "memory_insight": "start small",
+    }
+    assert tool.update_session_stage_sync(
+        StageUpdateInput(session_id="s1", next_stage="stage_4_solidification")
+    )
+    assert MemoBaseTool(None).get_session_sync(
+        SessionInput(session_id="s1", user_id="u1")
+    )["stage"] == ("stage_1_awareness")
+
+
+def test_get_session_uses_single_rpc_round_trip() -> None:
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(f"{request.method} {request.url.path}")
+        return httpx.Response(
+            200, json=[{"stage": "stage_2_integration", "memory_insight": None}]
+        )
+
+    tool = MemoBaseTool(_client(handler))
+
+    assert tool.get_session_sync(SessionInput(session_id="s1", user_id="u1")) == {
+        "stage": "stage_2_integration",
+        "memory_insight": "None",
+    }
+    assert seen == ["POST /rest/v1/rpc/get_or_create_session"]
+
+
+def test_get_session_falls_back_when_rpc_is_missing() -> None:
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(f"{request.method} {request.url.path}")
+        if "/rpc/" in request.url.path:
+            return httpx.Response(404, json={"code": "PGRST202", "message": "x"})
+        if request.url.path.endswith("/sessions"):
+            return httpx.Response(200, json=[{"current_stage": "stage_1_awareness"}])
+        return httpx.Response(200, json=[])
+
+    tool = MemoBaseTool(_client(handler))
+    for _ in range(2):
+        assert tool.get_session_sync(SessionInput(session_id="s1", user_id="u1")) == {
+            "stage": "stage_1_awareness",
+            "memory_insight": "None",
+        }
+
+    # The missing RPC is only probed once.
+    assert seen.count("POST /rest/v1/rpc/get_or_create_session") == 1
+    assert not tool.session_rpc_available
@@ -0,0 +1,144 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+from app.utils.feedback import FeedbackBatcher, ThreadedSink
+from app.utils.tracing import JsonlSink
+
+
+class ListSink:
+    def __init__(self, failures: int = 0) -> None:
+        self.batches: list[list[dict[str, Any]]] = []
+        self.failures = failures
+
+    async def write(self, records: list[dict[str, Any]]) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("unavailable")
+        self.batches.append(records)
+
+
+def _records(count: int, start: int = 0) -> list[dict[str, Any]]:
+    return [
+        {"invocation_id": f"inv-{i}", "user_id": "u1", "score": 5, "text": ""}
+        for i in range(start, start + count)
+    ]
+
+
+def test_flushes_on_size_and_drains_on_stop() -> None:
+    sink = ListSink()
+    batcher = FeedbackBatcher(sink, flush_size=3, flush_interval=60)
+
+    async def scenario() -> None:
+        assert batcher.submit(_records(3))
+        for _ in range(10):
+            await asyncio.sleep(0)
+            if batcher.metrics.flushes:
+                break
+        assert batcher.submit(_records(1, start=3))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in sink.batches] == [3, 1]
+    assert batcher.metrics.written == 4
+    assert batcher.depth == 0
+
+
+def test_rejects_whole_batch_when_full_and_requeues_failures() -> None:
+    sink = ListSink(failures=1)
+    batcher = FeedbackBatcher(sink, max_size=4, flush_size=100, flush_interval=60)
+
+    async def scenario() -> None:
+        assert batcher.submit(_records(3))
+        assert not batcher.submit(_records(2, start=3))
+        try:
+            await batcher.flush()
+        except RuntimeError:
+            pass
+        assert batcher.depth == 3
+        assert batcher.submit(_records(1, start=3))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert batcher.metrics.rejected == 2
+    assert batcher.metrics.failures == 1
+    assert [r["invocation_id"] for r in sink.batches[0]] == [
+        "inv-0",
+        "inv-1",
+        "inv-2",
+        "inv-3",
+    ]
+
+
+def test_drops_records_after_max_attempts() -> None:
+    sink = ListSink(failures=3)
+    batcher = FeedbackBatcher(sink, flush_interval=60, max_attempts=2)
+
+    async def scenario() -> None:
+        batcher.submit(_records(2))
+        for _ in range(2):
+            try:
+                await batcher.flush()
+            except RuntimeError:
+                pass
+        assert batcher.depth == 0
+        # The failure count starts over for the next records.
+        batcher.submit(_records(1, start=2))
+        try:
+            await batcher.flush()
+        except RuntimeError:
+            pass
+        assert batcher.depth == 1
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert batcher.metrics.dropped == 2
+    assert batcher.metrics.failures == 3
+    assert [[r["invocation_id"] for r in batch] for batch in sink.batches] == [
+        ["inv-2"]
+    ]
+
+
+def test_threaded_sink_writes_jsonl(tmp_path: Path) -> None:
+    path = tmp_path / "feedback.jsonl"
+    batcher = FeedbackBatcher(ThreadedSink(lambda: JsonlSink(str(path))))
+
+    async def scenario() -> None:
+        batcher.submit(_records(2))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["invocation_id"] for line in lines] == ["inv-0", "inv-1"]
+
+
+def test_failed_final_flush_lets_the_batcher_restart() -> None:
+    sink = ListSink(failures=1)
+    batcher = FeedbackBatcher(sink, flush_interval=60)
+
+    async def scenario() -> None:
+        batcher.submit(_records(1))
+        try:
+            await batcher.stop()
+        except RuntimeError:
+            pass
+        batcher.submit(_records(1, start=1))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in sink.batches] == [2]
@@ -0,0 +1,100 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.utils.kb_index import (
+    KnowledgeIndex,
+    ReloadingKnowledgeBase,
+    build_index,
+    load_chunk_dir,
+    main,
+)
+from app.utils.knowledge import DEFAULT_KNOWLEDGE_PATH, get_knowledge_base, load_chunks
+
+
+def _write_chunk_dir(directory: Path) -> None:
+    chunks = json.loads(Path(DEFAULT_KNOWLEDGE_PATH).read_text(encoding="utf-8"))
+    directory.mkdir()
+    (directory / "a.json").write_text(json.dumps(chunks[:4]), encoding="utf-8")
+    (directory / "b.jsonl").write_text(
+        "\n".join(json.dumps(chunk) for chunk in chunks[4:-1]), encoding="utf-8"
+    )
+    (directory / "c.json").write_text(json.dumps(chunks[-1]), encoding="utf-8")
+
+
+def test_cli_build_roundtrip(tmp_path: Path, capsys) -> None:  # type: ignore[no-untyped-def]
+    _write_chunk_dir(tmp_path / "kb")
+    output = tmp_path / "kb.omkb"
+
+    main(["build", str(tmp_path / "kb"), "-o", str(output), "--version", "v1"])
+
+    index = KnowledgeIndex(output)
+    bundled = get_knowledge_base()
+    assert index.version == "v1"
+    assert len(index) == len(bundled)
+    assert index.chunks[0] == bundled.chunks[0]
+    assert index.chunks[-1] == bundled.chunks[-1]
+    assert not index.matrix.flags.writeable
+    assert index.chunks_with_tag("拖延").tolist() == [
+        i for i, chunk in enumerate(bundled.chunks) if "拖延" in chunk.tags
+    ]
+    assert index.chunks_with_tag("no-such-tag").size == 0
+
+    mapped = index.knowledge_base()
+    query = "道理我都懂\uff0c就是做不到"
+    assert [c.id for c, _ in mapped.search(query)] == [
+        c.id for c, _ in bundled.search(query)
+    ]
+    # The mapped matrix and postings are searched in place.
+    assert np.shares_memory(mapped.index.matrix, index.matrix)
+    assert index.bm25 is not None and mapped.lexical is index.bm25
+    assert list(tmp_path.glob(".kb.omkb.*")) == []
+    assert "version v1" in capsys.readouterr().out
+
+
+def test_reloads_after_atomic_replace(tmp_path: Path) -> None:
+    chunks = load_chunks(DEFAULT_KNOWLEDGE_PATH)
+    path = tmp_path / "kb.omkb"
+    build_index(chunks[:3], path, version="v1")
+    now = [0.0]
+    reloading = ReloadingKnowledgeBase(path, check_interval=5, clock=lambda: now[0])
+
+    first = reloading.get()
+    build_index(chunks, path, version="v2")
+    assert reloading.get() is first  # not due for a check yet
+
+    now[0] = 5
+    second = reloading.get()
+    assert second is not first
+    assert reloading.index.version == "v2"
+    assert len(second) == len(chunks)
+    # Searches holding the old knowledge base still work.
+    assert first.search("完美主义")
+
+
+def test_rejects_duplicate_ids_and_foreign_files(tmp_path: Path) -> None:
+    chunk = {"id": "OKC-1", "title": "t", "core_concept": "c"}
+    (tmp_path / "a.json").write_text(json.dumps(chunk), encoding="utf-8")
+    (tmp_path / "b.json").write_text(json.dumps([chunk]), encoding="utf-8")
+    with pytest.raises(ValueError, match="Duplicate chunk id"):
+        load_chunk_dir(tmp_path)
+
+    (tmp_path / "junk.omkb").write_bytes(b"not an index at all")
+    with pytest.raises(ValueError, match="not a knowledge base index"):
+        KnowledgeIndex(tmp_path / "junk.omkb")
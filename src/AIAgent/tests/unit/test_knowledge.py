@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import numpy as np
+
+from app.onemind_agent import retrieve_wisdom
+from app.utils.knowledge import (
+    HashingEmbedder,
+    KnowledgeBase,
+    KnowledgeChunk,
+    VectorIndex,
+    get_knowledge_base,
+)
+
+
+def _chunk(chunk_id: str, title: str, core_concept: str) -> KnowledgeChunk:
+    return KnowledgeChunk(id=chunk_id, title=title, core_concept=core_concept)
+
+
+def test_vector_index_matches_brute_force() -> None:
+    rng = np.random.default_rng(7)
+    matrix = rng.standard_normal((500, 32)).astype(np.float32)
+    queries = rng.standard_normal((4, 32)).astype(np.float32)
+    index = VectorIndex(matrix)
+
+    indices, scores = index.search(queries, top_k=5)
+
+    unit = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    expected = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    for row in range(len(queries)):
+        assert indices[row].tolist() == np.argsort(-expected[row])[:5].tolist()
+        np.testing.assert_allclose(
+            scores[row], np.sort(expected[row])[::-1][:5], rtol=1e-5
+        )
+    assert index.matrix.flags.c_contiguous and index.matrix.dtype == np.float32
+    # top_k larger than the index returns every row.
+    assert index.search(queries[0], top_k=1000)[0].shape == (1, 500)
+
+
+def test_knowledge_base_uses_pluggable_embedder() -> None:
+    calls: list[int] = []
+
+    def embedder(texts):  # type: ignore[no-untyped-def]
+        calls.append(len(texts))
+        return HashingEmbedder(dim=64)(texts)
+
+    kb = KnowledgeBase(
+        [
+            _chunk("a", "完美主义", "追求完美导致拖延"),
+            _chunk("b", "情绪命名", "给焦虑起一个名字"),
+        ],
+        embedder=embedder,
+    )
+    results = kb.search_batch(["我很焦虑", "完美主义让我拖延"], top_k=1)
+
+    assert [[chunk.id for chunk, _ in result] for result in results] == [["b"], ["a"]]
+    # One call for the corpus, one for the whole query batch.
+    assert calls == [2, 2]
+
+
+def test_retrieve_wisdom_searches_bundled_chunks() -> None:
+    results = asyncio.run(retrieve_wisdom("道理我都懂\uff0c就是做不到", top_k=2))
+
+    assert results[0]["title"] == "知行合一\uff1a在事上练"
+    assert len(results) <= 2
+    assert asyncio.run(retrieve_wisdom("天气", top_k=3)) == []
+    assert len(get_knowledge_base()) >= 10
@@ -0,0 +1,199 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import httpx
+import pytest
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.tools import FunctionTool
+from google.genai import types as genai_types
+from pydantic import Field
+
+from app import onemind_agent
+from app.onemind_agent import orchestrator_agent
+from app.utils.db import SupabaseRestClient
+from app.utils.model_router import StageRouter, parse_stage_routes
+
+
+def lookup(query: str) -> str:
+    """Looks something up."""
+    return query
+
+
+def advance(stage: str) -> bool:
+    """Advances the stage."""
+    return True
+
+
+def _request() -> LlmRequest:
+    request = LlmRequest(
+        model="pro", config=genai_types.GenerateContentConfig(tools=[])
+    )
+    request.append_tools([FunctionTool(lookup), FunctionTool(advance)])
+    return request
+
+
+def _declared(request: LlmRequest) -> list[str]:
+    assert request.config is not None
+    return [
+        d.name or ""
+        for tool in request.config.tools or []
+        for d in getattr(tool, "function_declarations", None) or []
+    ]
+
+
+def _context(stage: str) -> CallbackContext:
+    session = Session(id="s", app_name="app", user_id="u", state={"stage": stage})
+    return CallbackContext(
+        InvocationContext(
+            session_service=InMemorySessionService(),
+            invocation_id="inv",
+            agent=orchestrator_agent,
+            session=session,
+        )
+    )
+
+
+def test_routes_model_and_tool_declarations_by_stage() -> None:
+    routes = parse_stage_routes("s1=flash; s3=flash", "s1=advance;s2=lookup,advance")
+    assert routes["s3"].tools is None
+    router = StageRouter(routes, stage_key="stage")
+
+    request = _request()
+    router.before_model(_context("s1"), request)
+    assert request.model == "flash"
+    assert _declared(request) == ["advance"]
+    assert set(request.tools_dict) == {"lookup", "advance"}
+
+    request = _request()
+    router.before_model(_context("s2"), request)
+    assert request.model == "pro"
+    assert _declared(request) == ["lookup", "advance"]
+    assert router.metrics.declarations_removed == 1
+
+
+def test_falls_back_under_latency_pressure_and_recovers() -> None:
+    now = [0.0]
+    router = StageRouter(
+        {},
+        stage_key="stage",
+        fallback_model="flash",
+        latency_slo=1.0,
+        latency_window=60.0,
+        clock=lambda: now[0],
+    )
+    response = LlmResponse()
+
+    def call() -> str:
+        request = _request()
+        context = _context("s1")
+        router.before_model(context, request)
+        now[0] += 2.0
+        router.after_model(context, response)
+        return request.model or ""
+
+    assert [call() for _ in range(6)] == ["pro"] * 5 + ["flash"]
+    assert router.metrics.fallbacks == 1
+    now[0] += 60.0
+    assert call() == "pro"
+
+
+class _AdvancingLlm(BaseLlm):
+    requests: list[LlmRequest] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # Callbacks edit the request in place; keep what this call saw.
+        config = (
+            llm_request.config.model_copy(deep=True) if llm_request.config else None
+        )
+        self.requests.append(LlmRequest(model=llm_request.model, config=config))
+        if len(self.requests) == 1:
+            session_id = "".join(
+                p.text or "" for p in llm_request.contents[0].parts or []
+            )
+            part = genai_types.Part(
+                function_call=genai_types.FunctionCall(
+                    name="update_session_stage",
+                    args={
+                        "stage_update": {
+                            "session_id": session_id,
+                            "next_stage": "stage_2_integration",
+                        }
+                    },
+                )
+            )
+        else:
+            part = genai_types.Part(text="好")
+        yield LlmResponse(content=genai_types.Content(role="model", parts=[part]))
+
+
+def _supabase(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/rpc/get_or_create_session"):
+        return httpx.Response(
+            200, json=[{"stage": "stage_1_awareness", "memory_insight": None}]
+        )
+    return httpx.Response(204)
+
+
+def test_stage_update_reroutes_the_rest_of_the_turn(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    db = SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(_supabase),
+        max_retries=0,
+    )
+    monkeypatch.setattr(onemind_agent.memo_base_tool, "db", db)
+    monkeypatch.setattr(onemind_agent.memo_base_tool, "cache", None)
+    llm = _AdvancingLlm(model="fake")
+    agent = orchestrator_agent.model_copy(update={"model": llm, "parent_agent": None})
+    service = InMemorySessionService()
+
+    async def scenario() -> dict[str, Any]:
+        session = await service.create_session(app_name="app", user_id="u1")
+        runner = Runner(app_name="app", agent=agent, session_service=service)
+        async for _ in runner.run_async(
+            user_id="u1",
+            session_id=session.id,
+            new_message=genai_types.Content(
+                role="user", parts=[genai_types.Part(text=session.id)]
+            ),
+        ):
+            pass
+        loaded = await service.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert loaded is not None
+        return loaded.state
+
+    state = asyncio.run(scenario())
+    first, second = llm.requests
+    assert first.model == "gemini-2.5-flash"
+    assert _declared(first) == ["update_session_stage"]
+    assert second.model == "fake"
+    assert set(_declared(second)) == {"retrieve_wisdom", "update_session_stage"}
+    assert "`current_stage`: stage_2_integration" in str(
+        second.config.system_instruction if second.config else ""
+    )
+    assert state["current_stage"] == "stage_2_integration"
@@ -0,0 +1,110 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types as genai_types
+from pydantic import Field
+
+from app import onemind_agent
+from app.onemind_agent import CRISIS_RESPONSE, DEFAULT_STAGE, orchestrator_agent
+
+
+class _RecordingLlm(BaseLlm):
+    requests: list[LlmRequest] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.requests.append(llm_request)
+        yield LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text="我在这里。")]
+            )
+        )
+
+
+def _run(text: str) -> tuple[_RecordingLlm, list[str], dict[str, Any]]:
+    llm = _RecordingLlm(model="fake")
+    agent = orchestrator_agent.model_copy(update={"model": llm, "parent_agent": None})
+    service = InMemorySessionService()
+
+    async def scenario() -> tuple[list[str], dict[str, Any]]:
+        session = await service.create_session(app_name="app", user_id="u1")
+        runner = Runner(app_name="app", agent=agent, session_service=service)
+        replies = []
+        async for event in runner.run_async(
+            user_id="u1",
+            session_id=session.id,
+            new_message=genai_types.Content(
+                role="user", parts=[genai_types.Part(text=text)]
+            ),
+        ):
+            if event.content and event.content.parts:
+                replies += [p.text for p in event.content.parts if p.text]
+        loaded = await service.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert loaded is not None
+        return replies, loaded.state
+
+    replies, state = asyncio.run(scenario())
+    return llm, replies, state
+
+
+def test_session_context_reaches_instruction_without_tool_calls() -> None:
+    llm, replies, state = _run("我最近总是拖延")
+    assert replies == ["我在这里。"]
+    assert state["current_stage"] == DEFAULT_STAGE
+    assert state["user_id"] == "u1"
+    (request,) = llm.requests
+    assert request.config is not None
+    assert f"`current_stage`: {DEFAULT_STAGE}" in str(request.config.system_instruction)
+    assert {"check_crisis", "get_session"}.isdisjoint(request.tools_dict)
+
+
+def test_crisis_short_circuits_the_model() -> None:
+    llm, replies, _ = _run("我真的不想活了")
+    assert replies == [CRISIS_RESPONSE]
+    assert llm.requests == []
+
+
+def test_screening_and_session_load_run_concurrently(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    session_loading = threading.Event()
+
+    def check_crisis(user_input: str) -> bool:
+        # Blocks unless get_session is already running.
+        assert session_loading.wait(timeout=5)
+        return False
+
+    async def get_session(session_input: Any) -> dict[str, str]:
+        session_loading.set()
+        await asyncio.sleep(0)
+        return {"stage": "stage_2_integration", "memory_insight": "怕失败"}
+
+    monkeypatch.setattr(onemind_agent, "check_crisis", check_crisis)
+    monkeypatch.setattr(onemind_agent.memo_base_tool, "get_session", get_session)
+    llm, _, state = _run("你好")
+    assert state["current_stage"] == "stage_2_integration"
+    assert state["memory_insight"] == "怕失败"
+    assert len(llm.requests) == 1
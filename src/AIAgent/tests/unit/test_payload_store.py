@@ -0,0 +1,75 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from app.utils.payload_store import (
+    TRUNCATED_PREVIEW_CHARS,
+    AttributeOffloader,
+    GcsPayloadStore,
+    LocalPayloadStore,
+)
+
+ATTRIBUTES = {
+    "gen_ai.system": "gcp.vertex.agent",
+    "llm_request": "我" * 5000,
+    "llm_response": ["x" * 3000],
+}
+
+
+def test_offloads_largest_attributes_until_they_fit(tmp_path: Path) -> None:
+    offloader = AttributeOffloader(LocalPayloadStore(tmp_path), max_bytes=8000)
+    assert offloader.offload({"small": "x" * 100}, "spans/1") == {"small": "x" * 100}
+
+    result = offloader.offload(ATTRIBUTES, "spans/1")
+    offloader.flush()
+    assert result["gen_ai.system"] == "gcp.vertex.agent"
+    assert result["llm_response"] == ["x" * 3000]
+    reference = result["llm_request"]
+    assert reference["bytes"] == len(
+        json.dumps("我" * 5000, ensure_ascii=False).encode()
+    )
+
+    path = Path(unquote(urlparse(reference["offloaded"]).path))
+    assert path == tmp_path / "spans/1/llm_request.json.gz"
+    assert json.loads(gzip.decompress(path.read_bytes())) == "我" * 5000
+    assert offloader.metrics.offloaded == 1
+    assert offloader.metrics.bytes_stored < offloader.metrics.bytes_in
+    offloader.close()
+
+
+class FakeBucket:
+    name = "onemind-logs"
+
+    def __init__(self, exists: bool) -> None:
+        self._exists = exists
+        self.checks = 0
+
+    def exists(self) -> bool:
+        self.checks += 1
+        return self._exists
+
+
+def test_missing_bucket_is_checked_once_and_truncates() -> None:
+    bucket = FakeBucket(exists=False)
+    offloader = AttributeOffloader(GcsPayloadStore(bucket), max_bytes=6000)
+    for _ in range(3):
+        result = offloader.offload(ATTRIBUTES, "spans/1")
+    assert bucket.checks == 1
+    assert len(result["llm_request"]["truncated"]) == TRUNCATED_PREVIEW_CHARS
+    assert result["llm_response"]["truncated"].startswith('["xxx')
+    assert offloader.metrics.truncated == 6
@@ -0,0 +1,123 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from typing import Any
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types as genai_types
+
+from app.agent import ResearchBudgetController
+
+
+def model_event(
+    invocation_id: str = "inv",
+    tokens: int = 0,
+    queries: tuple[str, ...] = (),
+    age: float = 0,
+) -> Event:
+    return Event(
+        invocation_id=invocation_id,
+        author="research_evaluator",
+        timestamp=time.time() - age,
+        usage_metadata=genai_types.GenerateContentResponseUsageMetadata(
+            total_token_count=tokens
+        ),
+        grounding_metadata=genai_types.GroundingMetadata(
+            web_search_queries=list(queries)
+        ),
+    )
+
+
+def decide(controller: ResearchBudgetController, session: Session) -> dict[str, Any]:
+    """Runs the controller once and applies its state delta, as the runner would."""
+    ctx = InvocationContext(
+        session_service=InMemorySessionService(),
+        invocation_id="inv",
+        agent=controller,
+        session=session,
+    )
+
+    async def run() -> list[Event]:
+        return [event async for event in controller.run_async(ctx)]
+
+    [event] = asyncio.run(run())
+    session.state.update(event.actions.state_delta)
+    decision = session.state["research_loop"]["decisions"][-1]
+    assert bool(event.actions.escalate) == decision["stop"]
+    return decision
+
+
+def evaluation(grade: str, *queries: str) -> dict[str, Any]:
+    return {
+        "grade": grade,
+        "comment": "",
+        "follow_up_queries": [{"search_query": q} for q in queries],
+    }
+
+
+def test_stops_on_pass_and_budgets() -> None:
+    controller = ResearchBudgetController(
+        name="controller", token_budget=1000, time_budget=60, search_budget=3
+    )
+    session = Session(id="s", app_name="app", user_id="u")
+    session.events.append(model_event("earlier", tokens=10_000, age=3600))
+    session.events.append(model_event(tokens=400, queries=("a", "b")))
+    session.state["research_evaluation"] = evaluation("fail", "c")
+
+    decision = decide(controller, session)
+    assert decision == {
+        "iteration": 1,
+        "tokens": 400,
+        "elapsed": decision["elapsed"],
+        "searches": 2,
+        "new_sources": None,
+        "stop": False,
+        "reason": "continue",
+    }
+    assert decision["elapsed"] < 60
+
+    session.events.append(model_event(tokens=700, queries=("c",)))
+    session.state["sources"] = {"src-1": {}}
+    assert decide(controller, session)["reason"] == "token_budget"
+
+    session.state["research_evaluation"] = evaluation("pass")
+    assert decide(controller, session)["reason"] == "pass"
+    assert len(session.state["research_loop"]["decisions"]) == 3
+
+    session.events[-2:] = [model_event(age=120)]
+    session.state["research_evaluation"] = evaluation("fail", "d")
+    assert decide(controller, session)["reason"] == "time_budget"
+
+
+def test_stops_on_repeated_queries_and_few_new_sources() -> None:
+    controller = ResearchBudgetController(name="controller", min_new_sources=2)
+    session = Session(id="s", app_name="app", user_id="u")
+    session.events.append(model_event(queries=("Topic  A",)))
+    session.state["research_evaluation"] = evaluation("fail", "topic b")
+
+    assert decide(controller, session)["reason"] == "continue"
+
+    # The executor ran "topic b"; the evaluator asks for it again.
+    session.state["sources"] = {"src-1": {}, "src-2": {}}
+    session.state["research_evaluation"] = evaluation("fail", "Topic B", "topic a")
+    assert decide(controller, session)["reason"] == "repeated_queries"
+
+    session.state["research_evaluation"] = evaluation("fail", "topic c")
+    session.state["sources"]["src-3"] = {}
+    decision = decide(controller, session)
+    assert (decision["new_sources"], decision["reason"]) == (1, "few_new_sources")
@@ -0,0 +1,214 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import re
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types as genai_types
+from pydantic import Field
+
+from app import agent as agent_module
+from app.agent import (
+    ResearchFanOut,
+    deliverable_writer,
+    goal_researcher,
+    split_research_plan,
+)
+from app.utils.search_cache import SearchCache, normalize_query
+
+PLAN = """
+* **[RESEARCH]** Analyze topic alpha
+* [RESEARCH][MODIFIED] Investigate topic beta
+- [RESEARCH] Identify topic gamma
+- [DELIVERABLE][IMPLIED] Create a comparison table
+"""
+
+
+class FakeLlm(BaseLlm):
+    """Answers each goal after a per-goal delay, grounded on per-goal URLs."""
+
+    delays: dict[str, float] = Field(default_factory=dict)
+    in_flight: int = 0
+    peak: int = 0
+    calls: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        assert llm_request.config is not None
+        instruction = str(llm_request.config.system_instruction)
+        match = re.search(r"RESEARCH GOAL: (.*)", instruction)
+        goal = match.group(1) if match else ""
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delays.get(goal, 0.01))
+        self.in_flight -= 1
+        if not match:
+            yield LlmResponse(
+                content=genai_types.Content(
+                    role="model", parts=[genai_types.Part(text="TABLE")]
+                )
+            )
+            return
+        topic = goal.split()[-1]
+        yield LlmResponse(
+            content=genai_types.Content(
+                role="model", parts=[genai_types.Part(text=f"About {topic}.")]
+            ),
+            grounding_metadata=genai_types.GroundingMetadata(
+                grounding_chunks=[
+                    genai_types.GroundingChunk(
+                        web=genai_types.GroundingChunkWeb(
+                            uri=f"https://{topic}.example/{n}",
+                            title=f"{topic} {n}",
+                            domain=f"{topic}.example",
+                        )
+                    )
+                    for n in range(2)
+                ],
+                grounding_supports=[
+                    genai_types.GroundingSupport(
+                        segment=genai_types.Segment(text=f"About {topic}."),
+                        grounding_chunk_indices=[0, 1],
+                        confidence_scores=[0.9, 0.8],
+                    )
+                ],
+            ),
+        )
+
+
+async def research(
+    llm: FakeLlm,
+    max_concurrency: int,
+    plan: str = PLAN,
+    search_cache: SearchCache | None = None,
+) -> dict[str, Any]:
+    def with_model(agent: Any) -> Any:
+        return agent.model_copy(update={"model": llm, "parent_agent": None})
+
+    agent = ResearchFanOut(
+        name="section_researcher",
+        researcher=with_model(goal_researcher),
+        synthesizer=with_model(deliverable_writer),
+        max_concurrency=max_concurrency,
+        search_cache=search_cache,
+    )
+
+    service = InMemorySessionService()
+    session = await service.create_session(
+        app_name="app", user_id="u", state={"research_plan": plan}
+    )
+    runner = Runner(app_name="app", agent=agent, session_service=service)
+    async for _ in runner.run_async(
+        user_id="u",
+        session_id=session.id,
+        new_message=genai_types.Content(
+            role="user", parts=[genai_types.Part(text="Run it.")]
+        ),
+    ):
+        pass
+    loaded = await service.get_session(
+        app_name="app", user_id="u", session_id=session.id
+    )
+    assert loaded is not None
+    return loaded.state
+
+
+def run_fanout(
+    llm: FakeLlm,
+    max_concurrency: int,
+    plan: str = PLAN,
+    search_cache: SearchCache | None = None,
+) -> dict[str, Any]:
+    return asyncio.run(research(llm, max_concurrency, plan, search_cache))
+
+
+def test_split_research_plan() -> None:
+    research, deliverables = split_research_plan(PLAN)
+
+    assert research == [
+        "**[RESEARCH]** Analyze topic alpha",
+        "[RESEARCH][MODIFIED] Investigate topic beta",
+        "[RESEARCH] Identify topic gamma",
+    ]
+    assert deliverables == ["[DELIVERABLE][IMPLIED] Create a comparison table"]
+
+
+def test_fanout_merges_in_plan_order_within_concurrency_limit() -> None:
+    # The first goal finishes last.
+    llm = FakeLlm(
+        model="gemini-2.5-flash",
+        delays={"**[RESEARCH]** Analyze topic alpha": 0.1},
+    )
+
+    state = run_fanout(llm, max_concurrency=2)
+
+    assert llm.peak == 2
+    findings = state["section_research_findings"]
+    assert findings.index("About alpha.") < findings.index("About beta.")
+    assert findings.index("About beta.") < findings.index("About gamma.")
+    assert findings.endswith("\n\nTABLE")
+    assert state["url_to_short_id"] == {
+        f"https://{topic}.example/{n}": f"src-{2 * i + n + 1}"
+        for i, topic in enumerate(["alpha", "beta", "gamma"])
+        for n in range(2)
+    }
+    assert [
+        c["text_segment"] for c in state["sources"]["src-1"]["supported_claims"]
+    ] == ["About alpha."]
+
+
+def test_search_cache_dedups_goals_within_and_across_runs() -> None:
+    llm = FakeLlm(model="gemini-2.5-flash")
+    cache = SearchCache()
+    plan = (
+        "- [RESEARCH] Analyze topic alpha\n- **[RESEARCH][NEW]** analyze topic alpha."
+    )
+
+    first = run_fanout(llm, max_concurrency=2, plan=plan, search_cache=cache)
+    second = run_fanout(llm, max_concurrency=2, plan=plan, search_cache=cache)
+
+    assert llm.calls == 1
+    assert cache.stats.deduplicated == 1
+    assert first["sources"] == second["sources"]
+    assert second["section_research_findings"].count("About alpha.") == 2
+
+
+def test_fanout_only_releases_the_searches_it_claimed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(agent_module, "_SEARCH_DEDUP_TIMEOUT", 0.01)
+    llm = FakeLlm(model="gemini-2.5-flash")
+    cache = SearchCache()
+    alpha = normalize_query("Analyze topic alpha")
+    gamma = normalize_query("Identify topic gamma")
+    plan = "- [RESEARCH] Analyze topic alpha\n- [RESEARCH] Identify topic gamma"
+
+    async def scenario() -> None:
+        # Another run is still researching alpha.
+        assert cache.claim(alpha) is None
+        await research(llm, max_concurrency=2, plan=plan, search_cache=cache)
+        assert cache.claim(alpha) is not None
+        assert cache.claim(gamma) is None
+
+    asyncio.run(scenario())
+    assert llm.calls == 2
+    assert cache.get(alpha) is not None
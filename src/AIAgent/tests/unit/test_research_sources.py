@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types as genai_types
+
+from app.agent import collect_research_sources_callback, section_researcher
+
+
+def grounded_event(url: str | None, *claims: str) -> Event:
+    return Event(
+        author="section_researcher",
+        grounding_metadata=genai_types.GroundingMetadata(
+            grounding_chunks=[
+                genai_types.GroundingChunk(
+                    web=genai_types.GroundingChunkWeb(
+                        uri=url, title=f"Title of {url}", domain="example.com"
+                    )
+                )
+            ],
+            grounding_supports=[
+                genai_types.GroundingSupport(
+                    segment=genai_types.Segment(text=claim),
+                    grounding_chunk_indices=[0],
+                    confidence_scores=[0.9],
+                )
+                for claim in claims
+            ],
+        ),
+    )
+
+
+def run_callback(session: Session) -> dict:
+    """Runs the callback and persists its state delta, as the runner would."""
+    context = CallbackContext(
+        InvocationContext(
+            session_service=InMemorySessionService(),
+            invocation_id="inv",
+            agent=section_researcher,
+            session=session,
+        )
+    )
+    collect_research_sources_callback(context)
+    delta = context._event_actions.state_delta
+    session.state.update(delta)
+    return delta
+
+
+def test_collects_incrementally_without_duplicate_claims() -> None:
+    session = Session(id="s", app_name="app", user_id="u")
+    session.events.append(grounded_event("https://a.example", "claim one"))
+    run_callback(session)
+
+    session.events.append(grounded_event("https://a.example", "claim one", "claim two"))
+    session.events.append(grounded_event("https://b.example", "claim three"))
+    run_callback(session)
+
+    sources = session.state["sources"]
+    assert session.state["url_to_short_id"] == {
+        "https://a.example": "src-1",
+        "https://b.example": "src-2",
+    }
+    assert [c["text_segment"] for c in sources["src-1"]["supported_claims"]] == [
+        "claim one",
+        "claim two",
+    ]
+    last = session.events[-1]
+    assert session.state["sources_event_cursor"] == {
+        "timestamp": last.timestamp,
+        "id": last.id,
+    }
+
+    # Nothing new: no work and no state writes.
+    assert run_callback(session) == {}
+
+
+def test_cursor_survives_a_session_loaded_as_a_window_of_events() -> None:
+    session = Session(id="s", app_name="app", user_id="u")
+    session.events.extend(grounded_event(f"https://{n}.example", "c") for n in "ab")
+    run_callback(session)
+
+    # A session service keeping the last two events loads the session again.
+    session.events = [session.events[-1], grounded_event("https://c.example", "c")]
+    run_callback(session)
+
+    assert list(session.state["url_to_short_id"]) == [
+        "https://a.example",
+        "https://b.example",
+        "https://c.example",
+    ]
+
+
+def test_skips_chunks_without_a_url() -> None:
+    session = Session(id="s", app_name="app", user_id="u")
+    session.events.append(grounded_event(None, "unsourced"))
+    session.events.append(grounded_event("https://a.example", "claim"))
+    run_callback(session)
+
+    assert session.state["url_to_short_id"] == {"https://a.example": "src-1"}
+    assert list(session.state["sources"]) == ["src-1"]
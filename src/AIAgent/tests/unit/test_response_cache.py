@@ -0,0 +1,193 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+import pytest
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.tools import FunctionTool
+from google.genai import types as genai_types
+
+from app import onemind_agent
+from app.onemind_agent import (
+    NO_MEMORY_INSIGHT,
+    orchestrator_agent,
+    response_cache_after_model,
+    response_cache_before_model,
+    response_cache_key,
+)
+from app.utils.response_cache import ResponseCache
+
+
+def test_exact_and_near_duplicate_hits_within_a_context() -> None:
+    cache = ResponseCache(similarity=0.8)
+    cache.put("stage_1", "我最近总是拖延\uff0c什么都不想做", "reply")
+
+    assert cache.get("stage_1", "我最近总是拖延, 什么都不想做!") == "reply"
+    assert cache.get("stage_1", "我最近总是拖延\uff0c什么都不想做啊") == "reply"
+    assert cache.get("stage_2", "我最近总是拖延\uff0c什么都不想做") is None
+    assert cache.get("stage_1", "今天天气很好") is None
+    assert (cache.stats.hits, cache.stats.semantic_hits, cache.stats.misses) == (
+        1,
+        1,
+        2,
+    )
+
+
+def test_defaults_to_exact_matches() -> None:
+    cache = ResponseCache()
+    cache.put("stage_1", "I want to keep going", "reply")
+
+    assert cache.get("stage_1", "I want to keep going!") == "reply"
+    assert cache.get("stage_1", "I don't want to keep going") is None
+    assert (cache.stats.hits, cache.stats.semantic_hits) == (1, 0)
+
+
+def test_evicts_by_entries_and_bytes() -> None:
+    cache = ResponseCache(max_entries=2, max_bytes=10_000)
+    entry_bytes = 1024 + 256 * 4
+    for i in range(3):
+        cache.put("ctx", f"prompt {i}", "x" * 1024)
+    assert len(cache) == 2
+    assert cache.bytes == 2 * entry_bytes
+    assert cache.get("ctx", "prompt 0") is None
+
+    cache.put("ctx", "big", "x" * (10_000 - 1024))
+    assert [cache.get("ctx", "prompt 2"), cache.get("ctx", "big")] == [None, "x" * 8976]
+    assert cache.bytes <= 10_000
+    assert cache.stats.evictions == 3
+    cache.put("ctx", "too big", "x" * 10_000)
+    assert cache.get("ctx", "too big") is None
+
+
+def user(text: str) -> genai_types.Content:
+    return genai_types.Content(role="user", parts=[genai_types.Part(text=text)])
+
+
+def tool_turn(name: str, response: dict[str, Any]) -> list[genai_types.Content]:
+    return [
+        genai_types.Content(
+            role="model",
+            parts=[
+                genai_types.Part(
+                    function_call=genai_types.FunctionCall(name=name, args={})
+                )
+            ],
+        ),
+        genai_types.Content(
+            role="user",
+            parts=[
+                genai_types.Part(
+                    function_response=genai_types.FunctionResponse(
+                        name=name, response=response
+                    )
+                )
+            ],
+        ),
+    ]
+
+
+def request(
+    *contents: genai_types.Content | list[genai_types.Content],
+) -> LlmRequest:
+    flat: list[genai_types.Content] = []
+    for content in contents:
+        flat.extend(content if isinstance(content, list) else [content])
+    return LlmRequest(model="gemini-2.5-pro", contents=flat)
+
+
+NEW_USER = {"current_stage": "stage_1_awareness", "memory_insight": NO_MEMORY_INSIGHT}
+WISDOM = tool_turn("retrieve_wisdom", {"result": []})
+
+
+def test_only_safe_stateless_openers_are_cacheable() -> None:
+    context, prompt = response_cache_key(request(user("你好")), NEW_USER)
+    assert "stage_1_awareness" in context
+    assert prompt == "你好"
+
+    remembered = {**NEW_USER, "memory_insight": "怕失败"}
+    for bypassed, state in [
+        (request(user("你好")), remembered),
+        (request(user("你好")), {}),
+        (request(user("你好"), WISDOM), NEW_USER),
+        (request(user("早"), user("你好")), NEW_USER),
+        (request(user("我" * 201)), NEW_USER),
+    ]:
+        assert response_cache_key(bypassed, state) is None
+
+
+def test_context_includes_the_declared_tools() -> None:
+    def declared(*names: str) -> LlmRequest:
+        llm_request = request(user("你好"))
+        llm_request.tools_dict = {name: FunctionTool(print) for name in names}
+        return llm_request
+
+    keys = {
+        response_cache_key(declared(*names), NEW_USER)
+        for names in [(), ("retrieve_wisdom",), ("retrieve_wisdom", "update_stage")]
+    }
+    assert len(keys) == 3
+    assert response_cache_key(
+        declared("update_stage", "retrieve_wisdom"), NEW_USER
+    ) == response_cache_key(declared("retrieve_wisdom", "update_stage"), NEW_USER)
+
+
+@pytest.fixture
+def cache(monkeypatch: pytest.MonkeyPatch) -> ResponseCache:
+    cache = ResponseCache()
+    monkeypatch.setattr(onemind_agent, "response_cache", cache)
+    return cache
+
+
+def test_callbacks_store_text_replies_and_serve_them(cache: ResponseCache) -> None:
+    def context() -> CallbackContext:
+        return CallbackContext(
+            InvocationContext(
+                session_service=InMemorySessionService(),
+                invocation_id="inv",
+                agent=orchestrator_agent,
+                session=Session(
+                    id="s", app_name="app", user_id="u", state=dict(NEW_USER)
+                ),
+            )
+        )
+
+    opener = request(user("你好"))
+    reply = LlmResponse(
+        content=genai_types.Content(
+            role="model",
+            parts=[
+                genai_types.Part(text="thinking", thought=True),
+                genai_types.Part(text="你好\uff0c我在这里。"),
+            ],
+        ),
+        usage_metadata=genai_types.GenerateContentResponseUsageMetadata(
+            total_token_count=100
+        ),
+    )
+    assert response_cache_before_model(context(), opener) is None
+    response_cache_after_model(context(), reply)
+
+    cached = response_cache_before_model(context(), opener)
+    assert cached is not None and cached.content and cached.content.parts
+    assert [p.text for p in cached.content.parts] == ["你好\uff0c我在这里。"]
+    assert cached.usage_metadata is None
+
+    # Tool calls are never cached.
+    assert response_cache_before_model(context(), request(user("嗨"))) is None
+    response_cache_after_model(context(), LlmResponse(content=WISDOM[0]))
+    assert len(cache) == 1
@@ -0,0 +1,63 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from pathlib import Path
+
+from app.utils.search_cache import SearchCache, normalize_query
+
+
+def test_normalize_query() -> None:
+    assert normalize_query("**[RESEARCH][MODIFIED]** Analyze  \uff38's impact.") == (
+        "analyze x s impact"
+    )
+    assert normalize_query("分析\uff0c拖延症") == normalize_query("分析 拖延症")
+
+
+def test_ttl_lru_and_sqlite_store(tmp_path: Path) -> None:
+    now = [0.0]
+    path = str(tmp_path / "search.sqlite")
+    cache = SearchCache(max_size=2, ttl=10, path=path, clock=lambda: now[0])
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")  # evicts b, the least recently used
+
+    assert len(cache) == 2
+    assert cache.get("b") == "B"  # still on disk
+    assert cache.stats.disk_hits == 1
+
+    restarted = SearchCache(max_size=2, ttl=10, path=path, clock=lambda: now[0])
+    assert restarted.get("c") == "C"
+    now[0] = 10
+    assert restarted.get("c") is None
+    assert cache.get("b") is None
+    assert cache.stats.expirations == 1
+    attributes = cache.span_attributes()
+    assert attributes["onemind.search_cache.hit_rate"] == 0.6667
+    assert attributes["onemind.search_cache.evictions"] == 2
+
+
+def test_concurrent_lookups_are_deduplicated() -> None:
+    cache = SearchCache()
+
+    async def run() -> list[str | None]:
+        assert cache.claim("k") is None
+        waiters = [cache.claim("k") for _ in range(3)]
+        cache.release("k", "result")
+        return [await waiter for waiter in waiters if waiter is not None]
+
+    assert asyncio.run(run()) == ["result"] * 3
+    assert cache.stats.deduplicated == 3
+    assert cache.get("k") == "result"
@@ -0,0 +1,115 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import httpx
+
+from app.onemind_agent import (
+    CrystalInput,
+    MemoBaseTool,
+    SessionInput,
+    StageUpdateInput,
+)
+from app.utils.db import SupabaseRestClient
+from app.utils.session_cache import SessionState, SessionStateCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_eviction_and_ttl_expiry() -> None:
+    clock = FakeClock()
+    cache = SessionStateCache(max_size=2, ttl=10, clock=clock)
+    cache.put("u1", "s1", SessionState("stage_1_awareness", "None"))
+    cache.put("u1", "s2", SessionState("stage_1_awareness", "None"))
+    assert cache.get("u1", "s1") is not None  # s2 is now least recently used
+    cache.put("u2", "s3", SessionState("stage_1_awareness", "None"))
+
+    assert cache.get("u1", "s2") is None
+    assert cache.stats.evictions == 1
+
+    clock.now = 11
+    assert cache.get("u1", "s1") is None
+    assert cache.stats.expirations == 1
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 2
+    assert len(cache) == 1
+
+
+def test_write_through_updates() -> None:
+    cache = SessionStateCache()
+    cache.put("u1", "s1", SessionState("stage_1_awareness", "None"))
+    cache.put("u1", "s2", SessionState("stage_2_integration", "None"))
+
+    cache.set_stage("s1", "stage_3_micro_action")
+    cache.set_stage("unknown", "stage_4_solidification")
+    cache.set_memory_insight("u1", "start small")
+
+    assert cache.get("u1", "s1") == SessionState("stage_3_micro_action", "start small")
+    assert cache.get("u1", "s2") == SessionState("stage_2_integration", "start small")
+    assert len(cache) == 2
+
+
+def test_write_through_does_not_revive_expired_entries() -> None:
+    clock = FakeClock()
+    cache = SessionStateCache(ttl=10, clock=clock)
+    cache.put("u1", "s1", SessionState("stage_1_awareness", "None"))
+    cache.put("u1", "s2", SessionState("stage_1_awareness", "None"))
+
+    clock.now = 11
+    cache.set_stage("s1", "stage_2_integration")
+    cache.set_memory_insight("u1", "start small")
+
+    assert len(cache) == 0
+    assert cache.stats.expirations == 2
+    assert cache.stats.misses == 0
+
+
+def test_memo_base_tool_reads_skip_supabase_in_steady_state() -> None:
+    seen: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(f"{request.method} {request.url.path}")
+        if "/rpc/" in request.url.path:
+            return httpx.Response(
+                200, json=[{"stage": "stage_1_awareness", "memory_insight": None}]
+            )
+        return httpx.Response(204)
+
+    db = SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(handler),
+    )
+    tool = MemoBaseTool(db, SessionStateCache())
+    session = SessionInput(session_id="s1", user_id="u1")
+
+    tool.get_session_sync(session)
+    assert tool.update_session_stage_sync(
+        StageUpdateInput(session_id="s1", next_stage="stage_2_integration")
+    )
+    assert tool.create_integration_crystal_sync(
+        CrystalInput(user_id="u1", name="c", insight="start small", session_id="s1")
+    )
+
+    assert tool.get_session_sync(session) == {
+        "stage": "stage_2_integration",
+        "memory_insight": "start small",
+    }
+    assert seen.count("POST /rest/v1/rpc/get_or_create_session") == 1
+    assert tool.cache is not None and tool.cache.stats.hits == 1
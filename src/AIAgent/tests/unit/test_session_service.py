@@ -0,0 +1,218 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from typing import Any
+
+import httpx
+from google.adk.cli import fast_api
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.genai import types
+
+from app.utils.db import SupabaseRestClient
+from app.utils.session_service import (
+    SESSION_SERVICE_URI,
+    SupabaseSessionService,
+    fast_api_session_service,
+    parse_timestamp,
+)
+
+
+class FakeSessionRpc:
+    """The functions of src/sql/12_adk_sessions.sql, in memory."""
+
+    def __init__(self) -> None:
+        self.sessions: dict[str, dict[str, Any]] = {}
+        self.events: dict[str, list[dict[str, Any]]] = {}
+        self.states: dict[str, dict[str, Any]] = {}
+        self.calls: list[tuple[str, dict[str, Any]]] = []
+
+    def _merge(self, p: dict[str, Any], app: str, user: str) -> None:
+        self.states.setdefault(p["p_app_name"], {}).update(p[app])
+        self.states.setdefault(f"{p['p_app_name']}/{p['p_user_id']}", {}).update(
+            p[user]
+        )
+
+    def _state(self, p: dict[str, Any], session: dict[str, Any]) -> dict[str, Any]:
+        return {
+            **self.states.get(p["p_app_name"], {}),
+            **self.states.get(f"{p['p_app_name']}/{p['p_user_id']}", {}),
+            **session["state"],
+        }
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        function = request.url.path.rsplit("/", 1)[-1]
+        p = json.loads(request.content)
+        self.calls.append((function, p))
+        key = f"{p['p_app_name']}/{p['p_user_id']}/{p['p_session_id']}"
+        session = self.sessions.get(key)
+        if function == "create_adk_session":
+            self._merge(p, "p_app_state", "p_user_state")
+            session = {"state": dict(p["p_state"])}
+            self.sessions[key] = session
+            self.events[key] = []
+            return httpx.Response(
+                200, json={"state": self._state(p, session), "update_time": 1.0}
+            )
+        if session is None:
+            return httpx.Response(200, json=None)
+        events = self.events[key]
+        if function == "append_adk_event":
+            session["state"].update(p["p_state_delta"])
+            self._merge(p, "p_app_state_delta", "p_user_state_delta")
+            events.append(p["p_event"])
+            return httpx.Response(200, json=len(events))
+        start = max(p["p_after_position"] + 1, len(events) - p["p_limit"], 0)
+        return httpx.Response(
+            200,
+            json={
+                "state": self._state(p, session),
+                "update_time": 2.0,
+                "event_count": len(events),
+                "events": events[start:],
+            },
+        )
+
+
+def _service(rpc: FakeSessionRpc, **kwargs: Any) -> SupabaseSessionService:
+    client = SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(rpc.handler),
+        max_retries=0,
+    )
+    return SupabaseSessionService(client, **kwargs)
+
+
+def _event(text: str, **state_delta: Any) -> Event:
+    return Event(
+        author="user",
+        invocation_id="inv",
+        content=types.Content(role="user", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state_delta),
+    )
+
+
+def _texts(events: list[Event]) -> list[str]:
+    return [e.content.parts[0].text for e in events if e.content and e.content.parts]
+
+
+def test_appends_events_and_loads_recent_window() -> None:
+    rpc = FakeSessionRpc()
+    writer = _service(rpc, max_events=3)
+    reader = _service(rpc, max_events=3, cache_size=0)
+
+    async def scenario() -> None:
+        session = await writer.create_session(
+            app_name="app", user_id="u1", state={"stage": "1", "user:name": "A"}
+        )
+        for i in range(5):
+            await writer.append_event(
+                session, _event(f"m{i}", stage=str(i), **{"temp:x": 1, "app:v": i})
+            )
+        assert len(session.events) == 5
+
+        loaded = await reader.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert loaded is not None
+        assert _texts(loaded.events) == ["m2", "m3", "m4"]
+        assert loaded.state == {"stage": "4", "user:name": "A", "app:v": 4}
+        assert (
+            await reader.get_session(app_name="app", user_id="u1", session_id="missing")
+            is None
+        )
+
+    asyncio.run(scenario())
+    appended = [p for name, p in rpc.calls if name == "append_adk_event"]
+    assert appended[0]["p_state_delta"] == {"stage": "0"}
+    assert appended[0]["p_app_state_delta"] == {"app:v": 0}
+    assert reader.metrics.events_loaded == 3
+
+
+def test_cached_session_only_fetches_new_events() -> None:
+    rpc = FakeSessionRpc()
+    service = _service(rpc, max_events=3)
+    other_worker = _service(rpc, max_events=3)
+
+    async def scenario() -> None:
+        session = await service.create_session(app_name="app", user_id="u1")
+        for i in range(4):
+            await service.append_event(session, _event(f"m{i}"))
+
+        loaded = await service.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert loaded is not None
+        assert _texts(loaded.events) == ["m1", "m2", "m3"]
+        assert service.metrics.events_loaded == 0
+
+        elsewhere = await other_worker.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert elsewhere is not None
+        await other_worker.append_event(elsewhere, _event("m4", stage="2"))
+
+        loaded = await service.get_session(
+            app_name="app", user_id="u1", session_id=session.id
+        )
+        assert loaded is not None
+        assert _texts(loaded.events) == ["m2", "m3", "m4"]
+        assert loaded.state == {"stage": "2"}
+        assert service.metrics.events_loaded == 1
+
+    asyncio.run(scenario())
+    assert service.metrics.hits == 2
+    assert service.metrics.misses == 0
+
+
+def test_lists_sessions_with_postgres_timestamps() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            json=[
+                {"id": "s1", "update_time": "2025-07-01T10:00:00.12345+00:00"},
+                {"id": "s2", "update_time": "2025-07-01T12:00:00+02"},
+            ],
+        )
+
+    client = SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(handler),
+    )
+    service = SupabaseSessionService(client)
+    listed = asyncio.run(service.list_sessions(app_name="app", user_id="u1"))
+
+    start = 1751364000.0
+    assert [(s.id, s.last_update_time) for s in listed.sessions] == [
+        ("s1", start + 0.12345),
+        ("s2", start),
+    ]
+    assert parse_timestamp("2025-07-01T10:00:00.1234567Z") == start + 0.123456
+
+
+def test_fast_api_session_service_swaps_and_restores() -> None:
+    original = fast_api.DatabaseSessionService
+    service = _service(FakeSessionRpc())
+    with fast_api_session_service(service) as uri:
+        assert uri == SESSION_SERVICE_URI
+        # The class is swapped at runtime, which the annotations do not know.
+        built: object = fast_api.DatabaseSessionService(db_url=uri)
+        assert built is service
+    assert fast_api.DatabaseSessionService is original
+    with fast_api_session_service(None) as uri:
+        assert uri is None
@@ -0,0 +1,96 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import sys
+from collections.abc import Sequence
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from app.utils.tracing import LazySpanExporter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Seconds `app.server` may take to import in lazy mode, most of it ADK itself.
+COLD_START_BUDGET = float(os.environ.get("COLD_START_BUDGET", "20"))
+
+# Imports modules with credentials and network access disabled.
+OFFLINE_IMPORT = """
+import json, socket, sys, time
+import google.auth
+
+def offline(*args, **kwargs):
+    raise RuntimeError("Google Cloud or network access at import time")
+
+google.auth.default = offline
+socket.socket.connect = offline
+start = time.perf_counter()
+for module in sys.argv[1:]:
+    __import__(module)
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": list(sys.modules)}))
+"""
+
+
+def import_offline(*modules: str) -> dict:
+    env = {**os.environ, "LAZY_STARTUP": "true"}
+    env.pop("GOOGLE_CLOUD_PROJECT", None)
+    result = subprocess.run(
+        [sys.executable, "-c", OFFLINE_IMPORT, *modules],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_config_imports_without_the_agents() -> None:
+    modules = import_offline("app.config")["modules"]
+    assert "app.agent" not in modules
+    assert "google.adk" not in modules
+
+
+def test_lazy_server_starts_offline_within_budget() -> None:
+    result = import_offline("app.server")
+    assert "app.research_agent" not in result["modules"]
+    assert result["seconds"] < COLD_START_BUDGET
+
+
+class RecordingExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.exported = 0
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self.exported += len(spans)
+        return SpanExportResult.SUCCESS
+
+
+def test_lazy_span_exporter_retries_construction() -> None:
+    built: list[None] = []
+
+    def factory() -> SpanExporter:
+        if not built:
+            built.append(None)
+            raise OSError("offline")
+        return RecordingExporter()
+
+    exporter = LazySpanExporter(factory)
+    assert exporter.force_flush()
+    assert exporter.export([]) == SpanExportResult.FAILURE
+    assert exporter.export([]) == SpanExportResult.SUCCESS
+    assert isinstance(exporter._exporter, RecordingExporter)
+    exporter.shutdown()
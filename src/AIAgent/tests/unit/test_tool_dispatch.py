@@ -0,0 +1,150 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from typing import Any
+
+from google.adk.agents import LlmAgent
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool
+from google.genai import types as genai_types
+from pydantic import Field
+
+from app.utils.tool_dispatch import ParallelToolDispatcher
+
+DELAY = 0.2
+
+
+class _CallingLlm(BaseLlm):
+    """Emits `calls` in one response, then a text reply."""
+
+    calls: list[tuple[str, dict[str, Any]]] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        last = llm_request.contents[-1]
+        if any(p.function_response for p in last.parts or []):
+            parts = [genai_types.Part(text="done")]
+        else:
+            parts = [
+                genai_types.Part(
+                    function_call=genai_types.FunctionCall(name=name, args=args)
+                )
+                for name, args in self.calls
+            ]
+        yield LlmResponse(content=genai_types.Content(role="model", parts=parts))
+
+
+class _Tools:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.peak = 0
+        self.order: list[str] = []
+
+    async def _work(self, name: str, result: Any) -> Any:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(DELAY)
+        self.in_flight -= 1
+        self.order.append(name)
+        return result
+
+    async def lookup(self, query: str) -> list[str]:
+        """Looks something up."""
+        return await self._work(f"lookup:{query}", [query])
+
+    async def advance(self, stage: str) -> bool:
+        """Advances the stage."""
+        return await self._work(f"advance:{stage}", True)
+
+    def log(self, message: str) -> dict[str, str]:
+        """Logs a message."""
+        self.order.append(f"log:{message}")
+        return {"logged": message}
+
+
+def _run(
+    calls: list[tuple[str, dict[str, Any]]], max_concurrency: int = 4
+) -> tuple[_Tools, ParallelToolDispatcher, list[dict[str, Any]], float]:
+    tools = _Tools()
+    concurrent = [FunctionTool(tools.lookup), FunctionTool(tools.advance)]
+    dispatcher = ParallelToolDispatcher(concurrent, max_concurrency=max_concurrency)
+    agent = LlmAgent(
+        name="agent",
+        model=_CallingLlm(model="fake", calls=calls),
+        tools=[*concurrent, FunctionTool(tools.log)],
+        before_tool_callback=dispatcher.before_tool,
+    )
+    service = InMemorySessionService()
+
+    async def scenario() -> list[dict[str, Any]]:
+        session = await service.create_session(app_name="app", user_id="u1")
+        runner = Runner(app_name="app", agent=agent, session_service=service)
+        responses = []
+        async for event in runner.run_async(
+            user_id="u1",
+            session_id=session.id,
+            new_message=genai_types.Content(
+                role="user", parts=[genai_types.Part(text="hi")]
+            ),
+        ):
+            responses += [
+                {"name": r.name, **(r.response or {})}
+                for r in event.get_function_responses()
+            ]
+        return responses
+
+    start = time.perf_counter()
+    responses = asyncio.run(scenario())
+    return tools, dispatcher, responses, time.perf_counter() - start
+
+
+def test_calls_in_one_response_take_as_long_as_the_slowest() -> None:
+    tools, dispatcher, responses, elapsed = _run(
+        [
+            ("lookup", {"query": "a"}),
+            ("advance", {"stage": "2"}),
+            ("lookup", {"query": "b"}),
+            ("log", {"message": "m"}),
+        ]
+    )
+
+    assert responses == [
+        {"name": "lookup", "result": ["a"]},
+        {"name": "advance", "result": True},
+        {"name": "lookup", "result": ["b"]},
+        {"name": "log", "logged": "m"},
+    ]
+    assert elapsed < 2 * DELAY
+    assert tools.peak == 3
+    assert dispatcher.metrics.batches == 1
+    assert dispatcher.metrics.calls == 3
+    assert dispatcher.metrics.in_flight == 0
+
+
+def test_concurrency_is_capped_and_single_calls_are_left_to_adk() -> None:
+    tools, dispatcher, _, elapsed = _run(
+        [("lookup", {"query": q}) for q in "abcd"], max_concurrency=2
+    )
+    assert tools.peak == 2
+    assert 2 * DELAY <= elapsed < 3 * DELAY
+
+    tools, dispatcher, responses, _ = _run([("advance", {"stage": "3"})])
+    assert responses == [{"name": "advance", "result": True}]
+    assert dispatcher.metrics.batches == 0
@@ -0,0 +1,105 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from opentelemetry.trace import Link, Status, StatusCode
+
+from app.utils.tracing import JsonlSink, SpanLogExporter, span_to_dict
+
+
+def make_spans(count: int) -> list[ReadableSpan]:
+    memory = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(memory))
+    tracer = provider.get_tracer(__name__)
+    with tracer.start_as_current_span("parent") as parent:
+        for i in range(count - 1):
+            with tracer.start_as_current_span(
+                f"child {i}",
+                attributes={"onemind.stage": "stage_1", "tags": ("a", "b")},
+                links=[Link(parent.get_span_context(), {"kind": "follows"})],
+            ) as span:
+                span.add_event("tool_call", {"name": "check_crisis"})
+                span.set_status(Status(StatusCode.ERROR, "boom"))
+    return list(memory.get_finished_spans())
+
+
+def test_span_to_dict_matches_to_json() -> None:
+    for span in make_spans(3):
+        assert json.loads(json.dumps(span_to_dict(span))) == json.loads(span.to_json())
+
+
+class BlockingSink:
+    def __init__(self) -> None:
+        self.entries: list[dict[str, Any]] = []
+        self.calls = 0
+        self.started = threading.Event()
+        self.unblocked = threading.Event()
+        self.closed = False
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        self.started.set()
+        self.unblocked.wait()
+        self.calls += 1
+        self.entries.extend(entries)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_batches_drops_on_overflow_and_flushes_on_shutdown() -> None:
+    sink = BlockingSink()
+    exporter = SpanLogExporter(
+        [sink],
+        max_queue_size=4,
+        batch_size=2,
+        flush_interval=60,
+        transform=lambda span, entry: {"name": entry["name"]},
+    )
+    spans = make_spans(10)
+    exporter.export(spans[:2])  # a full batch: the writer takes it and blocks
+    assert sink.started.wait(timeout=5)
+    assert not exporter.force_flush(timeout_millis=50)
+    exporter.export(spans[2:])  # 4 of the remaining 8 fit in the queue
+    assert (exporter.metrics.enqueued, exporter.metrics.dropped) == (6, 4)
+
+    sink.unblocked.set()
+    exporter.shutdown()
+    assert [e["name"] for e in sink.entries] == [s.name for s in spans[:6]]
+    assert (sink.calls, exporter.metrics.written, sink.closed) == (3, 6, True)
+    exporter.export(spans[:1])
+    assert exporter.metrics.dropped == 5
+
+
+def test_jsonl_sink(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    exporter = SpanLogExporter([JsonlSink(str(path))])
+    exporter.export(make_spans(3))
+    assert exporter.force_flush()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["name"] for line in lines] == [
+        "child 0",
+        "child 1",
+        "parent",
+    ]
+    exporter.shutdown()
@@ -0,0 +1,180 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+
+from app.onemind_agent import CrystalInput, MemoBaseTool
+from app.utils.db import SupabaseRestClient
+from app.utils.write_behind import JsonlJournal, PendingWrite, WriteBehindQueue
+
+
+def _recording_client(
+    seen: list[tuple[str, str, object]], status: int = 204
+) -> SupabaseRestClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else None
+        seen.append((request.method, request.url.path, body))
+        return httpx.Response(status)
+
+    return SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(handler),
+        max_retries=0,
+    )
+
+
+def test_coalesces_stages_and_bulk_inserts_crystals() -> None:
+    seen: list[tuple[str, str, object]] = []
+    queue = WriteBehindQueue(_recording_client(seen), flush_interval=60)
+
+    async def scenario() -> int:
+        await queue.enqueue_stage("s1", "stage_2_integration")
+        await queue.enqueue_stage("s1", "stage_3_micro_action")
+        await queue.enqueue_crystal({"user_id": "u1", "name": "a", "key_insight": "x"})
+        await queue.enqueue_crystal({"user_id": "u1", "name": "b", "key_insight": "y"})
+        depth = queue.depth
+        await queue.stop()
+        return depth
+
+    assert asyncio.run(scenario()) == 3
+    assert queue.depth == 0
+    assert queue.metrics.coalesced == 1
+    assert seen == [
+        (
+            "POST",
+            "/rest/v1/integration_crystals",
+            [
+                {"user_id": "u1", "name": "a", "key_insight": "x"},
+                {"user_id": "u1", "name": "b", "key_insight": "y"},
+            ],
+        ),
+        ("PATCH", "/rest/v1/sessions", {"current_stage": "stage_3_micro_action"}),
+    ]
+
+
+def test_flushes_on_size_threshold() -> None:
+    seen: list[tuple[str, str, object]] = []
+    queue = WriteBehindQueue(_recording_client(seen), flush_size=2, flush_interval=60)
+
+    async def scenario() -> None:
+        await queue.enqueue_stage("s1", "stage_2_integration")
+        await queue.enqueue_stage("s2", "stage_2_integration")
+        for _ in range(10):
+            await asyncio.sleep(0)
+            if queue.metrics.flushes:
+                break
+        assert queue.metrics.rows_written == 2
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert len(seen) == 2
+
+
+def test_failed_flush_is_requeued_and_journaled(tmp_path: Path) -> None:
+    seen: list[tuple[str, str, object]] = []
+    journal = JsonlJournal(tmp_path / "writes.jsonl")
+    queue = WriteBehindQueue(
+        _recording_client(seen, status=500), flush_interval=60, hook=journal
+    )
+
+    async def scenario() -> None:
+        await queue.enqueue_stage("s1", "stage_4_solidification")
+        try:
+            await queue.flush()
+        except Exception:
+            pass
+
+    asyncio.run(scenario())
+    assert queue.depth == 1
+    assert queue.metrics.failures == 1
+    # A new process replays the journal.
+    assert journal.recover() == [
+        PendingWrite("stage", {"session_id": "s1", "stage": "stage_4_solidification"})
+    ]
+
+
+def test_inserted_crystals_leave_the_journal_when_stages_fail(tmp_path: Path) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(201 if request.method == "POST" else 500)
+
+    db = SupabaseRestClient(
+        "https://example.supabase.co",
+        "anon-key",
+        transport=httpx.MockTransport(handler),
+        max_retries=0,
+    )
+    journal = JsonlJournal(tmp_path / "writes.jsonl")
+    queue = WriteBehindQueue(db, flush_interval=60, hook=journal)
+
+    async def scenario() -> None:
+        await queue.enqueue_crystal({"user_id": "u1", "name": "a", "key_insight": "x"})
+        await queue.enqueue_stage("s1", "stage_4_solidification")
+        try:
+            await queue.stop()
+        except Exception:
+            pass
+
+    asyncio.run(scenario())
+    assert journal.recover() == [
+        PendingWrite("stage", {"session_id": "s1", "stage": "stage_4_solidification"})
+    ]
+    # The failed final flush does not keep the queue from starting again.
+    assert queue._task is None
+
+
+def test_failing_flushes_back_off() -> None:
+    seen: list[tuple[str, str, object]] = []
+    queue = WriteBehindQueue(
+        _recording_client(seen, status=500),
+        max_size=1,
+        flush_interval=0.01,
+        max_backoff=0.05,
+    )
+
+    async def scenario() -> None:
+        await queue.enqueue_stage("s1", "stage_2_integration")
+        # Blocks on the full queue while the database is down.
+        blocked = asyncio.create_task(queue.enqueue_stage("s2", "stage_2_integration"))
+        await asyncio.sleep(0.3)
+        assert not blocked.done()
+        blocked.cancel()
+
+    asyncio.run(scenario())
+    # Without backoff, the blocked producer drives a retry per loop iteration.
+    assert 3 <= queue.metrics.failures <= 30
+    assert queue.depth == 1
+
+
+def test_memo_base_tool_enqueues_writes() -> None:
+    seen: list[tuple[str, str, object]] = []
+    db = _recording_client(seen)
+    tool = MemoBaseTool(db, writer=WriteBehindQueue(db, flush_interval=60))
+
+    assert tool.create_integration_crystal_sync(
+        CrystalInput(user_id="u1", name="c", insight="start small", session_id="s1")
+    )
+
+    # The sync wrapper drains the queue before its event loop ends.
+    assert seen == [
+        (
+            "POST",
+            "/rest/v1/integration_crystals",
+            [{"user_id": "u1", "name": "c", "key_insight": "start small"}],
+        )
+    ]
@@ -0,0 +1,48 @@
+-- =================================================================
+-- 3. get_or_create_session (会话读取/创建 RPC)
+-- =================================================================
+-- 依赖 9_supabase_schema.sql 中的 sessions 与 integration_crystals 表。
+-- MemoBaseTool.get_session 每轮对话都会调用，此函数将“查询会话、按需创建会话、
+-- 读取最新长期记忆”三次往返合并为一次 RPC 调用。
+
+-- 为“按用户读取最新结晶”建立索引
+CREATE INDEX IF NOT EXISTS integration_crystals_user_id_created_at_idx
+ON public.integration_crystals (user_id, created_at DESC);
+
+-- 创建 get_or_create_session 函数
+CREATE OR REPLACE FUNCTION public.get_or_create_session(
+    p_session_id TEXT,
+    p_user_id UUID,
+    p_default_stage TEXT DEFAULT 'stage_1_awareness'
+)
+RETURNS TABLE (stage TEXT, memory_insight TEXT)
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+BEGIN
+    -- 会话不存在时以默认阶段创建；已存在时保持原阶段不变
+    INSERT INTO public.sessions (session_id, user_id, current_stage)
+    VALUES (p_session_id, p_user_id, p_default_stage)
+    ON CONFLICT (session_id) DO NOTHING;
+
+    RETURN QUERY
+    SELECT
+        s.current_stage,
+        (
+            SELECT c.key_insight
+            FROM public.integration_crystals AS c
+            WHERE c.user_id = p_user_id
+            ORDER BY c.created_at DESC
+            LIMIT 1
+        )
+    FROM public.sessions AS s
+    WHERE s.session_id = p_session_id
+      AND s.user_id = p_user_id;
+END;
+$$;
+
+-- 添加函数注释
+COMMENT ON FUNCTION public.get_or_create_session(TEXT, UUID, TEXT) IS '读取或创建会话，并在同一次调用中返回当前阶段与用户最新的长期记忆洞察';
+
+-- 以调用者身份执行 (SECURITY INVOKER)，因此 sessions 与 integration_crystals 上的 RLS 策略依然生效
+GRANT EXECUTE ON FUNCTION public.get_or_create_session(TEXT, UUID, TEXT) TO authenticated, service_role;
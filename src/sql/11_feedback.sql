@@ -0,0 +1,33 @@
+-- =================================================================
+-- 4. 创建 feedback (用户反馈表)
+-- =================================================================
+-- 供 FEEDBACK_SINK=supabase 使用：/feedback 与 /feedback/batch 收到的反馈
+-- 先在服务端缓冲，再由后台批处理器每批一次请求写入此表。
+
+-- 创建 feedback 表
+CREATE TABLE IF NOT EXISTS public.feedback (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    invocation_id TEXT NOT NULL,
+    user_id TEXT NOT NULL DEFAULT '',
+    score DOUBLE PRECISION NOT NULL,
+    text TEXT,
+    created_at TIMESTAMPTZ DEFAULT now() NOT NULL
+);
+
+-- 添加表和列的注释
+COMMENT ON TABLE public.feedback IS '用户对智能体回复的反馈';
+COMMENT ON COLUMN public.feedback.id IS '反馈唯一标识符 (主键)';
+COMMENT ON COLUMN public.feedback.invocation_id IS '被评价的那次智能体调用';
+COMMENT ON COLUMN public.feedback.user_id IS '提交反馈的用户，可能为空';
+COMMENT ON COLUMN public.feedback.score IS '评分';
+COMMENT ON COLUMN public.feedback.text IS '反馈内容';
+COMMENT ON COLUMN public.feedback.created_at IS '写入时间';
+
+CREATE INDEX IF NOT EXISTS feedback_invocation_id_idx
+ON public.feedback (invocation_id);
+
+-- 仅服务端 (service_role) 写入，未创建任何策略
+ALTER TABLE public.feedback ENABLE ROW LEVEL SECURITY;
+
+-- 移除旧版本创建的对所有角色开放的写入策略
+DROP POLICY IF EXISTS "Allow feedback inserts" ON public.feedback;
@@ -0,0 +1,228 @@
+-- =================================================================
+-- 5. 创建 ADK 会话存储 (adk_sessions / adk_events / adk_states)
+-- =================================================================
+-- 供 SESSION_SERVICE=supabase 使用：ADK 的会话与事件不再保存在单个进程的内存中，
+-- 多个实例可以共享同一会话，重启也不会丢失对话。
+-- 写入路径只追加：每个事件一次 RPC，插入一行事件并在服务端合并状态增量，无需先读取会话。
+-- 读取路径只取最近 N 个事件，热会话还可以只取某个位置之后的新事件。
+
+-- 创建 adk_sessions 表
+CREATE TABLE IF NOT EXISTS public.adk_sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state JSONB NOT NULL DEFAULT '{}'::jsonb,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    create_time TIMESTAMPTZ DEFAULT now() NOT NULL,
+    update_time TIMESTAMPTZ DEFAULT now() NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+
+-- 创建 adk_events 表 (只追加)
+CREATE TABLE IF NOT EXISTS public.adk_events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    event JSONB NOT NULL,
+    timestamp DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, position),
+    FOREIGN KEY (app_name, user_id, session_id)
+        REFERENCES public.adk_sessions (app_name, user_id, id) ON DELETE CASCADE
+);
+
+-- 创建 adk_states 表 (应用级与用户级状态，应用级状态的 user_id 为空字符串)
+CREATE TABLE IF NOT EXISTS public.adk_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL DEFAULT '',
+    state JSONB NOT NULL DEFAULT '{}'::jsonb,
+    update_time TIMESTAMPTZ DEFAULT now() NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+
+-- 添加表和列的注释
+COMMENT ON TABLE public.adk_sessions IS 'ADK 会话，state 只保存会话级状态';
+COMMENT ON COLUMN public.adk_sessions.event_count IS '已追加的事件数，也是下一个事件的位置';
+COMMENT ON TABLE public.adk_events IS 'ADK 会话事件，只追加，不修改';
+COMMENT ON COLUMN public.adk_events.position IS '事件在会话中的位置，从 0 开始';
+COMMENT ON COLUMN public.adk_events.event IS 'ADK Event 的 JSON 序列化';
+COMMENT ON TABLE public.adk_states IS 'ADK 的 app: 与 user: 前缀状态，键保留前缀';
+
+-- 仅服务端 (service_role) 访问，未创建任何策略
+ALTER TABLE public.adk_sessions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.adk_events ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.adk_states ENABLE ROW LEVEL SECURITY;
+
+-- 合并应用级与用户级状态增量
+CREATE OR REPLACE FUNCTION public.merge_adk_states(
+    p_app_name TEXT,
+    p_user_id TEXT,
+    p_app_state JSONB,
+    p_user_state JSONB
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+BEGIN
+    IF p_app_state IS NOT NULL AND p_app_state <> '{}'::jsonb THEN
+        INSERT INTO public.adk_states AS s (app_name, user_id, state)
+        VALUES (p_app_name, '', p_app_state)
+        ON CONFLICT (app_name, user_id)
+        DO UPDATE SET state = s.state || EXCLUDED.state, update_time = now();
+    END IF;
+    IF p_user_state IS NOT NULL AND p_user_state <> '{}'::jsonb THEN
+        INSERT INTO public.adk_states AS s (app_name, user_id, state)
+        VALUES (p_app_name, p_user_id, p_user_state)
+        ON CONFLICT (app_name, user_id)
+        DO UPDATE SET state = s.state || EXCLUDED.state, update_time = now();
+    END IF;
+END;
+$$;
+
+-- 读取合并后的会话状态：应用级、用户级、会话级依次覆盖
+CREATE OR REPLACE FUNCTION public.adk_session_state(
+    p_app_name TEXT,
+    p_user_id TEXT,
+    p_session_state JSONB
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT
+        coalesce(
+            (SELECT state FROM public.adk_states
+             WHERE app_name = p_app_name AND user_id = ''),
+            '{}'::jsonb
+        )
+        || coalesce(
+            (SELECT state FROM public.adk_states
+             WHERE app_name = p_app_name AND user_id = p_user_id),
+            '{}'::jsonb
+        )
+        || p_session_state;
+$$;
+
+-- 创建会话，返回合并后的状态与更新时间
+CREATE OR REPLACE FUNCTION public.create_adk_session(
+    p_app_name TEXT,
+    p_user_id TEXT,
+    p_session_id TEXT,
+    p_state JSONB DEFAULT '{}'::jsonb,
+    p_app_state JSONB DEFAULT '{}'::jsonb,
+    p_user_state JSONB DEFAULT '{}'::jsonb
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+DECLARE
+    v_update_time TIMESTAMPTZ;
+BEGIN
+    PERFORM public.merge_adk_states(p_app_name, p_user_id, p_app_state, p_user_state);
+
+    INSERT INTO public.adk_sessions (app_name, user_id, id, state)
+    VALUES (p_app_name, p_user_id, p_session_id, p_state)
+    RETURNING update_time INTO v_update_time;
+
+    RETURN jsonb_build_object(
+        'state', public.adk_session_state(p_app_name, p_user_id, p_state),
+        'update_time', extract(epoch FROM v_update_time)
+    );
+END;
+$$;
+
+-- 追加一个事件并合并状态增量，返回新的 event_count；会话不存在时返回 NULL。
+-- 对会话行的 UPDATE 会持有行锁，因此并发追加的位置不会冲突。
+CREATE OR REPLACE FUNCTION public.append_adk_event(
+    p_app_name TEXT,
+    p_user_id TEXT,
+    p_session_id TEXT,
+    p_event JSONB,
+    p_timestamp DOUBLE PRECISION,
+    p_state_delta JSONB DEFAULT '{}'::jsonb,
+    p_app_state_delta JSONB DEFAULT '{}'::jsonb,
+    p_user_state_delta JSONB DEFAULT '{}'::jsonb
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY INVOKER
+AS $$
+DECLARE
+    v_event_count INTEGER;
+BEGIN
+    UPDATE public.adk_sessions
+    SET state = state || p_state_delta,
+        event_count = event_count + 1,
+        update_time = to_timestamp(p_timestamp)
+    WHERE app_name = p_app_name AND user_id = p_user_id AND id = p_session_id
+    RETURNING event_count INTO v_event_count;
+
+    IF v_event_count IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO public.adk_events (
+        app_name, user_id, session_id, position, event, timestamp
+    )
+    VALUES (
+        p_app_name, p_user_id, p_session_id, v_event_count - 1, p_event, p_timestamp
+    );
+
+    PERFORM public.merge_adk_states(
+        p_app_name, p_user_id, p_app_state_delta, p_user_state_delta
+    );
+    RETURN v_event_count;
+END;
+$$;
+
+-- 读取会话：合并后的状态，加上 p_after_position 之后 (且时间不早于 p_after_timestamp)
+-- 的最近 p_limit 个事件，按位置升序；会话不存在时返回 NULL。
+CREATE OR REPLACE FUNCTION public.get_adk_session(
+    p_app_name TEXT,
+    p_user_id TEXT,
+    p_session_id TEXT,
+    p_limit INTEGER,
+    p_after_position INTEGER DEFAULT -1,
+    p_after_timestamp DOUBLE PRECISION DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT jsonb_build_object(
+        'state', public.adk_session_state(s.app_name, s.user_id, s.state),
+        'update_time', extract(epoch FROM s.update_time),
+        'event_count', s.event_count,
+        'events', coalesce(
+            (
+                SELECT jsonb_agg(recent.event ORDER BY recent.position)
+                FROM (
+                    SELECT e.event, e.position
+                    FROM public.adk_events AS e
+                    WHERE e.app_name = s.app_name
+                      AND e.user_id = s.user_id
+                      AND e.session_id = s.id
+                      AND e.position > p_after_position
+                      AND e.position >= s.event_count - p_limit
+                      AND (p_after_timestamp IS NULL OR e.timestamp >= p_after_timestamp)
+                ) AS recent
+            ),
+            '[]'::jsonb
+        )
+    )
+    FROM public.adk_sessions AS s
+    WHERE s.app_name = p_app_name AND s.user_id = p_user_id AND s.id = p_session_id;
+$$;
+
+-- 添加函数注释
+COMMENT ON FUNCTION public.create_adk_session(TEXT, TEXT, TEXT, JSONB, JSONB, JSONB) IS '创建 ADK 会话并返回合并后的状态';
+COMMENT ON FUNCTION public.append_adk_event(TEXT, TEXT, TEXT, JSONB, DOUBLE PRECISION, JSONB, JSONB, JSONB) IS '追加 ADK 事件并在服务端合并状态增量';
+COMMENT ON FUNCTION public.get_adk_session(TEXT, TEXT, TEXT, INTEGER, INTEGER, DOUBLE PRECISION) IS '读取 ADK 会话状态与最近的事件';
+
+GRANT EXECUTE ON FUNCTION public.create_adk_session(TEXT, TEXT, TEXT, JSONB, JSONB, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION public.append_adk_event(TEXT, TEXT, TEXT, JSONB, DOUBLE PRECISION, JSONB, JSONB, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION public.get_adk_session(TEXT, TEXT, TEXT, INTEGER, INTEGER, DOUBLE PRECISION) TO service_role;